@@ -7,6 +7,7 @@ from subprocess import run, PIPE
 import argparse
 import os
 import shutil
+import sys
 import zipfile
 import stat
 import errno
@@ -99,12 +100,96 @@ def print_package_names(install_output):
         print('*   ' + name, end='\n')
 
 
-def package_lambda_function():
+def build_nearest_facility_grids(package_path):
+    """
+    Precomputes the nearest facility grid for each static facility dataset
+    and writes the grid files into the copy of the mycity package that is
+    being zipped.
+
+    :param package_path: path of the mycity package copy
+    :return: None
+    """
+    sys.path.insert(0, PROJECT_ROOT)
+    import mycity.intents.snow_parking_intent as snow_parking_intent
+    import mycity.utilities.finder.NearestFacilityGrid as grid
+    from mycity.utilities.finder.Finder import Finder
+
+    # (csv dataset URL, address field) of datasets that rarely change
+    static_datasets = [
+        (snow_parking_intent.PARKING_INFO_URL, snow_parking_intent.ADDRESS_KEY)
+    ]
+    grid_directory = os.path.join(package_path, grid.GRID_PACKAGE_PATH)
+    print('* Building nearest facility grids ...')
+    for resource_url, address_key in static_datasets:
+        print('*   ' + resource_url)
+        grid.build_grid_file(resource_url, address_key, grid_directory,
+                             Finder.CITY, Finder.STATE)
+    print('* DONE')
+    print(HORIZONTAL_RULE)
+
+
+def build_road_network(package_path, edge_csv_path):
+    """
+    Converts a csv edge list of Boston's roads to the adjacency file used
+    for local routing and writes it into the copy of the mycity package
+    that is being zipped.
+
+    :param package_path: path of the mycity package copy
+    :param edge_csv_path: path of the csv edge list
+    :return: None
+    """
+    sys.path.insert(0, PROJECT_ROOT)
+    import mycity.utilities.road_network as road_network_utils
+
+    print('* Building road network from ' + edge_csv_path + ' ...')
+    road_network = road_network_utils.build_road_network_file(
+        edge_csv_path,
+        os.path.join(package_path, road_network_utils.ROAD_NETWORK_PACKAGE_PATH)
+    )
+    print('*   {} nodes, {} edges'.format(len(road_network),
+                                         len(road_network.targets)))
+    print('* DONE')
+    print(HORIZONTAL_RULE)
+
+
+def build_trash_schedules(package_path, trash_schedule_csv_path):
+    """
+    Converts a csv export of the city's trash schedules by address dataset
+    to the index the trash intent reads pickup days from, and writes it
+    into the copy of the mycity package that is being zipped.
+
+    :param package_path: path of the mycity package copy
+    :param trash_schedule_csv_path: path of the csv file
+    :return: None
+    """
+    sys.path.insert(0, PROJECT_ROOT)
+    import mycity.utilities.trash_schedule_index as trash_schedule_index
+
+    print('* Building trash schedule index from ' + trash_schedule_csv_path +
+          ' ...')
+    index = trash_schedule_index.build_trash_schedule_file(
+        trash_schedule_csv_path,
+        os.path.join(package_path,
+                     trash_schedule_index.TRASH_SCHEDULE_PACKAGE_PATH)
+    )
+    print('*   {} addresses, {} zones'.format(len(index), len(index.zones)))
+    print('* DONE')
+    print(HORIZONTAL_RULE)
+
+
+def package_lambda_function(build_grids=False, road_edges=None,
+                            trash_schedules=None):
     """
     Creates a temporary directory where the lambda file and all of its
     dependencies are copied before being compressed. Removes the temporary
     directory after creating the .zip file.
 
+    :param build_grids: if True, nearest facility grids are built and
+        bundled into the zip file
+    :param road_edges: path of a csv edge list of roads to bundle as the
+        road network for local routing, or None
+    :param trash_schedules: path of a csv export of the trash schedules by
+        address dataset to bundle as the trash schedule index, or None
     :return: None
     """
     print(HORIZONTAL_RULE)
@@ -125,6 +210,17 @@ def package_lambda_function():
     print('* DONE')
     print(HORIZONTAL_RULE)
 
+    if build_grids:
+        build_nearest_facility_grids(os.path.join(TEMP_DIR_PATH, 'mycity'))
+
+    if road_edges:
+        build_road_network(os.path.join(TEMP_DIR_PATH, 'mycity'),
+                           os.path.abspath(road_edges))
+
+    if trash_schedules:
+        build_trash_schedules(os.path.join(TEMP_DIR_PATH, 'mycity'),
+                              os.path.abspath(trash_schedules))
+
     # install dependencies
     install_pip_dependencies(
         os.path.join(os.getcwd(), 'requirements.txt'),
@@ -357,6 +453,33 @@ def main():
              "BOSTON_INFO_SKILL_ID environment variable."
     )
 
+    parser.add_argument(
+        '-g',
+        '--grids',
+        help="Precompute the nearest facility grids for static datasets " +
+             "(e.g. snow emergency parking) and bundle them into the zip " +
+             "file.",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-r',
+        '--roads',
+        help="Path of a csv edge list of roads (from_x, from_y, to_x, " +
+             "to_y, meters, seconds, oneway) to bundle as the road " +
+             "network used when ROUTING_ENGINE is set to local.",
+        type=str
+    )
+
+    parser.add_argument(
+        '-t',
+        '--trash',
+        help="Path of a csv export of the city's trash schedules by " +
+             "address dataset to bundle as the index trash day questions " +
+             "are answered from before asking ReCollect.",
+        type=str
+    )
+
     parser.add_argument(
         '-s',
         '--s3bucket',
@@ -370,10 +493,10 @@ def main():
     is_interaction_model_updated = False
 
     if args.function:
-        package_lambda_function()
+        package_lambda_function(args.grids, args.roads, args.trash)
         update_lambda_code(args.function, args.s3bucket)
     elif args.package:
-        package_lambda_function()
+        package_lambda_function(args.grids, args.roads, args.trash)
     elif args.interaction:
         # Handles the case that we want to update the interaction model without
         # uploading a new lambda zip.
@@ -13,5 +13,12 @@ class BadAPIResponse(Exception):
 
 class MultipleAddressError(Exception):
     """Error for finding multiple addresses with the current info"""
-    pass
+
+    def __init__(self, candidates=None):
+        """
+        :param candidates: optional dictionary of zip code -> API parameters
+            of the address found in that zip code
+        """
+        super().__init__()
+        self.candidates = candidates or {}
 
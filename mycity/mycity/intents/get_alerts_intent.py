@@ -17,11 +17,11 @@ and street cleaning is running on a normal schedule."
 """
 
 from bs4 import BeautifulSoup
-from urllib import request
 from enum import Enum
 from mycity.mycity_request_data_model import MyCityRequestDataModel
 from mycity.mycity_response_data_model import MyCityResponseDataModel
 import mycity.intents.speech_constants.get_alerts_intent as constants
+import mycity.utilities.http_utils as http_utils
 import logging
 import typing
 
@@ -185,14 +185,19 @@ def get_alerts():
     them as a dictionary
     
     :return: a dictionary that maps alert names to detailed alert message
+    :raises: requests.HTTPError if boston.gov answers with an error
     """
     logger.debug('')
 
-    # get boston.gov as an httpResponse object
-    url = request.urlopen(BOSTON_GOV)
-    # feed the url object into beautiful soup
-    soup = BeautifulSoup(url, "html.parser")
-    url.close()
+    # get boston.gov as a requests.Response object
+    response = http_utils.get(BOSTON_GOV)
+    try:
+        # an error page isn't the alerts page, raise like urlopen did
+        response.raise_for_status()
+        # feed the page contents into beautiful soup
+        soup = BeautifulSoup(response.content, "html.parser")
+    finally:
+        response.close()
 
     # parse, sanitize returned strings, place in dictionary
     services = [s.text.strip() for s in soup.find_all(class_= SERVICE_NAMES)]
@@ -3,3 +3,6 @@
 # The key used for the current address in session attributes
 CURRENT_ADDRESS_KEY = "currentAddress"
 ZIP_CODE_KEY = "Zipcode"
+# Pickup days of each zip code an ambiguous trash address was found in,
+# so the follow-up zip code answer needs no new lookups
+TRASH_DAYS_BY_ZIP_CODE_KEY = "trashDaysByZipCode"
@@ -0,0 +1,125 @@
+"""
+Registry mapping intent names to the functions that handle them.
+
+Intent modules pull in heavy dependencies (bs4, dateutil, streetaddress,
+the ArcGIS helpers...). Rather than importing every one of them when
+mycity_controller is loaded, each handler module is imported the first
+time one of its intents is requested. The time spent importing is recorded
+so we can see how much each intent adds to a cold start.
+"""
+
+import importlib
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# intent name -> (module path, handler function name)
+INTENT_HANDLERS = {
+    "TrashDayIntent":
+        ("mycity.intents.trash_intent", "get_trash_day_info"),
+    "TrashDelayIntent":
+        ("mycity.intents.trash_intent", "get_trash_delay_info"),
+    "NextCollectionIntent":
+        ("mycity.intents.trash_intent", "get_next_collection_info"),
+    "SnowParkingIntent":
+        ("mycity.intents.snow_parking_intent",
+         "get_snow_emergency_parking_intent"),
+    "CrimeIncidentsIntent":
+        ("mycity.intents.crime_activity_intent",
+         "get_crime_incidents_intent"),
+    "GetAlertsIntent":
+        ("mycity.intents.get_alerts_intent", "get_alerts_intent"),
+    "InclementWeatherIntent":
+        ("mycity.intents.get_alerts_intent", "get_inclement_weather_alert"),
+    "FeedbackIntent":
+        ("mycity.intents.feedback_intent", "submit_feedback"),
+    "UnhandledIntent":
+        ("mycity.intents.unhandled_intent", "unhandled_intent"),
+    "LatestThreeOneOne":
+        ("mycity.intents.latest_311_intent", "get_311_requests"),
+}
+
+# intent name -> milliseconds spent importing its handler module
+_import_times_ms = {}
+
+
+def is_registered(intent_name):
+    """
+    Checks whether an intent has a handler in the registry
+
+    :param intent_name: name of the intent
+    :return: True if the intent has a registered handler, else False
+    """
+    return intent_name in INTENT_HANDLERS
+
+
+def get_intent_handler(intent_name):
+    """
+    Returns the handler function for an intent, importing its module on
+    first use
+
+    :param intent_name: name of the intent
+    :return: function accepting a MyCityRequestDataModel and returning a
+        MyCityResponseDataModel
+    :raises: ValueError if the intent has no registered handler
+    """
+    if intent_name not in INTENT_HANDLERS:
+        raise ValueError("Invalid intent")
+
+    module_path, function_name = INTENT_HANDLERS[intent_name]
+    module = _import_handler_module(intent_name, module_path)
+    return getattr(module, function_name)
+
+
+def _import_handler_module(intent_name, module_path):
+    """
+    Imports a handler module, recording how long the import took if the
+    module was not already loaded
+
+    :param intent_name: name of the intent the module is loaded for
+    :param module_path: dotted path of the handler module
+    :return: the imported module
+    """
+    if module_path in sys.modules:
+        _import_times_ms.setdefault(intent_name, 0.0)
+        return sys.modules[module_path]
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_path)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _import_times_ms[intent_name] = elapsed_ms
+    logger.debug("Imported {} for {} in {:.1f} ms"
+                 .format(module_path, intent_name, elapsed_ms))
+    return module
+
+
+def get_cold_start_report():
+    """
+    Reports how many milliseconds importing each intent's handler added to
+    this container's start up. Intents sharing a module (or dependencies
+    already loaded by an earlier intent) only report the time they added
+    themselves.
+
+    :return: dictionary mapping intent name to milliseconds, for every
+        intent loaded so far
+    """
+    return dict(_import_times_ms)
+
+
+def load_all_intents():
+    """
+    Imports every registered handler module, in registry order, and returns
+    the resulting cold start report. Useful for profiling a fresh container.
+
+    :return: dictionary mapping intent name to milliseconds
+    """
+    for intent_name in INTENT_HANDLERS:
+        get_intent_handler(intent_name)
+    report = get_cold_start_report()
+    for intent_name, elapsed_ms in sorted(report.items(),
+                                          key=lambda item: -item[1]):
+        logger.info("{:<24} {:>8.1f} ms".format(intent_name, elapsed_ms))
+    return report
@@ -1,4 +1,5 @@
 import requests
+import mycity.utilities.http_utils as http_utils
 from mycity.mycity_response_data_model import MyCityResponseDataModel
 from mycity.intents.custom_errors import BadAPIResponse
 from mycity.intents.speech_constants.latest_311_constants import *
@@ -79,7 +80,7 @@ def get_raw_311_reports_json(number_entries):
         "limit": number_entries
     }
 
-    response = requests.get(data_url, parameters)
+    response = http_utils.get(data_url, params=parameters)
     if response.status_code != requests.codes.ok:
         raise BadAPIResponse
 
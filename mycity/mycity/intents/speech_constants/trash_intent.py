@@ -8,3 +8,7 @@ ADDRESS_NOT_FOUND = "I can't seem to find {}. Try another address"
 BAD_API_RESPONSE = "Hmm something went wrong. Maybe try again?"
 MULTIPLE_ADDRESS_ERROR = "I found multiple places with the address {}. What's the zip code?"
 ADDRESS_NOT_UNDERSTOOD = "I didn't understand that address, please try again"
+NO_DELAY = "Trash and recycling pickup is on a normal schedule this week."
+DELAYED = "Pickup is delayed this week: {}."
+NEXT_COLLECTION = "The next {} pickup is on {}."
+NO_NEXT_COLLECTION = "I couldn't find an upcoming {} pickup for your address."
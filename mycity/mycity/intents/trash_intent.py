@@ -3,11 +3,17 @@ Functions for Alexa responses related to trash day
 """
 from .custom_errors import \
     InvalidAddressError, BadAPIResponse, MultipleAddressError
-from streetaddress import StreetAddressParser
 from mycity.mycity_response_data_model import MyCityResponseDataModel
 from mycity.intents.user_address_intent import clear_address_from_mycity_object
+import concurrent.futures
 import re
 import requests
+import mycity.utilities.http_utils as http_utils
+import mycity.utilities.trash_calendar as trash_calendar
+import mycity.utilities.trash_schedule_index as trash_schedule_index
+from mycity.utilities.address_parser import parse_address
+from mycity.utilities.recollect_cache import recollect_cache
+from mycity.utilities.trash_calendar import TrashCalendar
 from . import intent_constants
 import mycity.intents.speech_constants.trash_intent as speech_constants
 import logging
@@ -16,6 +22,17 @@ logger = logging.getLogger(__name__)
 
 DAY_CODE_REGEX = r'\d+A? - '
 CARD_TITLE = "Trash Day"
+RECOLLECT_EVENTS_URL = "https://api.recollect.net/api/places/{}/" \
+                       "services/{}/events"
+COLLECTION_TYPE_SLOT = "CollectionType"
+DEFAULT_COLLECTION_TYPE = "trash"
+# Upper bound on ReCollect requests in flight when looking up every zip
+# code an address was found in
+MAX_CONCURRENT_REQUESTS = 4
+
+_request_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_REQUESTS
+)
 
 
 def get_trash_day_info(mycity_request):
@@ -29,24 +46,13 @@ def get_trash_day_info(mycity_request):
 
     mycity_response = MyCityResponseDataModel()
     if intent_constants.CURRENT_ADDRESS_KEY in mycity_request.session_attributes:
-        current_address = \
-            mycity_request.session_attributes[intent_constants.CURRENT_ADDRESS_KEY]
-
-        # grab relevant information from session address
-        address_parser = StreetAddressParser()
-        a = address_parser.parse(current_address)
-        # currently assumes that trash day is the same for all units at
-        # the same street address
-        address = str(a['house']) + " " + str(a['street_full'])
-        zip_code = str(a["other"]).zfill(5) if a["other"] else None
-
-        zip_code_key = intent_constants.ZIP_CODE_KEY
-        if zip_code is None and zip_code_key in \
-                mycity_request.session_attributes:
-            zip_code = mycity_request.session_attributes[zip_code_key]
+        address, zip_code = get_address_and_zip_code(mycity_request)
 
         try:
-            trash_days = get_trash_and_recycling_days(address, zip_code)
+            trash_days = get_stored_trash_days(
+                mycity_request.session_attributes, address, zip_code)
+            if trash_days is None:
+                trash_days = get_trash_and_recycling_days(address, zip_code)
             trash_days_speech = build_speech_from_list_of_days(trash_days)
 
             mycity_response.output_speech = speech_constants.PICK_UP_DAY.format(trash_days_speech)
@@ -67,9 +73,27 @@ def get_trash_day_info(mycity_request):
 
         except BadAPIResponse:
             mycity_response.output_speech = speech_constants.BAD_API_RESPONSE
-        except MultipleAddressError:
-            mycity_response.output_speech = speech_constants.MULTIPLE_ADDRESS_ERROR.format(address)
-            mycity_response.dialog_directive = "ElicitSlotZipCode"
+        except MultipleAddressError as error:
+            # Look up every zip code now: if they agree there is nothing
+            # to ask, and if not the answer to the zip code question is
+            # already known
+            trash_days_by_zip_code = get_trash_days_by_zip_code(
+                address, error.candidates)
+            trash_days = get_common_trash_days(trash_days_by_zip_code)
+            if trash_days:
+                mycity_response.output_speech = speech_constants.PICK_UP_DAY\
+                    .format(build_speech_from_list_of_days(trash_days))
+            else:
+                mycity_request.session_attributes[
+                    intent_constants.TRASH_DAYS_BY_ZIP_CODE_KEY] = {
+                        "address": address,
+                        "trash_days": {
+                            zip_code: days for zip_code, days
+                            in trash_days_by_zip_code.items() if days
+                        }
+                    }
+                mycity_response.output_speech = speech_constants.MULTIPLE_ADDRESS_ERROR.format(address)
+                mycity_response.dialog_directive = "ElicitSlotZipCode"
 
         mycity_response.should_end_session = False
     else:
@@ -85,10 +109,175 @@ def get_trash_day_info(mycity_request):
     return mycity_response 
 
 
+def get_address_and_zip_code(mycity_request):
+    """
+    Reads the street address and zip code trash questions are answered for
+    from the session
+
+    :param mycity_request: MyCityRequestDataModel object with an address in
+        its session attributes
+    :return: Two-Tuple containing 1) String of the house number and street
+        and 2) String of the zip code, or None if it is unknown
+    """
+    current_address = \
+        mycity_request.session_attributes[intent_constants.CURRENT_ADDRESS_KEY]
+
+    # grab relevant information from session address
+    a = parse_address(current_address)
+    # currently assumes that trash day is the same for all units at
+    # the same street address
+    address = str(a.house) + " " + str(a.street_full)
+    zip_code = str(a.other).zfill(5) if a.other else None
+
+    zip_code_key = intent_constants.ZIP_CODE_KEY
+    if zip_code is None and zip_code_key in \
+            mycity_request.session_attributes:
+        zip_code = mycity_request.session_attributes[zip_code_key]
+    return address, zip_code
+
+
+def get_trash_delay_info(mycity_request):
+    """
+    Generates response object for a question about whether trash pickup is
+    delayed this week
+
+    :param mycity_request: MyCityRequestDataModel object
+    :return: MyCityResponseDataModel object
+    """
+    logger.debug('MyCityRequestDataModel received:' + mycity_request.get_logger_string())
+    return _get_trash_calendar_response(mycity_request,
+                                        build_delay_speech)
+
+
+def get_next_collection_info(mycity_request):
+    """
+    Generates response object for a question about when something (trash,
+    recycling, yard waste...) is next collected
+
+    :param mycity_request: MyCityRequestDataModel object
+    :return: MyCityResponseDataModel object
+    """
+    logger.debug('MyCityRequestDataModel received:' + mycity_request.get_logger_string())
+    collection_type = DEFAULT_COLLECTION_TYPE
+    if COLLECTION_TYPE_SLOT in mycity_request.intent_variables and \
+            "value" in mycity_request.intent_variables[COLLECTION_TYPE_SLOT]:
+        collection_type = \
+            mycity_request.intent_variables[COLLECTION_TYPE_SLOT]["value"]
+    return _get_trash_calendar_response(
+        mycity_request,
+        lambda calendar, today: build_next_collection_speech(
+            calendar, collection_type, today)
+    )
+
+
+def _get_trash_calendar_response(mycity_request, build_speech):
+    """
+    Answers a question from the trash calendar of the session's address
+
+    :param mycity_request: MyCityRequestDataModel object
+    :param build_speech: function taking a TrashCalendar and today's
+        datetime.date and returning the output speech
+    :return: MyCityResponseDataModel object
+    """
+    mycity_response = MyCityResponseDataModel()
+    if intent_constants.CURRENT_ADDRESS_KEY in mycity_request.session_attributes:
+        address, zip_code = get_address_and_zip_code(mycity_request)
+        try:
+            today = trash_calendar.today_in_boston()
+            calendar = get_trash_calendar_for_address(address, zip_code,
+                                                      today)
+            mycity_response.output_speech = build_speech(calendar, today)
+        except InvalidAddressError:
+            address_string = address
+            if zip_code:
+                address_string = address_string + " with zip code {}"\
+                    .format(zip_code)
+            mycity_response.output_speech = speech_constants.ADDRESS_NOT_FOUND.format(address_string)
+            mycity_response.dialog_directive = "ElicitSlotTrash"
+            mycity_request = clear_address_from_mycity_object(mycity_request)
+        except BadAPIResponse:
+            mycity_response.output_speech = speech_constants.BAD_API_RESPONSE
+        except MultipleAddressError:
+            mycity_response.output_speech = speech_constants.MULTIPLE_ADDRESS_ERROR.format(address)
+            mycity_response.dialog_directive = "ElicitSlotZipCode"
+        mycity_response.should_end_session = False
+    else:
+        logger.error("Error: Called trash calendar intent with no address")
+        mycity_response.output_speech = speech_constants.ADDRESS_NOT_UNDERSTOOD
+
+    mycity_response.reprompt_text = None
+    mycity_response.session_attributes = mycity_request.session_attributes
+    mycity_response.card_title = CARD_TITLE
+    return mycity_response
+
+
+def get_trash_calendar_for_address(address, zip_code, today):
+    """
+    Returns the calendar of upcoming collections of an address. Calendars
+    are cached by place and only requested again once they no longer cover
+    the coming week
+
+    :param address: String of address to find the calendar for
+    :param zip_code: Optional zip code to resolve multiple addresses
+    :param today: datetime.date of the current day
+    :return: TrashCalendar object
+    :raises: InvalidAddressError, BadAPIResponse, MultipleAddressError
+    """
+    logger.debug('address: ' + str(address) + ', zip_code: ' + str(zip_code))
+    api_params = recollect_cache.get_place(
+        address, zip_code, lambda: get_address_api_info(address, zip_code))
+    if not api_params or \
+            not validate_found_address(api_params["name"], address):
+        raise InvalidAddressError
+
+    calendar = recollect_cache.get_calendar(
+        api_params,
+        lambda first_day, last_day: get_trash_calendar_data(
+            api_params, first_day, last_day),
+        today
+    )
+    if calendar is None:
+        raise BadAPIResponse
+    return calendar
+
+
+def build_delay_speech(calendar, today):
+    """
+    :param calendar: TrashCalendar of the address
+    :param today: datetime.date of the current day
+    :return: Speech saying whether pickup is delayed this week
+    """
+    start, end = trash_calendar.get_week_bounds(today)
+    delays = calendar.get_delays(start, end)
+    if not delays:
+        return speech_constants.NO_DELAY
+    return speech_constants.DELAYED.format(", and ".join(
+        "{} on {:%A}".format(description, day)
+        for day, description in delays))
+
+
+def build_next_collection_speech(calendar, collection_type, today):
+    """
+    :param calendar: TrashCalendar of the address
+    :param collection_type: String naming what is collected, e.g.
+        "yard waste"
+    :param today: datetime.date of the current day
+    :return: Speech saying when collection_type is next picked up
+    """
+    day = calendar.get_next_collection(collection_type, today)
+    if day is None:
+        return speech_constants.NO_NEXT_COLLECTION.format(collection_type)
+    return speech_constants.NEXT_COLLECTION.format(
+        collection_type, "{:%A, %B} {}".format(day, day.day))
+
+
 def get_trash_and_recycling_days(address, zip_code=None):
     """
     Determines the trash and recycling days for the provided address.
     These are on the same day, so only one array of days will be returned.
+    The city's trash schedule index is consulted first. ReCollect is only
+    called for addresses missing from it, and its places and schedules are
+    cached, so repeat questions about an address don't call ReCollect again.
 
     :param address: String of address to find trash day for
     :param zip_code: Optional zip code to resolve multiple addresses
@@ -96,7 +285,15 @@ def get_trash_and_recycling_days(address, zip_code=None):
     :raises: InvalidAddressError, BadAPIResponse
     """
     logger.debug('address: ' + str(address) + ', zip_code: ' + str(zip_code))
-    api_params = get_address_api_info(address, zip_code)
+    trash_schedules = trash_schedule_index.get_trash_schedule_index()
+    if trash_schedules is not None:
+        trash_days = trash_schedules.lookup(address, zip_code)
+        if trash_days:
+            logger.debug('Found trash days in trash schedule index')
+            return trash_days
+
+    api_params = recollect_cache.get_place(
+        address, zip_code, lambda: get_address_api_info(address, zip_code))
     if not api_params:
         raise InvalidAddressError
 
@@ -104,7 +301,8 @@ def get_trash_and_recycling_days(address, zip_code=None):
         logger.debug("InvalidAddressError")
         raise InvalidAddressError
 
-    trash_data = get_trash_day_data(api_params)
+    trash_data = recollect_cache.get_schedule(
+        api_params, lambda: get_trash_day_data(api_params))
     if not trash_data:
         raise BadAPIResponse
 
@@ -113,6 +311,89 @@ def get_trash_and_recycling_days(address, zip_code=None):
     return trash_and_recycling_days
 
 
+def get_trash_days_by_zip_code(address, candidates):
+    """
+    Looks up the trash and recycling days of an address in each of the zip
+    codes it was found in, with the ReCollect requests in flight at the
+    same time
+
+    :param address: String of address to find trash day for
+    :param candidates: dictionary of zip code -> API parameters of the
+        address found in that zip code
+    :return: dictionary of zip code -> array of trash and recycling days,
+        or None if the days couldn't be found for that zip code
+    """
+    logger.debug('address: ' + str(address) +
+                 ', zip codes: ' + str(list(candidates)))
+    futures = {
+        zip_code: _request_executor.submit(
+            _get_trash_days_for_candidate, address, zip_code, api_params)
+        for zip_code, api_params in candidates.items()
+    }
+    trash_days_by_zip_code = {}
+    for zip_code, future in futures.items():
+        try:
+            trash_days_by_zip_code[zip_code] = future.result()
+        except (InvalidAddressError, BadAPIResponse,
+                requests.exceptions.RequestException) as e:
+            logger.debug('No trash days for zip code {}: {}'
+                         .format(zip_code, repr(e)))
+            trash_days_by_zip_code[zip_code] = None
+    return trash_days_by_zip_code
+
+
+def _get_trash_days_for_candidate(address, zip_code, api_params):
+    """
+    :param address: String of address to find trash day for
+    :param zip_code: zip code the address was found in
+    :param api_params: API parameters of the address found in that zip code
+    :return: array containing trash and recycling days
+    :raises: InvalidAddressError, BadAPIResponse
+    """
+    if not validate_found_address(api_params["name"], address):
+        raise InvalidAddressError
+    # the follow-up question for this zip code needs no address lookup
+    place = recollect_cache.get_place(address, zip_code,
+                                      lambda: dict(api_params))
+    trash_data = recollect_cache.get_schedule(
+        place, lambda: get_trash_day_data(place))
+    if not trash_data:
+        raise BadAPIResponse
+    return get_trash_days_from_trash_data(trash_data)
+
+
+def get_common_trash_days(trash_days_by_zip_code):
+    """
+    :param trash_days_by_zip_code: dictionary returned by
+        get_trash_days_by_zip_code
+    :return: array of trash and recycling days if they were found for
+        every zip code and are the same in all of them, else None
+    """
+    distinct_days = {tuple(days) if days else None
+                     for days in trash_days_by_zip_code.values()}
+    if len(distinct_days) != 1 or None in distinct_days:
+        return None
+    return list(distinct_days.pop())
+
+
+def get_stored_trash_days(session_attributes, address, zip_code):
+    """
+    Returns the trash days found for a zip code when the address was
+    ambiguous, if the session has them
+
+    :param session_attributes: session attributes of the request
+    :param address: String of address to find trash day for
+    :param zip_code: zip code provided by the user, or None
+    :return: array of trash and recycling days, or None if they weren't
+        stored for this address and zip code
+    """
+    stored = session_attributes.get(
+        intent_constants.TRASH_DAYS_BY_ZIP_CODE_KEY)
+    if not stored or not zip_code or stored["address"] != address:
+        return None
+    return stored["trash_days"].get(zip_code)
+
+
 def find_unique_zipcodes(address_request_json):
     """
     Finds unique zip codes in a provided address request json returned
@@ -147,27 +428,26 @@ def validate_found_address(found_address, user_provided_address):
     """
     logger.debug('found_address: ' + str(found_address) +
                  'user_provided_address: ' + str(user_provided_address))
-    address_parser = StreetAddressParser()
-    found_address = address_parser.parse(found_address)
-    user_provided_address = address_parser.parse(user_provided_address)
+    found_address = parse_address(found_address)
+    user_provided_address = parse_address(user_provided_address)
 
-    if found_address["house"] != user_provided_address["house"]:
+    if found_address.house != user_provided_address.house:
         return False
 
-    if found_address["street_name"].lower() != \
-            user_provided_address["street_name"].lower():
+    if found_address.street_name.lower() != \
+            user_provided_address.street_name.lower():
         return False
 
     # Allow for mismatched "Road" street_type between user input and ReCollect API
-    if "rd" in found_address["street_type"].lower() and \
-        "road" in user_provided_address["street_type"].lower():
+    if "rd" in found_address.street_type.lower() and \
+        "road" in user_provided_address.street_type.lower():
         return True
 
     # Allow fuzzy match on street type to allow "ave" to match "avenue"
-    if found_address["street_type"].lower() not in \
-        user_provided_address["street_type"].lower() and \
-        user_provided_address["street_type"].lower() not in \
-            found_address["street_type"].lower():
+    if found_address.street_type.lower() not in \
+        user_provided_address.street_type.lower() and \
+        user_provided_address.street_type.lower() not in \
+            found_address.street_type.lower():
                 return False
 
 
@@ -198,7 +478,7 @@ def get_address_api_info(address, provided_zip_code):
     base_url = "https://recollect.net/api/areas/" \
                "Boston/services/310/address-suggest"
     url_params = {'q': address, 'locale': 'en-US'}
-    request_result = requests.get(base_url, url_params)
+    request_result = http_utils.get(base_url, params=url_params)
 
     if request_result.status_code != requests.codes.ok:
         logger.debug('Error getting ReCollect API info. Got response: {}'
@@ -219,7 +499,10 @@ def get_address_api_info(address, provided_zip_code):
             else:
                 return {}
 
-        raise MultipleAddressError
+        raise MultipleAddressError(candidates={
+            zip_code: result_json[indexes[0]]
+            for zip_code, indexes in unique_zip_codes.items()
+        })
 
     return result_json[0]
 
@@ -237,7 +520,7 @@ def get_trash_day_data(api_parameters):
         api_parameters["formatted_address"] = api_parameters.pop("name")
 
     base_url = "https://recollect.net/api/places"
-    request_result = requests.get(base_url, api_parameters)
+    request_result = http_utils.get(base_url, params=api_parameters)
 
     if request_result.status_code != requests.codes.ok:
         logger.debug("Error getting trash info from ReCollect API info. " \
@@ -247,6 +530,39 @@ def get_trash_day_data(api_parameters):
     return request_result.json()
 
 
+def get_trash_calendar_data(api_parameters, first_day, last_day):
+    """
+    Gets the collection events of a place from the ReCollect events API
+
+    :param api_parameters: Parameters for ReCollect API, with 'place_id'
+        and 'service_id' keys
+    :param first_day: first datetime.date to get events for
+    :param last_day: last datetime.date to get events for
+    :return: TrashCalendar object, or None if the request failed
+    """
+    logger.debug('api_parameters: ' + str(api_parameters) +
+                 ', first_day: ' + str(first_day) +
+                 ', last_day: ' + str(last_day))
+    url = RECOLLECT_EVENTS_URL.format(api_parameters["place_id"],
+                                      api_parameters["service_id"])
+    url_params = {
+        'after': first_day.strftime(trash_calendar.DAY_FORMAT),
+        'before': last_day.strftime(trash_calendar.DAY_FORMAT),
+        'nomerge': 1,
+        'hide': 'reminder_only',
+        'locale': 'en-US'
+    }
+    request_result = http_utils.get(url, params=url_params)
+
+    if request_result.status_code != requests.codes.ok:
+        logger.debug("Error getting trash calendar from ReCollect API. " \
+                     "Got response: {}".format(request_result.status_code))
+        return None
+
+    return TrashCalendar.from_events_json(request_result.json(), first_day,
+                                          last_day)
+
+
 def get_trash_days_from_trash_data(trash_data):
     """
     Parse trash data from ReCollect service and return the trash and recycling
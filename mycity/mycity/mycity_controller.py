@@ -8,18 +8,21 @@ from mycity.mycity_response_data_model import MyCityResponseDataModel
 from .intents.user_address_intent import set_address_in_session, \
     get_address_from_session, request_user_address_response, \
     set_zipcode_in_session, get_address_from_user_device
-from mycity.intents.latest_311_intent import get_311_requests
-from .intents.trash_intent import get_trash_day_info
-from .intents.unhandled_intent import unhandled_intent
-from .intents.get_alerts_intent import get_alerts_intent, get_inclement_weather_alert
-from .intents.snow_parking_intent import get_snow_emergency_parking_intent
-from .intents.feedback_intent import submit_feedback
-from .intents.crime_activity_intent import get_crime_incidents_intent
 from .intents import intent_constants
+from .intents import intent_registry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Intents that ask the user for an address before they are handled
+INTENTS_REQUIRING_ADDRESS = [
+    "TrashDayIntent",
+    "TrashDelayIntent",
+    "NextCollectionIntent",
+    "SnowParkingIntent",
+    "CrimeIncidentsIntent"
+]
+
 
 def execute_request(mycity_request):
     """
@@ -114,36 +117,22 @@ def on_intent(mycity_request):
     # session_attributes = session.get("attributes", {})
     if mycity_request.intent_name == "GetAddressIntent":
         return get_address_from_session(mycity_request)
-    elif mycity_request.intent_name == "TrashDayIntent":
-        return request_user_address_response(mycity_request) \
-            if intent_constants.CURRENT_ADDRESS_KEY \
-            not in mycity_request.session_attributes \
-            else get_trash_day_info(mycity_request)
-    elif mycity_request.intent_name == "SnowParkingIntent":
-        return request_user_address_response(mycity_request) \
-            if intent_constants.CURRENT_ADDRESS_KEY \
-            not in mycity_request.session_attributes \
-            else get_snow_emergency_parking_intent(mycity_request)
-    elif mycity_request.intent_name == "CrimeIncidentsIntent":
-        return request_user_address_response(mycity_request) \
-            if intent_constants.CURRENT_ADDRESS_KEY \
-            not in mycity_request.session_attributes \
-            else get_crime_incidents_intent(mycity_request)
-    elif mycity_request.intent_name == "GetAlertsIntent":
-        return get_alerts_intent(mycity_request)
+    elif mycity_request.intent_name in INTENTS_REQUIRING_ADDRESS and \
+            intent_constants.CURRENT_ADDRESS_KEY \
+            not in mycity_request.session_attributes:
+        return request_user_address_response(mycity_request)
     elif mycity_request.intent_name == "AMAZON.HelpIntent":
         return get_help_response(mycity_request)
     elif mycity_request.intent_name == "AMAZON.StopIntent" or \
             mycity_request.intent_name == "AMAZON.CancelIntent":
         return handle_session_end_request(mycity_request)
-    elif mycity_request.intent_name == "FeedbackIntent":
-        return submit_feedback(mycity_request)
-    elif mycity_request.intent_name == "UnhandledIntent":
-        return unhandled_intent(mycity_request)
-    elif mycity_request.intent_name == "LatestThreeOneOne":
-        return get_311_requests(mycity_request)
-    elif mycity_request.intent_name == "InclementWeatherIntent":
-        return get_inclement_weather_alert(mycity_request)
+    elif intent_registry.is_registered(mycity_request.intent_name):
+        # Intent modules are imported the first time they are used so a
+        # cold start only pays for the intent being requested
+        handler = intent_registry.get_intent_handler(
+            mycity_request.intent_name
+        )
+        return handler(mycity_request)
     else:
         raise ValueError("Invalid intent")
 
@@ -0,0 +1,192 @@
+"""
+Encodes JSON FeatureServer query results as FeatureCollectionPBuffer
+messages (f=pbf), the inverse of mycity.utilities.arcgis_pbf, so fixtures
+and the fake ArcGIS server can serve protocol buffers.
+
+    data = encode_feature_collection({"features": [...]})
+
+read_fixture_features turns the saved query results in test_data (one
+Python list of attribute values followed by the geometry per line) into
+features, with the attributes named field_0, field_1, ...
+"""
+
+import ast
+import struct
+import mycity.utilities.arcgis_pbf as arcgis_pbf
+
+# Quantization step of encoded coordinates, in the units of the geometry
+DEFAULT_SCALE = 1e-7
+
+_GEOMETRY_TYPE_CODES = {name: code for code, name
+                        in arcgis_pbf.GEOMETRY_TYPES.items()}
+_FIELD_TYPE_CODES = {name: code for code, name
+                     in arcgis_pbf.FIELD_TYPES.items()}
+
+
+def _varint(value):
+    encoded = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(number, wire_type):
+    return _varint(number << 3 | wire_type)
+
+
+def _varint_field(number, value):
+    return _key(number, arcgis_pbf.WIRE_VARINT) + _varint(value)
+
+
+def _bytes_field(number, data):
+    return _key(number, arcgis_pbf.WIRE_LENGTH_DELIMITED) + \
+        _varint(len(data)) + data
+
+
+def _double_field(number, value):
+    return _key(number, arcgis_pbf.WIRE_64BIT) + struct.pack("<d", value)
+
+
+def _packed_field(number, values):
+    return _bytes_field(number, b"".join(_varint(value) for value in values))
+
+
+def _encode_value(value):
+    if value is None:
+        return b""
+    if isinstance(value, bool):
+        return _varint_field(9, int(value))
+    if isinstance(value, int):
+        return _varint_field(8, _zigzag(value))
+    if isinstance(value, float):
+        return _double_field(3, value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def _field_type(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return "esriFieldTypeInteger"
+    if isinstance(value, float):
+        return "esriFieldTypeDouble"
+    return "esriFieldTypeString"
+
+
+def _geometry_type(geometry):
+    if "x" in geometry:
+        return "esriGeometryPoint"
+    if "points" in geometry:
+        return "esriGeometryMultipoint"
+    if "paths" in geometry:
+        return "esriGeometryPolyline"
+    return "esriGeometryPolygon"
+
+
+def _geometry_parts(geometry):
+    if "x" in geometry:
+        return [[[geometry["x"], geometry["y"]]]]
+    if "points" in geometry:
+        return [geometry["points"]]
+    return geometry.get("paths") or geometry.get("rings")
+
+
+def _encode_geometry(geometry, translate_x, translate_y, scale):
+    parts = _geometry_parts(geometry)
+    deltas = []
+    previous_x = previous_y = 0
+    for part in parts:
+        for vertex in part:
+            x = int(round((vertex[0] - translate_x) / scale))
+            # upper left origin: y is measured downwards
+            y = int(round((translate_y - vertex[1]) / scale))
+            deltas.extend([_zigzag(x - previous_x), _zigzag(y - previous_y)])
+            previous_x, previous_y = x, y
+    message = b""
+    if "x" not in geometry:
+        message += _packed_field(2, [len(part) for part in parts])
+    return message + _packed_field(3, deltas)
+
+
+def encode_feature_collection(response, scale=DEFAULT_SCALE):
+    """
+    :param response: JSON query result, a dictionary with 'features' and
+        optionally 'exceededTransferLimit' and 'objectIdFieldName'
+    :param scale: quantization step of the encoded coordinates
+    :return: bytes of the FeatureCollectionPBuffer message
+    """
+    features = response.get("features", [])
+    field_names = []
+    field_types = {}
+    for feature in features:
+        for name, value in feature["attributes"].items():
+            if name not in field_types:
+                field_names.append(name)
+                field_types[name] = None
+            if field_types[name] is None and value is not None:
+                field_types[name] = _field_type(value)
+
+    geometries = [feature["geometry"] for feature in features
+                  if feature.get("geometry")]
+    vertices = [vertex for geometry in geometries
+                for part in _geometry_parts(geometry) for vertex in part]
+    translate_x = min([vertex[0] for vertex in vertices], default=0.0)
+    translate_y = max([vertex[1] for vertex in vertices], default=0.0)
+
+    result = b""
+    if "objectIdFieldName" in response:
+        result += _bytes_field(1, response["objectIdFieldName"].encode())
+    if geometries:
+        result += _varint_field(
+            7, _GEOMETRY_TYPE_CODES[_geometry_type(geometries[0])])
+    result += _bytes_field(8, _varint_field(1, 4326))
+    if response.get("exceededTransferLimit"):
+        result += _varint_field(9, 1)
+    transform = _varint_field(1, arcgis_pbf.UPPER_LEFT_ORIGIN) + \
+        _bytes_field(2, _double_field(1, scale) + _double_field(2, scale)) + \
+        _bytes_field(3, _double_field(1, translate_x) +
+                     _double_field(2, translate_y))
+    result += _bytes_field(12, transform)
+    for name in field_names:
+        field_type = field_types[name] or "esriFieldTypeString"
+        result += _bytes_field(13, _bytes_field(1, name.encode("utf-8")) +
+                               _varint_field(2, _FIELD_TYPE_CODES[field_type]))
+    for feature in features:
+        message = b"".join(
+            _bytes_field(1, _encode_value(feature["attributes"][name]))
+            if name in feature["attributes"] else _bytes_field(1, b"")
+            for name in field_names)
+        if feature.get("geometry"):
+            message += _bytes_field(2, _encode_geometry(
+                feature["geometry"], translate_x, translate_y, scale))
+        result += _bytes_field(15, message)
+
+    query_result = _bytes_field(1, result)
+    return _bytes_field(1, b"3.0") + _bytes_field(2, query_result)
+
+
+def read_fixture_features(path):
+    """
+    :param path: path of a saved query result, e.g. test_data/parking_lots
+    :return: list of feature dictionaries with 'attributes' and 'geometry'
+    """
+    features = []
+    with open(path) as fixture:
+        for line in fixture:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            values = ast.literal_eval(line)
+            attributes = {"field_{}".format(index): value
+                          for index, value in enumerate(values[:-1])}
+            features.append({"attributes": attributes,
+                             "geometry": values[-1]})
+    return features
@@ -0,0 +1,114 @@
+"""
+Compares parsing spoken-style addresses with streetaddress's
+StreetAddressParser and with address_parser, uncached and cached: time per
+address, and how many addresses the two parsers split differently.
+
+Run from the project root:
+
+    python -m mycity.test.benchmark_address_parser
+"""
+
+import argparse
+import itertools
+import timeit
+import mycity.utilities.address_parser as address_parser
+from streetaddress import StreetAddressParser
+
+# Addresses the way the PostalAddress slot hears them
+HOUSE_NUMBERS = ["1000", "46", "one", "12 1/2", "5", "221", "three"]
+STREETS = ["Dorchester Avenue", "Everdean Street", "Beacon St",
+           "west first street", "Commonwealth Ave.", "Long Wharf",
+           "Adams Terr", "Blue Hill Avenue", "center street"]
+SUFFIXES = ["", " Boston", " apartment 2", ", Boston, MA 02125",
+            " unit 3 Dorchester MA", " #4"]
+FIELDS = ["house", "street_name", "street_type", "street_full",
+          "suite_type", "suite_num", "other"]
+
+
+def build_corpus():
+    """
+    :return: list of address strings
+    """
+    return ["{} {}{}".format(house, street, suffix) for house, street, suffix
+            in itertools.product(HOUSE_NUMBERS, STREETS, SUFFIXES)]
+
+
+def _best_seconds(function, repeat):
+    """
+    :param function: function to time
+    :param repeat: number of timed runs
+    :return: fastest run in seconds
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def count_differences(corpus):
+    """
+    :param corpus: list of address strings
+    :return: number of addresses the two parsers split differently
+    """
+    parser = StreetAddressParser()
+    differences = 0
+    for address in corpus:
+        expected = parser.parse(address)
+        parsed_address = address_parser.parse_address(address)
+        if any(expected[field] != getattr(parsed_address, field)
+               for field in FIELDS):
+            differences += 1
+    return differences
+
+
+def benchmark(corpus, repeat):
+    """
+    :param corpus: list of address strings
+    :param repeat: number of timed passes over the corpus
+    :return: list of (name, best seconds to parse the corpus)
+    """
+    parser = StreetAddressParser()
+
+    def parse_with_new_parsers():
+        # what each intent did before: a new parser for every parse
+        for address in corpus:
+            StreetAddressParser().parse(address)
+
+    def parse_with_shared_parser():
+        for address in corpus:
+            parser.parse(address)
+
+    def parse_uncached():
+        for address in corpus:
+            address_parser.address_parser.parse(address)
+
+    def parse_cached():
+        for address in corpus:
+            address_parser.parse_address(address)
+
+    address_parser.parse_address.cache_clear()
+    parse_cached()
+    return [
+        ("StreetAddressParser, new per parse",
+         _best_seconds(parse_with_new_parsers, repeat)),
+        ("StreetAddressParser, shared",
+         _best_seconds(parse_with_shared_parser, repeat)),
+        ("address_parser, uncached", _best_seconds(parse_uncached, repeat)),
+        ("address_parser, cached", _best_seconds(parse_cached, repeat))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", "--repeat", type=int, default=20,
+                        help="number of timed passes over the corpus")
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    print("{} addresses, {} split differently by the two parsers".format(
+        len(corpus), count_differences(corpus)))
+    print("{:<36}{:>14}".format("parser", "us / address"))
+    for name, seconds in benchmark(corpus, args.repeat):
+        print("{:<36}{:>14.2f}".format(name,
+                                       seconds / len(corpus) * 1000000))
+
+
+if __name__ == "__main__":
+    main()
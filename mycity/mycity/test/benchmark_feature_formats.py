@@ -0,0 +1,72 @@
+"""
+Compares FeatureServer query results sent as JSON and as protocol buffers
+(f=pbf): payload size and time to decode, on the parking lot (points) and
+open space (polygons) fixtures re-encoded as pbf.
+
+Run from the project root:
+
+    python -m mycity.test.benchmark_feature_formats
+"""
+
+import argparse
+import json
+import timeit
+import mycity.test.test_constants as test_constants
+import mycity.utilities.arcgis_pbf as arcgis_pbf
+from mycity.test.arcgis_pbf_encoder import encode_feature_collection, \
+    read_fixture_features
+
+FIXTURES = (
+    ("parking_lots", test_constants.PARKING_LOTS_TEST_DATA),
+    ("open_spaces_data", test_constants.OPEN_SPACES_TEST_DATA)
+)
+
+
+def _best_seconds(function, repeat):
+    """
+    :param function: function to time
+    :param repeat: number of timed runs
+    :return: fastest run in seconds
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def benchmark_fixture(path, repeat):
+    """
+    :param path: path of a saved query result
+    :param repeat: number of timed decodes of each format
+    :return: Dictionary with the size in bytes and best decode time in
+        seconds of each format
+    """
+    response = {"features": read_fixture_features(path)}
+    json_data = json.dumps(response).encode("utf-8")
+    pbf_data = encode_feature_collection(response)
+    return {
+        "features": len(response["features"]),
+        "json_bytes": len(json_data),
+        "pbf_bytes": len(pbf_data),
+        "json_seconds": _best_seconds(lambda: json.loads(json_data), repeat),
+        "pbf_seconds": _best_seconds(
+            lambda: arcgis_pbf.decode_feature_collection(pbf_data), repeat)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", "--repeat", type=int, default=50,
+                        help="number of timed decodes of each format")
+    args = parser.parse_args()
+
+    print("{:<18}{:>9}{:>12}{:>12}{:>12}{:>12}".format(
+        "fixture", "features", "json bytes", "pbf bytes", "json ms",
+        "pbf ms"))
+    for name, path in FIXTURES:
+        result = benchmark_fixture(path, args.repeat)
+        print("{:<18}{:>9}{:>12}{:>12}{:>12.3f}{:>12.3f}".format(
+            name, result["features"], result["json_bytes"],
+            result["pbf_bytes"], result["json_seconds"] * 1000,
+            result["pbf_seconds"] * 1000))
+
+
+if __name__ == "__main__":
+    main()
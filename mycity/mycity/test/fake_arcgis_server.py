@@ -0,0 +1,193 @@
+"""
+Local stand-in for the ArcGIS REST endpoints used by the app, so the REST
+helpers can be tested without network access.
+
+    server = FakeArcGISServer(features=[...], geocode_candidates=[...])
+    server.start()
+    ...query server.layer_url or server.geocode_url...
+    server.stop()
+
+Every request received is recorded in server.requests as a
+(path, query parameter dictionary) tuple. Layer queries sent with f=pbf are
+answered with protocol buffers, unless the server is created with
+supports_pbf=False. The layer's description reports last_edit_date as its
+editingInfo.lastEditDate.
+"""
+
+import calendar
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+import mycity.utilities.arcgis_pbf as arcgis_pbf
+import mycity.utilities.distance_utils as distance_utils
+from mycity.test.arcgis_pbf_encoder import encode_feature_collection
+
+
+LAYER_PATH = "/arcgis/rest/services/Test/FeatureServer/0"
+GEOCODE_PATH = "/arcgis/rest/services/World/GeocodeServer/findAddressCandidates"
+# "<field> > TIMESTAMP '<UTC time>'", the only where clause the fake layer
+# applies
+EDITED_SINCE = re.compile(r"(\w+) > TIMESTAMP '([^']+)'")
+
+
+class FakeArcGISServer(object):
+
+    def __init__(self, features=None, geocode_candidates=None,
+                 max_record_count=1000, supports_pbf=True,
+                 last_edit_date=None):
+        """
+        :param features: list of feature dictionaries (with 'attributes' and
+            'geometry' keys) served by the fake layer
+        :param geocode_candidates: list of candidates returned by the fake
+            geocoder for every address
+        :param max_record_count: maximum number of features the fake layer
+            returns per query, like a real FeatureServer's maxRecordCount
+        :param supports_pbf: if False, f=pbf queries are answered with a
+            JSON error, like layers of older servers
+        :param last_edit_date: milliseconds since the epoch the layer
+            reports it was last edited at, or None for a layer that doesn't
+            track edits
+        """
+        self.features = features or []
+        self.geocode_candidates = geocode_candidates or []
+        self.max_record_count = max_record_count
+        self.supports_pbf = supports_pbf
+        self.last_edit_date = last_edit_date
+        self.requests = []
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def layer_url(self):
+        return self.base_url + LAYER_PATH
+
+    @property
+    def geocode_url(self):
+        return self.base_url + GEOCODE_PATH
+
+    def start(self):
+        self._httpd = HTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def handle(self, path, params):
+        """
+        Builds the JSON response body for a request
+
+        :param path: path component of the request URL
+        :param params: dictionary of query parameters (single values)
+        :return: dictionary to be serialized as the response body
+        """
+        self.requests.append((path, params))
+        if path == LAYER_PATH + "/query":
+            return self._query(params)
+        if path == LAYER_PATH:
+            description = {"name": "Test", "maxRecordCount":
+                           self.max_record_count}
+            if self.last_edit_date is not None:
+                description["editingInfo"] = {
+                    "lastEditDate": self.last_edit_date}
+            return description
+        if path == GEOCODE_PATH:
+            return {"spatialReference": {"wkid": 4326},
+                    "candidates": self.geocode_candidates}
+        return {"error": {"code": 400, "message": "Invalid URL"}}
+
+    def _query(self, params):
+        if params.get("f") == "pbf" and not self.supports_pbf:
+            return {"error": {"code": 400,
+                              "message": "Invalid or missing input parameters."}}
+        offset = int(params.get("resultOffset", 0))
+        count = min(int(params.get("resultRecordCount",
+                                   self.max_record_count)),
+                    self.max_record_count)
+        out_fields = params.get("outFields", "*")
+        return_geometry = params.get("returnGeometry", "true") == "true"
+
+        features = self.features
+        edited_since = EDITED_SINCE.search(params.get("where", ""))
+        if edited_since is not None:
+            field = edited_since.group(1)
+            since = calendar.timegm(time.strptime(edited_since.group(2),
+                                                  "%Y-%m-%d %H:%M:%S"))
+            features = [feature for feature in features
+                        if feature["attributes"][field] > since * 1000]
+        if params.get("returnIdsOnly") == "true":
+            return {"objectIdFieldName": "OBJECTID",
+                    "objectIds": [feature["attributes"]["OBJECTID"]
+                                  for feature in features]}
+        if "geometry" in params and "distance" in params:
+            # point and distance (in statute miles) spatial filter
+            x, y = (float(value) for value in params["geometry"].split(","))
+            features = [
+                feature for feature in features
+                if distance_utils.haversine_distances(
+                    x, y, [feature["geometry"]["x"]],
+                    [feature["geometry"]["y"]])[0] <=
+                float(params["distance"])
+            ]
+
+        page = []
+        for feature in features[offset:offset + count]:
+            attributes = feature["attributes"]
+            if out_fields != "*":
+                attributes = {field: attributes[field]
+                              for field in out_fields.split(",")}
+            served = {"attributes": attributes}
+            if return_geometry and "geometry" in feature:
+                served["geometry"] = feature["geometry"]
+            page.append(served)
+
+        response = {"features": page}
+        if offset + count < len(features):
+            response["exceededTransferLimit"] = True
+        return response
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                self._respond(url.path, url.query)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                self._respond(urlparse(self.path).path, body)
+
+            def _respond(self, path, query_string):
+                params = {key: values[-1] for key, values
+                          in parse_qs(query_string).items()}
+                response = server.handle(path, params)
+                if params.get("f") == "pbf" and "features" in response:
+                    body = encode_feature_collection(response)
+                    content_type = arcgis_pbf.CONTENT_TYPE
+                else:
+                    body = json.dumps(response).encode("utf-8")
+                    content_type = "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
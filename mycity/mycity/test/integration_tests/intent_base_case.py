@@ -1,7 +1,10 @@
 import unittest
+import unittest.mock as mock
 import mycity.intents.intent_constants as intent_constants
 import mycity.mycity_controller as my_controller
 import mycity.mycity_request_data_model as req
+from mycity.utilities.geocode_cache import geocode_cache
+from mycity.utilities.recollect_cache import recollect_cache
 
 
 ###############################################################################
@@ -23,8 +26,15 @@ class IntentBaseCase(unittest.TestCase):
         key = intent_constants.CURRENT_ADDRESS_KEY
         self.request._session_attributes[key] = "1000 Dorchester Ave"
         self.request.intent_name = self.intent_to_test
+        # keep geocodes from leaking between tests or into /tmp
+        self.geocode_cache_patch = mock.patch.object(geocode_cache,
+                                                     'cache_file', None)
+        self.geocode_cache_patch.start()
+        geocode_cache.clear()
+        recollect_cache.clear()
 
     def tearDown(self):
+        self.geocode_cache_patch.stop()
         self.controller = None
         self.request = None
 
@@ -4,6 +4,7 @@ import mycity.test.integration_tests.intent_test_mixins as mix_ins
 import mycity.test.integration_tests.intent_base_case as base_case
 import mycity.test.test_constants as test_constants
 import mycity.intents.snow_parking_intent as snow_parking
+from mycity.utilities.dataset_cache import CachedDataset
 
 
 
@@ -38,10 +39,10 @@ class SnowEmergencyTestCase(mix_ins.RepromptTextTestMixIn,
                                                       self.csv_file,
                                                       delimiter=','
                                                   )))
-        self.mock_filtered_record = mock.patch(
+        self.mock_fetch_resource = mock.patch(
             ('mycity.intents.snow_parking_intent.'
-             'FinderCSV.file_to_filtered_records'),
-            return_value=mock_filtered_record_return
+             'FinderCSV.fetch_resource'),
+            return_value=CachedDataset(mock_filtered_record_return, "test")
         )
 
         mock_geocoded_address_candidates = \
@@ -73,7 +74,7 @@ class SnowEmergencyTestCase(mix_ins.RepromptTextTestMixIn,
 
         
     
-        self.mock_filtered_record.start()
+        self.mock_fetch_resource.start()
         self.mock_address_candidates.start()
         self.mock_api_access_token.start()
         self.mock_closest_destination.start()
@@ -81,7 +82,7 @@ class SnowEmergencyTestCase(mix_ins.RepromptTextTestMixIn,
     def tearDown(self):
         super().tearDown()
         self.csv_file.close()
-        self.mock_filtered_record.stop()
+        self.mock_fetch_resource.stop()
         self.mock_address_candidates.stop()
         self.mock_api_access_token.stop()
         self.mock_closest_destination.stop()
@@ -1,4 +1,5 @@
 import os
+from mycity.utilities.geocoding_service import Coordinate
 
 # CSV files for testing location_util's csv functions
 PARKING_LOTS_TEST_CSV = os.path.join(
@@ -6,6 +7,25 @@ PARKING_LOTS_TEST_CSV = os.path.join(
     "mycity/test/test_data/Snow_Emergency_Parking.csv"
 )
 
+SAM_ADDRESS_POINTS_TEST_CSV = os.path.join(
+    os.getcwd(),
+    "mycity/test/test_data/SAM_Address_Points.csv"
+)
+
+# Trash and recycling days of a few addresses, in the format of the city's
+# trash schedules by address dataset
+TRASH_SCHEDULES_TEST_CSV = os.path.join(
+    os.getcwd(),
+    "mycity/test/test_data/trash_schedules.csv"
+)
+
+# Small road graph: a two way main road east of the origin, and a side
+# street that is one way back towards it
+ROAD_NETWORK_TEST_CSV = os.path.join(
+    os.getcwd(),
+    "mycity/test/test_data/road_network_edges.csv"
+)
+
 # because getcwd() will be run from project root,
 # we need to append test_data's path
 PARKING_LOTS_TEST_DATA = os.path.join(
@@ -13,6 +33,10 @@ PARKING_LOTS_TEST_DATA = os.path.join(
     "mycity/test/test_data/parking_lots"
 )
 PARKING_LOTS_ADDR_INDEX = 7
+OPEN_SPACES_TEST_DATA = os.path.join(
+    os.getcwd(),
+    "mycity/test/test_data/open_spaces_data"
+)
 
 
 ##################################################################
@@ -406,6 +430,55 @@ GET_TRASH_DAY_MOCK = {
     }
 }
 
+# Trash calendar of 1000 Dorchester Ave: Friday pickups, with Memorial Day
+# delaying the week of 2018-05-28 to Saturday and yard waste every other
+# Friday
+GET_TRASH_CALENDAR_MOCK = {
+    'events': [
+        {
+            'day': '2018-05-04',
+            'zone_id': 5255,
+            'flags': [
+                {'name': 'Trash', 'subject': 'Trash',
+                 'event_type': 'pickup', 'service_name': 'waste'},
+                {'name': 'Recycling', 'subject': 'Recycling',
+                 'event_type': 'pickup', 'service_name': 'waste'}
+            ]
+        },
+        {
+            'day': '2018-05-11',
+            'zone_id': 5255,
+            'flags': [
+                {'name': 'Trash', 'subject': 'Trash',
+                 'event_type': 'pickup', 'service_name': 'waste'},
+                {'name': 'Recycling', 'subject': 'Recycling',
+                 'event_type': 'pickup', 'service_name': 'waste'},
+                {'name': 'YardWaste', 'subject': 'Yard Waste',
+                 'event_type': 'pickup', 'service_name': 'waste'}
+            ]
+        },
+        {
+            'day': '2018-05-28',
+            'zone_id': 5255,
+            'flags': [
+                {'name': 'holiday', 'subject': 'Memorial Day delay',
+                 'event_type': 'special', 'service_name': 'waste'}
+            ]
+        },
+        {
+            'day': '2018-06-02',
+            'zone_id': 5255,
+            'flags': [
+                {'name': 'Trash', 'subject': 'Trash',
+                 'event_type': 'pickup', 'service_name': 'waste'},
+                {'name': 'Recycling', 'subject': 'Recycling',
+                 'event_type': 'pickup', 'service_name': 'waste'}
+            ]
+        },
+        {'zone_id': 5255, 'flags': []}
+    ]
+}
+
 
 
 
@@ -891,6 +964,11 @@ TOP_ADDRESS_CANDIDATE = {
         'x': -71.05664413015762, 
         'y': 42.31649037829649}
 
+ORIGIN_COORDINATE = Coordinate(
+        x=TOP_ADDRESS_CANDIDATE['x'],
+        y=TOP_ADDRESS_CANDIDATE['y'],
+        address=TOP_ADDRESS_CANDIDATE['address'])
+
 ARCGIS_CLOSEST_DESTINATION = {'Address': '8-20 Belden St Boston, MA', 'Driving_time': '3.65 minutes', 'Driving_distance': '0.73 miles'}
 
 ARCGIS_API_ACCESS_TOKEN="FAKE-ABCD"
@@ -3,6 +3,8 @@ import unittest.mock as mock
 import mycity.intents.intent_constants as intent_constants
 import mycity.mycity_controller as my_controller
 import mycity.mycity_request_data_model as my_req
+from mycity.utilities.geocode_cache import geocode_cache
+from mycity.utilities.recollect_cache import recollect_cache
 
 
 class BaseTestCase(unittest.TestCase):
@@ -10,8 +12,15 @@ class BaseTestCase(unittest.TestCase):
     def setUp(self):
         self.controller = my_controller
         self.request = my_req.MyCityRequestDataModel()
+        # keep geocodes from leaking between tests or into /tmp
+        self.geocode_cache_patch = mock.patch.object(geocode_cache,
+                                                     'cache_file', None)
+        self.geocode_cache_patch.start()
+        geocode_cache.clear()
+        recollect_cache.clear()
         
     def tearDown(self):
+        self.geocode_cache_patch.stop()
         self.controller = None
         self.request = None
 
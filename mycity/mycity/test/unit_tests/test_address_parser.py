@@ -0,0 +1,61 @@
+import mycity.test.unit_tests.base as base
+import mycity.utilities.address_parser as address_parser
+from mycity.utilities.address_parser import parse_address
+from streetaddress import StreetAddressParser
+
+
+class AddressParserTestCase(base.BaseTestCase):
+
+    def test_parse(self):
+        parsed_address = parse_address(
+            "1000 Dorchester Avenue, Boston, MA 02125")
+        self.assertEqual("1000", parsed_address.house)
+        self.assertEqual("Dorchester", parsed_address.street_name)
+        self.assertEqual("Avenue", parsed_address.street_type)
+        self.assertEqual("Dorchester Avenue", parsed_address.street_full)
+        self.assertEqual("Boston MA 02125", parsed_address.other)
+        self.assertEqual("dorchester ave", parsed_address.street)
+        self.assertEqual("02125", parsed_address.zip_code)
+
+    def test_matches_street_address_parser(self):
+        fields = ["house", "street_name", "street_type", "street_full",
+                  "suite_type", "suite_num", "other"]
+        parser = StreetAddressParser()
+        for address in ["46 Everdean St.", "12 1/2 Beacon Street apt 3",
+                        "one Beacon St Boston", "5 West 1st Street",
+                        "1st Street", "Boston City Hall", ""]:
+            expected = parser.parse(address)
+            parsed_address = parse_address(address)
+            for field in fields:
+                self.assertEqual(expected[field],
+                                 getattr(parsed_address, field),
+                                 "{} of {!r}".format(field, address))
+
+    def test_boston_street_suffixes(self):
+        parsed_address = parse_address("60 Long Wharf")
+        self.assertEqual("Wharf", parsed_address.street_type)
+        self.assertEqual("long whf", parsed_address.street)
+        self.assertEqual("adams ter", parse_address("3 Adams Terr").street)
+
+    def test_suite_number_with_hash(self):
+        parsed_address = parse_address("1 Beacon St #4 Boston")
+        self.assertEqual("#", parsed_address.suite_type)
+        self.assertEqual("4", parsed_address.suite_num)
+        self.assertEqual("Boston", parsed_address.other)
+
+    def test_key_is_the_same_for_different_spellings(self):
+        self.assertEqual("1000 dorchester ave boston ma",
+                         parse_address("1000 dorchester avenue, Boston, MA")
+                         .key)
+        self.assertEqual(parse_address("5 West 1st Street").key,
+                         parse_address("5 w 1st st").key)
+        self.assertEqual("boston city hall",
+                         parse_address(" Boston  City Hall").key)
+
+    def test_results_are_cached(self):
+        address_parser.parse_address.cache_clear()
+        first = parse_address("46 Everdean St")
+        self.assertIs(first, parse_address("46 Everdean St"))
+        self.assertEqual(1, address_parser.parse_address.cache_info().hits)
+        with self.assertRaises(AttributeError):
+            first.house = "48"
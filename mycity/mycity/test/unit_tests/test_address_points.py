@@ -0,0 +1,79 @@
+import unittest.mock as mock
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+from mycity.utilities.address_points import AddressPointIndex
+from mycity.utilities.geocode_cache import GeocodeCache
+from mycity.utilities.geocoding_service import ArcGISGeocoder, \
+    Coordinate, GeocodingService, SAMGeocoder
+
+
+class AddressPointIndexTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = AddressPointIndex.from_csv_file(
+            test_constants.SAM_ADDRESS_POINTS_TEST_CSV)
+
+    def test_lookup_with_zip_code(self):
+        self.assertEqual(
+            (-71.06411130, 42.35859880, "1 Beacon St"),
+            self.index.lookup("1 Beacon Street Boston MA 02108")
+        )
+        self.assertEqual(
+            (-71.14032611, 42.34981226, "1 Beacon St"),
+            self.index.lookup("1 Beacon St, Brighton, MA 02135")
+        )
+
+    def test_lookup_without_zip_code(self):
+        self.assertEqual(
+            (-71.05664413, 42.31649038, "1000 Dorchester Ave"),
+            self.index.lookup("1000 dorchester ave Boston MA")
+        )
+
+    def test_street_in_several_zip_codes_needs_zip_code(self):
+        self.assertIsNone(self.index.lookup("1 Beacon St Boston MA"))
+
+    def test_zip_code_without_leading_zero(self):
+        self.assertEqual((-71.13117064, 42.35351814, "46 Everdean St"),
+                         self.index.lookup("46 Everdean St. Boston MA 02122"))
+
+    def test_house_number_range_and_direction(self):
+        self.assertIsNotNone(self.index.lookup("8-20 Belden St Boston MA"))
+        self.assertIsNotNone(self.index.lookup("5 West 1st St Boston MA"))
+
+    def test_misses(self):
+        self.assertIsNone(self.index.lookup("1002 Dorchester Ave Boston MA"))
+        self.assertIsNone(self.index.lookup("7 Nowhere Rd Boston MA"))
+        self.assertIsNone(self.index.lookup("Boston City Hall"))
+
+
+class SAMGeocoderTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.arcgis = mock.Mock(spec=ArcGISGeocoder)
+        self.arcgis.name = "ArcGIS"
+        self.service = GeocodingService(
+            [SAMGeocoder(test_constants.SAM_ADDRESS_POINTS_TEST_CSV),
+             self.arcgis],
+            cache=GeocodeCache(cache_file=None)
+        )
+
+    def test_address_points_are_used_before_arcgis(self):
+        coordinate = self.service.geocode("1000 Dorchester Ave Boston MA")
+        self.assertEqual(Coordinate(-71.05664413, 42.31649038,
+                                    "1000 Dorchester Ave"), coordinate)
+        self.arcgis.geocode.assert_not_called()
+
+    def test_misses_fall_back_to_arcgis(self):
+        self.arcgis.geocode.return_value = test_constants.ORIGIN_COORDINATE
+        coordinate = self.service.geocode("1002 Dorchester Ave Boston MA")
+        self.assertEqual(test_constants.ORIGIN_COORDINATE, coordinate)
+
+    def test_missing_file_falls_back_to_arcgis(self):
+        self.arcgis.geocode.return_value = test_constants.ORIGIN_COORDINATE
+        service = GeocodingService([SAMGeocoder("/no/such/file.csv"),
+                                    self.arcgis],
+                                   cache=GeocodeCache(cache_file=None))
+        self.assertEqual(test_constants.ORIGIN_COORDINATE,
+                         service.geocode("1000 Dorchester Ave Boston MA"))
@@ -16,3 +16,14 @@ class AddressUtilitiesTestCase(base.BaseTestCase):
     def test_build_origin_address_with_normal_address(self):
         self.change_address("46 Everdean St.")
         self.compare_built_address("46 Everdean St Boston MA")
+
+    def test_normalize_address_matches_different_spellings(self):
+        self.assertEqual(
+            address_utils.normalize_address("1000 Dorchester Ave Boston MA"),
+            address_utils.normalize_address(
+                "1000 dorchester avenue, Boston, MA")
+        )
+
+    def test_normalize_address_without_house_number(self):
+        self.assertEqual("boston city hall",
+                         address_utils.normalize_address(" Boston  City Hall"))
@@ -0,0 +1,174 @@
+import unittest.mock as mock
+import mycity.test.fake_arcgis_server as fake_arcgis_server
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.arcgis_pbf as arcgis_pbf
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.gis_utils as gis_utils
+from mycity.test.arcgis_pbf_encoder import encode_feature_collection, \
+    read_fixture_features
+
+SCALE = 1e-7
+
+
+def _vertices(geometry):
+    if "x" in geometry:
+        return [[geometry["x"], geometry["y"]]]
+    return [vertex for part in geometry["rings"] for vertex in part]
+
+
+class ArcGISPbfTestCase(base.BaseTestCase):
+
+    def _assert_round_trip(self, features):
+        decoded = arcgis_pbf.decode_feature_collection(
+            encode_feature_collection({"features": features}, scale=SCALE))
+        self.assertEqual(len(features), len(decoded["features"]))
+        for feature, decoded_feature in zip(features, decoded["features"]):
+            self.assertEqual(feature["attributes"],
+                             decoded_feature["attributes"])
+            self.assertEqual(set(feature["geometry"]),
+                             set(decoded_feature["geometry"]))
+            for vertex, decoded_vertex in zip(
+                    _vertices(feature["geometry"]),
+                    _vertices(decoded_feature["geometry"])):
+                self.assertAlmostEqual(vertex[0], decoded_vertex[0],
+                                       delta=SCALE)
+                self.assertAlmostEqual(vertex[1], decoded_vertex[1],
+                                       delta=SCALE)
+        return decoded
+
+    def test_parking_lots_round_trip(self):
+        features = read_fixture_features(
+            test_constants.PARKING_LOTS_TEST_DATA)
+        decoded = self._assert_round_trip(features)
+        self.assertEqual("esriGeometryPoint", decoded["geometryType"])
+        self.assertEqual({"name": "field_2", "type": "esriFieldTypeInteger",
+                          "alias": ""}, decoded["fields"][2])
+
+    def test_open_spaces_round_trip(self):
+        features = read_fixture_features(
+            test_constants.OPEN_SPACES_TEST_DATA)
+        decoded = self._assert_round_trip(features)
+        self.assertEqual("esriGeometryPolygon", decoded["geometryType"])
+        self.assertEqual(
+            [len(ring) for ring in features[0]["geometry"]["rings"]],
+            [len(ring) for ring
+             in decoded["features"][0]["geometry"]["rings"]])
+
+    def test_exceeded_transfer_limit(self):
+        data = encode_feature_collection({"features": [],
+                                          "exceededTransferLimit": True})
+        decoded = arcgis_pbf.decode_feature_collection(data)
+        self.assertTrue(decoded["exceededTransferLimit"])
+        self.assertEqual([], decoded["features"])
+
+    def test_truncated_message(self):
+        features = read_fixture_features(
+            test_constants.PARKING_LOTS_TEST_DATA)
+        data = encode_feature_collection({"features": features})
+        with self.assertRaises(arcgis_pbf.PbfDecodeError):
+            arcgis_pbf.decode_feature_collection(data[:len(data) // 2])
+
+    def test_message_without_feature_result(self):
+        with self.assertRaises(arcgis_pbf.PbfDecodeError):
+            arcgis_pbf.decode_feature_collection(b'{"error": {}}')
+
+
+class QueryFeatureLayerPbfTestCase(base.BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = fake_arcgis_server.FakeArcGISServer(
+            features=read_fixture_features(
+                test_constants.PARKING_LOTS_TEST_DATA),
+            max_record_count=5
+        )
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        super().setUp()
+        self.server.requests.clear()
+        self.server.supports_pbf = True
+        self.json_only_layers_patch = mock.patch.object(
+            arcgis_utils, '_json_only_layers', set())
+        self.json_only_layers_patch.start()
+
+    def tearDown(self):
+        self.json_only_layers_patch.stop()
+        super().tearDown()
+
+    def _query(self):
+        return arcgis_utils.query_feature_layer(
+            self.server.layer_url,
+            response_format=arcgis_utils.PBF_FORMAT)
+
+    def test_pbf_pages_match_json(self):
+        features = self._query()
+        self.assertEqual(["pbf"] * 4, [params["f"] for _, params
+                                       in self.server.requests])
+        json_features = arcgis_utils.query_feature_layer(
+            self.server.layer_url)
+        self.assertEqual(17, len(features))
+        self.assertEqual([feature["attributes"] for feature
+                          in json_features],
+                         [feature["attributes"] for feature in features])
+
+    def test_falls_back_to_json(self):
+        self.server.supports_pbf = False
+        features = self._query()
+        self.assertEqual(17, len(features))
+        self.assertEqual(["pbf", "json", "json", "json", "json"],
+                         [params["f"] for _, params in self.server.requests])
+        # the layer isn't asked for pbf again
+        self.server.requests.clear()
+        self._query()
+        self.assertNotIn("pbf", [params["f"] for _, params
+                                 in self.server.requests])
+
+    def test_falls_back_to_json_when_decoding_fails(self):
+        with mock.patch.object(
+                arcgis_pbf, 'decode_feature_collection',
+                side_effect=arcgis_pbf.PbfDecodeError("Truncated varint")):
+            features = self._query()
+        self.assertEqual(17, len(features))
+        self.assertEqual("json", self.server.requests[-1][1]["f"])
+        # a bad response doesn't mean the layer can't send pbf
+        self.server.requests.clear()
+        self._query()
+        self.assertEqual("pbf", self.server.requests[0][1]["f"])
+
+    def test_falls_back_to_json_on_http_error(self):
+        get = arcgis_utils.http_utils.get
+
+        def fail_pbf(url, params=None, **kwargs):
+            if params.get("f") == "pbf":
+                return self._mock_response(status=503)
+            return get(url, params=params, **kwargs)
+
+        with mock.patch.object(arcgis_utils.http_utils, 'get',
+                               side_effect=fail_pbf):
+            features = self._query()
+        self.assertEqual(17, len(features))
+        self.assertEqual(["json"] * 4, [params["f"] for _, params
+                                        in self.server.requests])
+        self.assertNotIn(self.server.layer_url + "/query",
+                         arcgis_utils._json_only_layers)
+
+    def test_query_errors_do_not_mark_layer_json_only(self):
+        features = arcgis_utils.query_feature_layer(
+            self.server.base_url + "/not/a/layer",
+            response_format=arcgis_utils.PBF_FORMAT)
+        self.assertIsNone(features)
+        self.assertEqual(set(), arcgis_utils._json_only_layers)
+
+    def test_get_features_from_feature_server_as_pbf(self):
+        features = gis_utils.get_features_from_feature_server(
+            self.server.layer_url, "1=1",
+            response_format=arcgis_utils.PBF_FORMAT)
+        self.assertEqual(17, len(features))
+        self.assertEqual({"pbf"}, {params["f"] for _, params
+                                   in self.server.requests})
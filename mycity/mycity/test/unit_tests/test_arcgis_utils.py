@@ -0,0 +1,177 @@
+import threading
+import time
+import unittest.mock as mock
+import mycity.test.fake_arcgis_server as fake_arcgis_server
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.gis_utils as gis_utils
+from mycity.utilities.geocoding_service import Coordinate
+
+
+def _make_features(count):
+    return [
+        {
+            "attributes": {"OBJECTID": i, "Name": "Lot {}".format(i),
+                           "Address": "{} Fake St".format(i)},
+            "geometry": {"x": -71.0 - i / 1000, "y": 42.3 + i / 1000}
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class ArcGISUtilitiesTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = fake_arcgis_server.FakeArcGISServer(
+            features=_make_features(25),
+            geocode_candidates=
+                test_constants.GEOCODE_ADDRESS_CANDIDATES['candidates'],
+            max_record_count=10
+        )
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        super().tearDown()
+
+    def test_query_feature_layer_follows_pages(self):
+        features = arcgis_utils.query_feature_layer(self.server.layer_url,
+                                                    page_size=10)
+        self.assertEqual(25, len(features))
+        self.assertEqual(
+            list(range(1, 26)),
+            [feature["attributes"]["OBJECTID"] for feature in features]
+        )
+        offsets = [params["resultOffset"] for _, params
+                   in self.server.requests]
+        self.assertEqual(["0", "10", "20"], offsets)
+
+    def test_query_feature_layer_selects_out_fields(self):
+        features = arcgis_utils.query_feature_layer(
+            self.server.layer_url,
+            out_fields=["Name", "Address"],
+            return_geometry=False
+        )
+        self.assertEqual({"Name", "Address"},
+                         set(features[0]["attributes"].keys()))
+        self.assertNotIn("geometry", features[0])
+
+    def test_query_feature_layer_with_error(self):
+        features = arcgis_utils.query_feature_layer(
+            self.server.base_url + "/not/a/layer"
+        )
+        self.assertIsNone(features)
+
+    def test_get_features_from_feature_server(self):
+        features = gis_utils.get_features_from_feature_server(
+            self.server.layer_url,
+            "1=1"
+        )
+        self.assertEqual(25, len(features))
+        self.assertIn("geometry", features[0])
+
+    def test_geocode_address(self):
+        with mock.patch.object(arcgis_utils, 'ARCGIS_GEOCODE_URL',
+                               self.server.geocode_url):
+            coordinates = gis_utils.geocode_address("1000 Dorchester Ave")
+        self.assertEqual([test_constants.TOP_ADDRESS_CANDIDATE['x'],
+                          test_constants.TOP_ADDRESS_CANDIDATE['y']],
+                         coordinates)
+        _, params = self.server.requests[-1]
+        self.assertEqual("1000 Dorchester Ave, Boston, MA",
+                         params["singleLine"])
+
+
+class ArcGISTokenManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0
+        self.fetch_count = 0
+
+        def fake_fetch():
+            self.fetch_count += 1
+            return ("TOKEN-{}".format(self.fetch_count), 600)
+
+        self.manager = arcgis_utils.ArcGISTokenManager(
+            fetch_token=fake_fetch,
+            clock=lambda: self.now,
+            expiry_margin=60
+        )
+
+    def test_token_is_reused_until_near_expiry(self):
+        self.assertEqual("TOKEN-1", self.manager.get_token())
+        self.now = 539
+        self.assertEqual("TOKEN-1", self.manager.get_token())
+        self.now = 540
+        self.assertEqual("TOKEN-2", self.manager.get_token())
+        self.assertEqual(2, self.fetch_count)
+
+    def test_concurrent_requests_refresh_once(self):
+        started = threading.Event()
+
+        def slow_fetch():
+            started.wait()
+            time.sleep(0.05)
+            self.fetch_count += 1
+            return ("TOKEN-{}".format(self.fetch_count), 600)
+
+        self.manager._fetch_token = slow_fetch
+        tokens = []
+        threads = [
+            threading.Thread(
+                target=lambda: tokens.append(self.manager.get_token()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, self.fetch_count)
+        self.assertEqual(["TOKEN-1"] * 8, tokens)
+
+    def test_invalidate_keeps_newer_token(self):
+        self.manager.get_token()
+        self.manager.invalidate()
+        self.assertEqual("TOKEN-2", self.manager.get_token())
+        self.manager.invalidate("TOKEN-1")
+        self.assertEqual("TOKEN-2", self.manager.get_token())
+
+    def test_failed_fetch_is_not_cached(self):
+        self.manager._fetch_token = lambda: (None, 0)
+        self.assertIsNone(self.manager.get_token())
+        self.assertIsNone(self.manager._token)
+
+    def test_find_closest_route_retries_invalid_token_once(self):
+        invalid = self._mock_response(
+            json_data={"error": {"code": 498, "message": "Invalid token"}})
+        valid = self._mock_response(json_data={"routes": {"features": [
+            {"attributes": {"FacilityID": 1, "Total_TravelTime": 3.654,
+                            "Total_Miles": 0.7312}}
+        ]}})
+        origin = Coordinate(-71.05, 42.31, "1000 Dorchester Ave")
+        destinations = {("-71.06", "42.32"): "8-20 Belden St Boston, MA"}
+        with mock.patch.object(arcgis_utils, "token_manager", self.manager), \
+                mock.patch.object(arcgis_utils, "_post_request",
+                                  side_effect=[invalid, valid]) as mock_post:
+            result = arcgis_utils.find_closest_route("EXPIRED", origin,
+                                                     destinations)
+        self.assertEqual(2, mock_post.call_count)
+        self.assertIn(b"TOKEN-1", mock_post.call_args[0][1])
+        self.assertEqual("8-20 Belden St Boston, MA", result["Address"])
+        self.assertEqual("3.65 minutes", result["Driving_time"])
+
+    def test_find_closest_route_does_not_retry_twice(self):
+        invalid = self._mock_response(status=498, json_data={})
+        origin = Coordinate(-71.05, 42.31, "1000 Dorchester Ave")
+        destinations = {("-71.06", "42.32"): "8-20 Belden St Boston, MA"}
+        with mock.patch.object(arcgis_utils, "token_manager", self.manager), \
+                mock.patch.object(arcgis_utils, "_post_request",
+                                  return_value=invalid) as mock_post:
+            result = arcgis_utils.find_closest_route("EXPIRED", origin,
+                                                     destinations)
+        self.assertEqual(2, mock_post.call_count)
+        self.assertIsNone(result)
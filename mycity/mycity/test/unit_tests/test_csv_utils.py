@@ -1,3 +1,4 @@
+import codecs
 import csv
 import collections
 import mycity.test.test_constants as test_constants
@@ -107,3 +108,43 @@ class CSVUtilitiesTestCase(base.BaseTestCase):
         ]
         to_test = csv_utils.map_attribute_to_records('Address', records)
         self.assertEqual(records[0], to_test['1000 Dorchester Ave'])
+
+    def _chunks(self, data, size):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_get_declared_encoding(self):
+        self.assertEqual('ISO-8859-1', csv_utils.get_declared_encoding(
+            {'Content-Type': 'text/csv; charset="ISO-8859-1"'}))
+        self.assertIsNone(csv_utils.get_declared_encoding(
+            {'Content-Type': 'text/csv'}))
+
+    def test_detect_encoding_prefers_byte_order_mark(self):
+        self.assertEqual('utf-8-sig', csv_utils.detect_encoding(
+            codecs.BOM_UTF8 + b'X,Y', 'latin-1'))
+        self.assertEqual('latin-1',
+                         csv_utils.detect_encoding(b'X,Y', 'latin-1'))
+        self.assertEqual('utf-8', csv_utils.detect_encoding(b'X,Y'))
+
+    def test_iter_csv_records_matches_csv_reader(self):
+        test_file = test_constants.PARKING_LOTS_TEST_CSV
+        with open(test_file, encoding='utf-8-sig', newline='') as f:
+            expected = [dict(row) for row in csv.DictReader(f)]
+        with open(test_file, 'rb') as f:
+            data = f.read()
+        # small chunks split lines and multi-byte characters
+        records = list(csv_utils.iter_csv_records(self._chunks(data, 7)))
+        self.assertEqual(expected, records)
+
+    def test_iter_csv_records_with_quoted_newlines_and_utf16(self):
+        text = 'Name,Comments\r\nLot 1,"Open\r\nlate"\r\nCafé,none'
+        data = text.encode('utf-16')
+        records = list(csv_utils.iter_csv_records(self._chunks(data, 5)))
+        self.assertEqual([{'Name': 'Lot 1', 'Comments': 'Open\r\nlate'},
+                          {'Name': 'Café', 'Comments': 'none'}], records)
+
+    def test_iter_csv_records_is_lazy(self):
+        def chunks():
+            yield b'X,Y\n1,2\n'
+            raise AssertionError('read past the first record')
+        records = csv_utils.iter_csv_records(chunks())
+        self.assertEqual({'X': '1', 'Y': '2'}, next(records))
@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest.mock as mock
+import requests
+import mycity.test.unit_tests.base as base
+from mycity.utilities.dataset_cache import DatasetCache
+from mycity.utilities.record_store import RecordStore
+
+
+FAKE_URL = "http://www.fake.com/dataset.csv"
+RECORDS = [{'Name': 'Lot 1', 'Address': '1 Fake St'}]
+
+
+class DatasetCacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000
+        self.directory = tempfile.mkdtemp()
+        self.cache = DatasetCache(cache_directory=self.directory,
+                                  ttl_seconds=60,
+                                  clock=lambda: self.now)
+        self.parse = mock.Mock(return_value=RECORDS)
+        self.get_patch = mock.patch('mycity.utilities.http_utils.get')
+        self.mock_get = self.get_patch.start()
+
+    def tearDown(self):
+        self.get_patch.stop()
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def _response(self, status, headers=None):
+        response = self._mock_response(status=status)
+        response.headers = headers or {}
+        return response
+
+    def test_dataset_is_downloaded_once_within_ttl(self):
+        self.mock_get.return_value = self._response(200, {'ETag': '"v1"'})
+        first = self.cache.get(FAKE_URL, self.parse)
+        self.now += 59
+        second = self.cache.get(FAKE_URL, self.parse)
+        self.assertEqual(RECORDS, second.records)
+        self.assertEqual(first.version, second.version)
+        self.assertEqual(1, self.mock_get.call_count)
+        self.assertEqual(1, self.parse.call_count)
+
+    def test_expired_dataset_is_revalidated_with_conditional_get(self):
+        self.mock_get.return_value = self._response(
+            200, {'ETag': '"v1"', 'Last-Modified': 'Mon, 03 Dec 2018'})
+        first = self.cache.get(FAKE_URL, self.parse)
+        self.now += 61
+        self.mock_get.return_value = self._response(304)
+        second = self.cache.get(FAKE_URL, self.parse)
+        headers = self.mock_get.call_args[1]['headers']
+        self.assertEqual('"v1"', headers['If-None-Match'])
+        self.assertEqual('Mon, 03 Dec 2018', headers['If-Modified-Since'])
+        self.assertEqual(1, self.parse.call_count)
+        self.assertEqual(first, second)
+
+    def test_new_container_reads_cache_file(self):
+        self.mock_get.return_value = self._response(200)
+        first = self.cache.get(FAKE_URL, self.parse)
+        other_container = DatasetCache(cache_directory=self.directory,
+                                       ttl_seconds=60,
+                                       clock=lambda: self.now)
+        second = other_container.get(FAKE_URL, self.parse)
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.mock_get.call_count)
+
+    def test_stale_dataset_is_served_when_download_fails(self):
+        self.mock_get.return_value = self._response(200)
+        first = self.cache.get(FAKE_URL, self.parse)
+        self.now += 61
+        self.mock_get.side_effect = requests.exceptions.ConnectionError
+        self.assertEqual(first, self.cache.get(FAKE_URL, self.parse))
+
+    def test_failed_download_without_cache(self):
+        self.mock_get.return_value = self._response(500)
+        self.assertIsNone(self.cache.get(FAKE_URL, self.parse))
+
+    def _streamed_response(self, body):
+        response = self._response(200)
+        response.iter_content = mock.Mock(
+            side_effect=lambda chunk_size=1: iter([body[:4], body[4:]]))
+        return response
+
+    def _parse_streamed(self, response):
+        return [{'Body': b"".join(response.iter_content(chunk_size=4))
+                 .decode("utf-8")}]
+
+    def test_changed_dataset_gets_new_version(self):
+        self.mock_get.return_value = self._streamed_response(b"Lot 1")
+        first = self.cache.get(FAKE_URL, self._parse_streamed)
+        self.now += 61
+        self.mock_get.return_value = self._streamed_response(b"Lot 2")
+        second = self.cache.get(FAKE_URL, self._parse_streamed)
+        self.assertEqual([{'Body': 'Lot 2'}], second.records)
+        self.assertNotEqual(first.version, second.version)
+
+    def test_unchanged_body_keeps_version(self):
+        self.mock_get.return_value = self._streamed_response(b"Lot 1")
+        first = self.cache.get(FAKE_URL, self._parse_streamed)
+        self.now += 61
+        self.mock_get.return_value = self._streamed_response(b"Lot 1")
+        second = self.cache.get(FAKE_URL, self._parse_streamed)
+        self.assertEqual(first.version, second.version)
+
+    def test_version_comes_from_etag(self):
+        self.mock_get.return_value = self._response(200, {'ETag': '"v1"'})
+        first = self.cache.get(FAKE_URL, self.parse)
+        self.now += 61
+        self.mock_get.return_value = self._response(200, {'ETag': '"v2"'})
+        second = self.cache.get(FAKE_URL, self.parse)
+        self.assertNotEqual(first.version, second.version)
+
+    def test_revalidation_is_saved_to_cache_file(self):
+        self.mock_get.return_value = self._response(200, {'ETag': '"v1"'})
+        self.cache.get(FAKE_URL, self.parse)
+        self.now += 61
+        self.mock_get.return_value = self._response(304)
+        self.cache.get(FAKE_URL, self.parse)
+        other_container = DatasetCache(cache_directory=self.directory,
+                                       ttl_seconds=60,
+                                       clock=lambda: self.now)
+        other_container.get(FAKE_URL, self.parse)
+        self.assertEqual(2, self.mock_get.call_count)
+
+    def test_get_or_load(self):
+        load = mock.Mock(return_value=RECORDS)
+        self.cache.get_or_load("features", load)
+        dataset = self.cache.get_or_load("features", load)
+        self.assertEqual(RECORDS, dataset.records)
+        self.assertEqual(1, load.call_count)
+
+    def test_least_recently_used_dataset_is_dropped(self):
+        cache = DatasetCache(cache_directory=self.directory, max_entries=2,
+                             clock=lambda: self.now)
+        load = mock.Mock(return_value=RECORDS)
+        for key in ("a", "b", "a", "c"):
+            cache.get_or_load(key, load, persist=False)
+        self.assertEqual(3, load.call_count)
+        cache.get_or_load("a", load, persist=False)
+        self.assertEqual(3, load.call_count)
+        cache.get_or_load("b", load, persist=False)
+        self.assertEqual(4, load.call_count)
+
+    def test_datasets_not_persisted_have_no_cache_file(self):
+        self.cache.get_or_load("near", lambda: RECORDS, persist=False)
+        self.assertEqual([], os.listdir(self.directory))
+
+    def _load_in_background(self, key, records):
+        """
+        Starts loading key on another thread, returning once the load is
+        under way. The load finishes when the returned event is set
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            started.set()
+            release.wait(5)
+            return records
+        thread = threading.Thread(target=self.cache.get_or_load,
+                                  args=(key, load))
+        thread.start()
+        started.wait(5)
+        return thread, release
+
+    def test_slow_load_does_not_block_other_datasets(self):
+        slow, release = self._load_in_background("slow", RECORDS)
+        try:
+            dataset = self.cache.get_or_load("fast", lambda: RECORDS)
+            self.assertEqual(RECORDS, dataset.records)
+            self.assertTrue(slow.is_alive())
+        finally:
+            release.set()
+            slow.join()
+
+    def test_stale_copy_is_served_while_dataset_is_refreshed(self):
+        self.cache.get_or_load("features", lambda: RECORDS)
+        self.now += 61
+        refresh, release = self._load_in_background("features",
+                                                    [{'Name': 'Lot 2'}])
+        load = mock.Mock(return_value=[])
+        try:
+            dataset = self.cache.get_or_load("features", load)
+            self.assertEqual(RECORDS, dataset.records)
+            load.assert_not_called()
+        finally:
+            release.set()
+            refresh.join()
+        self.assertEqual([{'Name': 'Lot 2'}],
+                         self.cache.get_or_load("features", load).records)
+
+    def test_record_store_is_written_to_cache_file_by_column(self):
+        self.mock_get.return_value = self._response(200)
+        self.parse.return_value = RecordStore.from_records(RECORDS)
+        first = self.cache.get(FAKE_URL, self.parse)
+        other_container = DatasetCache(cache_directory=self.directory,
+                                       ttl_seconds=60,
+                                       clock=lambda: self.now)
+        second = other_container.get(FAKE_URL, self.parse)
+        self.assertIsInstance(second.records, RecordStore)
+        self.assertEqual(first.version, second.version)
+        self.assertEqual(RECORDS, [record.as_dict()
+                                   for record in second.records])
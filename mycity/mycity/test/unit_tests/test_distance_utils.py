@@ -0,0 +1,43 @@
+import numpy as np
+import mycity.test.unit_tests.base as base
+import mycity.utilities.distance_utils as distance_utils
+
+
+class DistanceUtilitiesTestCase(base.BaseTestCase):
+
+    # Boston Common and Fenway Park are about 1.7 miles apart
+    BOSTON_COMMON = (-71.0655, 42.3550)
+    FENWAY_PARK = (-71.0972, 42.3467)
+
+    def test_haversine_distances(self):
+        distances = distance_utils.haversine_distances(
+            self.BOSTON_COMMON[0], self.BOSTON_COMMON[1],
+            [self.BOSTON_COMMON[0], self.FENWAY_PARK[0]],
+            [self.BOSTON_COMMON[1], self.FENWAY_PARK[1]]
+        )
+        self.assertAlmostEqual(0, distances[0])
+        self.assertAlmostEqual(1.72, distances[1], places=2)
+
+    def test_nearest_indices_orders_by_distance(self):
+        xs = [-71.20, -71.07, -71.10, -71.0656]
+        ys = [42.30, 42.35, 42.34, 42.3551]
+        indices, distances = distance_utils.nearest_indices(
+            self.BOSTON_COMMON[0], self.BOSTON_COMMON[1], xs, ys, 3)
+        self.assertEqual([3, 1, 2], list(indices))
+        self.assertTrue(all(np.diff(distances) >= 0))
+
+    def test_nearest_indices_skips_missing_coordinates(self):
+        xs = distance_utils.coordinates_to_floats(["", "-71.07", "bad"])
+        ys = distance_utils.coordinates_to_floats(["", "42.35", "42.35"])
+        indices, _ = distance_utils.nearest_indices(
+            self.BOSTON_COMMON[0], self.BOSTON_COMMON[1], xs, ys, 5)
+        self.assertEqual([1], list(indices))
+
+    def test_estimate_driving_distance_and_time(self):
+        miles, minutes = \
+            distance_utils.estimate_driving_distance_and_time(1.0)
+        self.assertAlmostEqual(distance_utils.ROAD_DETOUR_FACTOR, miles)
+        self.assertAlmostEqual(
+            miles / distance_utils.ESTIMATED_DRIVING_SPEED_MPH * 60,
+            minutes
+        )
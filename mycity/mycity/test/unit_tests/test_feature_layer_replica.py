@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest.mock as mock
+import requests
+import mycity.test.fake_arcgis_server as fake_arcgis_server
+import mycity.test.unit_tests.base as base
+import mycity.utilities.arcgis_utils as arcgis_utils
+from mycity.utilities.feature_layer_replica import FeatureLayerReplica
+
+# 2018-12-01 00:00:00 UTC in milliseconds
+FIRST_EDIT = 1543622400000
+HOUR = 60 * 60 * 1000
+
+
+def _make_feature(object_id, spaces, edit_date):
+    return {
+        "attributes": {"OBJECTID": object_id,
+                       "Address": "{} Fake St".format(object_id),
+                       "Spaces": spaces, "EditDate": edit_date},
+        "geometry": {"x": -71.0 - object_id / 1000, "y": 42.3}
+    }
+
+
+class FeatureLayerReplicaTestCase(base.BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = fake_arcgis_server.FakeArcGISServer(max_record_count=2)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        super().setUp()
+        self.server.features = [_make_feature(i, 10, FIRST_EDIT + i * HOUR)
+                                for i in range(1, 6)]
+        self.server.requests.clear()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.replica = self._make_replica()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def _make_replica(self):
+        return FeatureLayerReplica(
+            self.server.layer_url,
+            out_fields=["Address", "Spaces"],
+            ttl_seconds=60,
+            database_file=os.path.join(self.temp_dir.name, "replica.sqlite"),
+            clock=lambda: self.now
+        )
+
+    def _spaces(self, records):
+        return {record["OBJECTID"]: record["Spaces"] for record in records}
+
+    def test_first_load_pages_through_layer(self):
+        records = self.replica.get_records()
+        self.assertEqual({1: 10, 2: 10, 3: 10, 4: 10, 5: 10},
+                         self._spaces(records))
+        self.assertEqual(-71.001, records[0]["X"])
+        self.assertEqual("Address,Spaces,OBJECTID,EditDate",
+                         self.server.requests[0][1]["outFields"])
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_records_are_reused_within_ttl(self):
+        self.replica.get_records()
+        request_count = len(self.server.requests)
+        self.now += 59
+        self.replica.get_records()
+        self.assertEqual(request_count, len(self.server.requests))
+
+    def test_sync_fetches_only_edited_features(self):
+        self.replica.get_records()
+        version = self.replica.version
+        self.server.requests.clear()
+        self.server.features[1] = _make_feature(2, 0, FIRST_EDIT + 9 * HOUR)
+        del self.server.features[3]
+        self.server.features.append(_make_feature(6, 5,
+                                                  FIRST_EDIT + 10 * HOUR))
+
+        self.now += 60
+        records = self.replica.get_records()
+        self.assertEqual({1: 10, 2: 0, 3: 10, 5: 10, 6: 5},
+                         self._spaces(records))
+        self.assertNotEqual(version, self.replica.version)
+        edited_query, ids_query = [params for _, params
+                                   in self.server.requests]
+        self.assertIn("EditDate > TIMESTAMP '2018-12-01 05:00:00'",
+                      edited_query["where"])
+        self.assertEqual("true", ids_query["returnIdsOnly"])
+
+    def test_new_process_continues_from_database(self):
+        self.replica.get_records()
+        self.server.requests.clear()
+        replica = self._make_replica()
+        self.assertEqual(5, len(replica.get_records()))
+        self.assertEqual([], self.server.requests)
+
+        self.server.features[0] = _make_feature(1, 3, FIRST_EDIT + 9 * HOUR)
+        self.now += 60
+        records = replica.get_records()
+        self.assertEqual(3, self._spaces(records)[1])
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_failed_sync_keeps_last_replica(self):
+        self.replica.get_records()
+        self.now += 60
+        with mock.patch.object(arcgis_utils,
+                               'query_feature_layer_object_ids',
+                               return_value=None):
+            records = self.replica.get_records()
+        self.assertEqual(5, len(records))
+
+    def test_network_error_keeps_last_replica(self):
+        self.replica.get_records()
+        self.now += 60
+        with mock.patch.object(arcgis_utils, 'query_feature_layer',
+                               side_effect=requests.exceptions
+                               .ConnectTimeout()):
+            records = self.replica.get_records()
+        self.assertEqual(5, len(records))
+
+    def test_network_error_on_first_load(self):
+        with mock.patch.object(arcgis_utils, 'query_feature_layer',
+                               side_effect=requests.exceptions
+                               .ConnectTimeout()):
+            self.assertIsNone(self.replica.get_records())
+
+    def test_first_load_uses_response_format(self):
+        replica = FeatureLayerReplica(
+            self.server.layer_url, database_file=None,
+            response_format=arcgis_utils.PBF_FORMAT)
+        with mock.patch.object(arcgis_utils, 'query_feature_layer',
+                               return_value=[]) as query_feature_layer:
+            replica.get_records()
+        self.assertEqual(arcgis_utils.PBF_FORMAT,
+                         query_feature_layer.call_args[1]["response_format"])
+
+    def test_failed_first_load(self):
+        replica = FeatureLayerReplica(self.server.base_url + "/not/a/layer",
+                                      database_file=None)
+        self.assertIsNone(replica.get_records())
@@ -1,6 +1,13 @@
+import csv
+import threading
+import time
+import unittest.mock as mock
+import mycity.test.test_constants as test_constants
 import mycity.utilities.google_maps_utils as g_maps_utils
+from mycity.utilities.dataset_cache import CachedDataset
 import mycity.test.unit_tests.base as base
 from mycity.utilities.finder.FinderCSV import FinderCSV
+from mycity.utilities.geocoding_service import Coordinate
 
 
 class FinderCSVTestCase(base.BaseTestCase):
@@ -18,6 +25,7 @@ class FinderCSVTestCase(base.BaseTestCase):
             '1000 Dorchester Ave'
         self.finder = FinderCSV(self.request, fake_url, address_key,
                                 output_speech, test_prep_func)
+        FinderCSV._closest_answers.clear()
 
     def tearDown(self):
         self.finder = None
@@ -40,3 +48,252 @@ class FinderCSVTestCase(base.BaseTestCase):
             {'MissingKeys': 'Address, name, distance'}
         )
         self.assertEqual(self.finder.ERROR_MESSAGE, self.finder.output_speech)
+
+    def test_start_runs_independent_stages_concurrently(self):
+        def slow(value):
+            def stage(*args):
+                time.sleep(0.2)
+                return value
+            return stage
+
+        with mock.patch.object(self.finder, 'get_records',
+                               side_effect=slow([])), \
+                mock.patch.object(self.finder, 'geocode_origin_address',
+                                  side_effect=slow(
+                                      test_constants.ORIGIN_COORDINATE)), \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'generate_access_token',
+                           side_effect=slow("FAKE-ABCD")), \
+                mock.patch.object(self.finder, '_start') as mock_start:
+            started = time.monotonic()
+            self.finder.start()
+            elapsed = time.monotonic() - started
+        mock_start.assert_called_with(
+            [], test_constants.ORIGIN_COORDINATE, "FAKE-ABCD")
+        self.assertLess(elapsed, 0.5)
+
+    def test_start_with_stage_timeout(self):
+        self.finder.GEOCODE_TIMEOUT = 0.05
+        with mock.patch.object(self.finder, 'get_records', return_value=[]), \
+                mock.patch.object(self.finder, 'geocode_origin_address',
+                                  side_effect=lambda: time.sleep(0.3)), \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'generate_access_token',
+                           return_value="FAKE-ABCD"), \
+                mock.patch.object(self.finder, '_start') as mock_start:
+            self.finder.start()
+        mock_start.assert_not_called()
+        self.assertEqual(self.finder.ERROR_MESSAGE, self.finder.output_speech)
+
+    def test_hung_stages_do_not_fail_next_start(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def hang(*args):
+            release.wait(5)
+
+        self.finder.RECORDS_TIMEOUT = 0.05
+        self.finder.GEOCODE_TIMEOUT = 0.05
+        self.finder.TOKEN_TIMEOUT = 0.05
+        with mock.patch.object(self.finder, 'get_records',
+                               side_effect=hang), \
+                mock.patch.object(self.finder, 'geocode_origin_address',
+                                  side_effect=hang), \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'generate_access_token', side_effect=hang), \
+                mock.patch.object(self.finder, '_start') as mock_start:
+            # enough abandoned stages to take every worker of one pool
+            self.finder.start()
+            self.finder.start()
+        mock_start.assert_not_called()
+
+        self.finder.RECORDS_TIMEOUT = 0.5
+        self.finder.GEOCODE_TIMEOUT = 0.5
+        self.finder.TOKEN_TIMEOUT = 0.5
+        with mock.patch.object(self.finder, 'get_records', return_value=[]), \
+                mock.patch.object(self.finder, 'geocode_origin_address',
+                                  return_value=test_constants
+                                  .ORIGIN_COORDINATE), \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'generate_access_token',
+                           return_value="FAKE-ABCD"), \
+                mock.patch.object(self.finder, '_start') as mock_start:
+            self.finder.start()
+        mock_start.assert_called_with(
+            [], test_constants.ORIGIN_COORDINATE, "FAKE-ABCD")
+
+    def _parking_lot_records(self):
+        with open(test_constants.PARKING_LOTS_TEST_CSV,
+                  encoding='utf-8-sig') as csv_file:
+            return list(csv.DictReader(csv_file, delimiter=','))
+
+    def test_only_nearest_records_are_routed(self):
+        records = self._parking_lot_records()
+        self.finder.field_formatter = lambda record: None
+        with mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                        'find_closest_route',
+                        return_value=None) as mock_route:
+            self.finder._start(records,
+                               test_constants.ORIGIN_COORDINATE,
+                               "FAKE-ABCD")
+        destinations = mock_route.call_args[0][2]
+        self.assertEqual(self.finder.MAX_ROUTED_FACILITIES,
+                         len(destinations))
+        self.assertLess(len(destinations), len(records))
+
+    def test_routes_over_local_road_network_when_configured(self):
+        records = self._parking_lot_records()
+        self.finder.output_speech = "{Address} {Driving_time}"
+        self.finder.field_formatter = lambda record: None
+        address = self.finder.add_city_and_state_to_records(
+            records)[0]['Address']
+        local_route = {'Address': address,
+                       'Driving_time': '3.0 minutes',
+                       'Driving_distance': '1.0 miles'}
+        with mock.patch('mycity.utilities.finder.Finder.road_network_utils.'
+                        'get_road_network', return_value=mock.Mock()), \
+                mock.patch('mycity.utilities.finder.Finder.road_network_utils.'
+                           'find_closest_route',
+                           return_value=local_route) as mock_local_route, \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'find_closest_route') as mock_route:
+            self.finder._start(records, test_constants.ORIGIN_COORDINATE,
+                               None)
+        mock_route.assert_not_called()
+        self.assertEqual(1, mock_local_route.call_count)
+        self.assertEqual(address + ' 3.0 minutes',
+                         self.finder.output_speech)
+
+    def test_straight_line_fallback_when_route_fails(self):
+        records = self._parking_lot_records()
+        origin = test_constants.ORIGIN_COORDINATE
+        self.finder.output_speech = "{Address} {Driving_distance}"
+        self.finder.field_formatter = lambda record: None
+        with mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                        'find_closest_route', return_value=None):
+            self.finder._start(records, origin, "FAKE-ABCD")
+        nearest, _ = self.finder.find_k_nearest(origin, 1)
+        self.assertTrue(self.finder.output_speech.startswith(
+            nearest[0]['Address']))
+        self.assertTrue(self.finder.output_speech.endswith("miles"))
+
+    def test_find_k_nearest_matches_brute_force(self):
+        records = self.finder.add_city_and_state_to_records(
+            self._parking_lot_records())
+        self.finder.spatial_index = self.finder.get_spatial_index(records)
+        origin = test_constants.ORIGIN_COORDINATE
+        nearest, distances = self.finder.find_k_nearest(origin, 5)
+
+        def distance(record):
+            return (float(record['X']) - origin.x) ** 2 + \
+                   (float(record['Y']) - origin.y) ** 2
+        expected = sorted([record for record in records if record['X']],
+                          key=distance)[:5]
+        self.assertEqual([record['Address'] for record in expected],
+                         [record['Address'] for record in nearest])
+        self.assertEqual(sorted(distances), distances)
+
+    def test_spatial_index_is_reused_for_same_dataset_version(self):
+        first = self.finder.get_spatial_index(self._parking_lot_records())
+        second = self.finder.get_spatial_index(self._parking_lot_records())
+        self.assertIs(first, second)
+        changed = self._parking_lot_records()[1:]
+        self.assertIsNot(first, self.finder.get_spatial_index(changed))
+        # the last few versions are kept
+        self.assertIs(first, self.finder.get_spatial_index(
+            self._parking_lot_records()))
+
+    def test_closest_record_is_looked_up_by_facility_id(self):
+        records = self._parking_lot_records()
+        self.finder.spatial_index = self.finder.get_spatial_index(records)
+        driving_info = {'Address': records[3]['Address'],
+                        'Driving_time': '3 minutes'}
+        closest = self.finder.get_closest_record_with_driving_info(
+            driving_info, records)
+        self.assertEqual(records[3]['Name'], closest['Name'])
+        self.assertEqual('3 minutes', closest['Driving_time'])
+
+    def test_get_records_uses_dataset_cache(self):
+        records = self._parking_lot_records()
+        self.finder._filter = lambda record: record['Fee'] == 'No Charge'
+        with mock.patch('mycity.utilities.finder.FinderCSV.dataset_cache.get',
+                        return_value=CachedDataset(records, "v1")):
+            filtered = self.finder.get_records()
+        self.assertEqual("v1", self.finder.dataset_version[0])
+        self.assertTrue(filtered)
+        self.assertTrue(all(record['Fee'] == 'No Charge'
+                            for record in filtered))
+
+    def test_filters_on_one_url_do_not_share_indexes_or_answers(self):
+        records = self._parking_lot_records()
+        origin = test_constants.ORIGIN_COORDINATE
+        no_charge = FinderCSV(self.request, "www.fake.com", "Address",
+                              "{Fee}", lambda record: None,
+                              lambda record: record['Fee'] == 'No Charge')
+        paid = FinderCSV(self.request, "www.fake.com", "Address",
+                         "{Fee}", lambda record: None,
+                         lambda record: record['Fee'] != 'No Charge')
+        fees = []
+        for finder in (no_charge, paid):
+            with mock.patch('mycity.utilities.finder.FinderCSV.'
+                            'dataset_cache.get',
+                            return_value=CachedDataset(records, "v1")):
+                filtered = finder.get_records()
+            closest = {'Address': filtered[0]['Address'] + ' Boston, MA',
+                       'Driving_time': '3 minutes',
+                       'Driving_distance': '0.5 miles'}
+            with mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                            'find_closest_route', return_value=closest):
+                finder._start(filtered, origin, "FAKE-ABCD")
+            fees.append(finder.output_speech)
+        self.assertEqual('No Charge', fees[0])
+        self.assertNotEqual('No Charge', fees[1])
+        self.assertNotEqual(no_charge.dataset_version, paid.dataset_version)
+
+    def test_processing_records_does_not_modify_cached_records(self):
+        records = self._parking_lot_records()
+        address = records[0]['Address']
+        self.finder.add_city_and_state_to_records(records)
+        self.assertEqual(address, records[0]['Address'])
+
+    def _start_with_route(self, records, origin, closest_destination):
+        self.finder.output_speech = "{Address} {Driving_time}"
+        self.finder.field_formatter = lambda record: None
+        with mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                        'find_closest_route',
+                        return_value=closest_destination) as mock_route:
+            self.finder._start(records, origin, "FAKE-ABCD")
+        return mock_route
+
+    def test_closest_answer_is_shared_by_origins_in_same_cell(self):
+        records = self._parking_lot_records()
+        origin = test_constants.ORIGIN_COORDINATE
+        nearby = Coordinate(origin.x + 0.00005, origin.y + 0.00005,
+                            "1002 Dorchester Ave")
+        closest = {'Address': records[3]['Address'] + ' Boston, MA',
+                   'Driving_time': '3 minutes',
+                   'Driving_distance': '0.5 miles'}
+        self._start_with_route(records, origin, closest)
+        first_speech = self.finder.output_speech
+        mock_route = self._start_with_route(records, nearby, closest)
+        mock_route.assert_not_called()
+        self.assertEqual(first_speech, self.finder.output_speech)
+
+    def test_closest_answers_are_invalidated_by_new_dataset_version(self):
+        records = self._parking_lot_records()
+        origin = test_constants.ORIGIN_COORDINATE
+        closest = {'Address': records[3]['Address'] + ' Boston, MA',
+                   'Driving_time': '3 minutes',
+                   'Driving_distance': '0.5 miles'}
+        self.finder.dataset_version = "v1"
+        self._start_with_route(records, origin, closest)
+        self.finder.dataset_version = "v2"
+        mock_route = self._start_with_route(records, origin, closest)
+        mock_route.assert_called_once()
+
+    def test_straight_line_answers_are_not_cached(self):
+        records = self._parking_lot_records()
+        origin = test_constants.ORIGIN_COORDINATE
+        self._start_with_route(records, origin, None)
+        mock_route = self._start_with_route(records, origin, None)
+        mock_route.assert_called_once()
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import unittest.mock as mock
+import mycity.test.fake_arcgis_server as fake_arcgis_server
+import mycity.test.unit_tests.base as base
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.feature_layer_replica as feature_layer_replica
+from mycity.utilities.dataset_cache import DatasetCache
+from mycity.utilities.finder.FinderGIS import FinderGIS
+from mycity.utilities.geocoding_service import Coordinate
+
+ORIGIN = Coordinate(-71.06, 42.30, "1000 Dorchester Ave Boston MA")
+LAST_EDIT_DATE = 1543622400010
+
+
+def _make_features():
+    # lots every ~0.3 miles east of the origin
+    return [
+        {
+            "attributes": {"OBJECTID": i, "Name": "Lot {}".format(i),
+                           "Address": "{} Fake St".format(i),
+                           "Spaces": i, "EditDate": 1543622400000 + i},
+            "geometry": {"x": ORIGIN.x + 0.006 * i, "y": ORIGIN.y}
+        }
+        for i in range(1, 11)
+    ]
+
+
+class FinderGISTestCase(base.BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = fake_arcgis_server.FakeArcGISServer(
+            features=_make_features(), last_edit_date=LAST_EDIT_DATE)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        super().setUp()
+        self.server.requests.clear()
+        self.server.last_edit_date = LAST_EDIT_DATE
+        FinderGIS._closest_answers.clear()
+        self.request.session_attributes['currentAddress'] = \
+            '1000 Dorchester Ave'
+        self.finder = FinderGIS(self.request, self.server.layer_url,
+                                "Address",
+                                "{Name} at {Address} is {Driving_distance}",
+                                lambda record: None)
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.dataset_cache_patch = mock.patch(
+            'mycity.utilities.finder.FinderGIS.dataset_cache',
+            DatasetCache(cache_directory=self.cache_directory.name))
+        self.dataset_cache_patch.start()
+
+    def tearDown(self):
+        self.dataset_cache_patch.stop()
+        self.cache_directory.cleanup()
+        super().tearDown()
+
+    def _get_records(self, origin=ORIGIN):
+        with mock.patch.object(self.finder, 'geocode_origin_address',
+                               return_value=origin):
+            return self.finder.get_records()
+
+    def _queries(self):
+        return [params for path, params in self.server.requests
+                if path.endswith("/query")]
+
+    def test_out_fields_come_from_speech_template(self):
+        self.assertEqual(["Address", "Name"], self.finder.out_fields)
+
+    def test_explicit_out_fields(self):
+        finder = FinderGIS(self.request, self.server.layer_url, "Address",
+                           "{Name}", lambda record: None,
+                           out_fields=["Address", "Name", "Spaces"])
+        self.assertEqual(["Address", "Name", "Spaces"], finder.out_fields)
+
+    def test_records_are_flattened(self):
+        records = self._get_records()
+        self.assertEqual({"Address", "Name", "X", "Y"}, set(records[0]))
+        self.assertEqual("1 Fake St", records[0]["Address"])
+        self.assertAlmostEqual(ORIGIN.x + 0.006, records[0]["X"])
+
+    def test_features_are_requested_as_json_by_default(self):
+        self._get_records()
+        self.assertEqual({"json"}, {params["f"] for params
+                                    in self._queries()})
+
+    def test_features_are_requested_as_pbf_when_asked(self):
+        self.finder = FinderGIS(self.request, self.server.layer_url,
+                                "Address", "{Name}", lambda record: None,
+                                response_format=arcgis_utils.PBF_FORMAT)
+        records = self._get_records()
+        self.assertEqual("1 Fake St", records[0]["Address"])
+        self.assertEqual({"pbf"}, {params["f"] for params
+                                   in self._queries()})
+
+    def test_search_radius_widens_until_enough_features(self):
+        with mock.patch.object(FinderGIS, 'MIN_FEATURES', 3):
+            records = self._get_records()
+        self.assertEqual(3, len(records))
+        distances = [params.get("distance") for params in self._queries()]
+        self.assertEqual(["0.5", "1"], distances)
+        self.assertEqual("Address,Name", self._queries()[0]["outFields"])
+        self.assertEqual("4326", self._queries()[0]["outSR"])
+
+    def test_falls_back_to_whole_layer(self):
+        with mock.patch.object(FinderGIS, 'MIN_FEATURES', 20):
+            records = self._get_records()
+        self.assertEqual(10, len(records))
+        self.assertNotIn("geometry", self._queries()[-1])
+
+    def test_without_origin_queries_whole_layer(self):
+        records = self._get_records(origin=None)
+        self.assertEqual(10, len(records))
+        self.assertEqual(1, len(self._queries()))
+        self.assertNotIn("geometry", self._queries()[0])
+
+    def test_replicated_records(self):
+        finder = FinderGIS(self.request, self.server.layer_url, "Address",
+                           "{Name}", lambda record: None, replicate=True)
+        with mock.patch.object(feature_layer_replica, '_replicas', {}), \
+                mock.patch.object(feature_layer_replica, 'DATABASE_FILE',
+                                  None):
+            records = finder.get_records()
+            self.assertEqual(10, len(records))
+            self.assertEqual(1, len(self.server.requests))
+            self.assertNotIn("geometry", self.server.requests[0][1])
+            finder.get_records()
+        self.assertEqual(1, len(self.server.requests))
+        self.assertIsNotNone(finder.dataset_version)
+
+    def test_records_around_an_origin_are_cached(self):
+        self._get_records()
+        request_count = len(self.server.requests)
+        self._get_records()
+        self.assertEqual(request_count, len(self.server.requests))
+
+    def test_records_around_an_origin_are_not_written_to_disk(self):
+        self._get_records()
+        # only the layer's last edit date has a cache file
+        self.assertEqual(1, len(os.listdir(self.cache_directory.name)))
+
+    def test_layer_version_is_shared_by_origins(self):
+        self._get_records()
+        first = self.finder.layer_version
+        far_origin = Coordinate(ORIGIN.x + 0.03, ORIGIN.y, "Far St")
+        with mock.patch.object(FinderGIS, 'MIN_FEATURES', 3):
+            self._get_records(far_origin)
+        self.assertIsNotNone(first)
+        self.assertEqual(first, self.finder.layer_version)
+        self.assertNotEqual(first, self.finder.dataset_version)
+
+    def test_layer_version_changes_with_last_edit_date(self):
+        now = [1000]
+        with mock.patch('mycity.utilities.finder.FinderGIS.dataset_cache',
+                        DatasetCache(
+                            cache_directory=self.cache_directory.name,
+                            clock=lambda: now[0])):
+            self._get_records()
+            first = self.finder.layer_version
+            self.server.last_edit_date += 1
+            now[0] += FinderGIS.CACHE_TTL_SECONDS
+            self._get_records()
+        self.assertNotEqual(first, self.finder.layer_version)
+
+    def test_closest_answer_is_shared_by_origins_with_other_features(self):
+        # same answer cell, but a different rounded origin
+        nearby = Coordinate(ORIGIN.x + 0.0002, ORIGIN.y - 0.0001,
+                            "1002 Dorchester Ave")
+        speeches = []
+        for origin in (ORIGIN, nearby):
+            self.finder.output_speech = "{Name} is {Driving_distance}"
+            with mock.patch.object(FinderGIS, 'MIN_FEATURES',
+                                   3 if origin is ORIGIN else 4):
+                records = self._get_records(origin)
+            closest = {'Address': records[0]['Address'] + ' Boston, MA',
+                       'Driving_time': '3 minutes',
+                       'Driving_distance': '0.5 miles'}
+            with mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                            'find_closest_route',
+                            return_value=closest) as mock_route:
+                self.finder._start(records, origin, "FAKE-ABCD")
+            speeches.append(self.finder.output_speech)
+        mock_route.assert_not_called()
+        self.assertEqual("Lot 1 is 0.5 miles", speeches[0])
+        self.assertEqual(speeches[0], speeches[1])
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest.mock as mock
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.gis_utils as gis_utils
+from mycity.utilities.geocode_cache import GeocodeCache
+
+
+GEOCODE = {'address': '1000 Dorchester Ave, Boston, MA, 02125',
+           'x': -71.05, 'y': 42.31}
+
+
+class GeocodeCacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000
+        self.directory = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.directory, "geocodes.json")
+        self.cache = self._new_cache()
+        self.geocode = mock.Mock(return_value=GEOCODE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def _new_cache(self, max_entries=3):
+        return GeocodeCache(cache_file=self.cache_file,
+                            max_entries=max_entries,
+                            ttl_seconds=60,
+                            clock=lambda: self.now)
+
+    def test_address_is_geocoded_once(self):
+        self.cache.get_or_geocode("1000 Dorchester Ave Boston MA",
+                                  self.geocode)
+        result = self.cache.get_or_geocode(
+            "1000 dorchester avenue, Boston, MA", self.geocode)
+        self.assertEqual(GEOCODE, result)
+        self.assertEqual(1, self.geocode.call_count)
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_failed_geocode_is_not_cached(self):
+        self.geocode.return_value = None
+        self.cache.get_or_geocode("1 Nowhere St", self.geocode)
+        self.cache.get_or_geocode("1 Nowhere St", self.geocode)
+        self.assertEqual(2, self.geocode.call_count)
+
+    def test_expired_entry_is_geocoded_again(self):
+        self.cache.get_or_geocode("1 Fake St", self.geocode)
+        self.now += 60
+        self.cache.get_or_geocode("1 Fake St", self.geocode)
+        self.assertEqual(2, self.geocode.call_count)
+
+    def test_least_recently_used_address_is_evicted(self):
+        for house in ["1", "2", "3"]:
+            self.cache.put(house + " Fake St", GEOCODE)
+        self.cache.get("1 Fake St")
+        self.cache.put("4 Fake St", GEOCODE)
+        self.assertIsNotNone(self.cache.get("1 Fake St"))
+        self.assertIsNone(self.cache.get("2 Fake St"))
+
+    def test_new_container_reads_cache_file(self):
+        self.cache.put("1 Fake St", GEOCODE)
+        self.assertEqual(GEOCODE, self._new_cache().get("1 Fake St"))
+
+    def test_clear_removes_cache_file(self):
+        self.cache.put("1 Fake St", GEOCODE)
+        self.cache.clear()
+        self.assertIsNone(self._new_cache().get("1 Fake St"))
+
+    def test_gis_utils_geocode_address_uses_cache(self):
+        with mock.patch('mycity.utilities.gis_utils.arcgis_utils.'
+                        'geocode_address_candidates',
+                        return_value=test_constants.GEOCODE_ADDRESS_CANDIDATES
+                        ) as mock_candidates:
+            first = gis_utils.geocode_address("1000 Dorchester Ave")
+            second = gis_utils.geocode_address("1000 Dorchester Ave")
+        self.assertEqual(first, second)
+        self.assertEqual(1, mock_candidates.call_count)
@@ -0,0 +1,74 @@
+import unittest.mock as mock
+import requests
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.crime_incidents_api_utils as crime_api_utils
+from mycity.utilities.finder.FinderCSV import FinderCSV
+from mycity.utilities.geocode_cache import GeocodeCache
+from mycity.utilities.geocoding_service import ArcGISGeocoder, \
+    Coordinate, GeocodingService
+
+
+class GeocodingServiceTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = mock.Mock()
+        self.first.name = "first"
+        self.second = mock.Mock()
+        self.second.name = "second"
+        self.second.geocode.return_value = test_constants.ORIGIN_COORDINATE
+        self.service = GeocodingService([self.first, self.second],
+                                        cache=GeocodeCache(cache_file=None))
+
+    def test_falls_back_to_next_provider(self):
+        self.first.geocode.return_value = None
+        self.assertEqual(test_constants.ORIGIN_COORDINATE,
+                         self.service.geocode("1000 Dorchester Ave"))
+
+    def test_falls_back_when_provider_raises(self):
+        self.first.geocode.side_effect = requests.exceptions.Timeout
+        self.assertEqual(test_constants.ORIGIN_COORDINATE,
+                         self.service.geocode("1000 Dorchester Ave"))
+
+    def test_first_provider_answer_is_used(self):
+        coordinate = Coordinate(-71.0, 42.0, "1 Fake St")
+        self.first.geocode.return_value = coordinate
+        self.assertEqual(coordinate, self.service.geocode("1 Fake St"))
+        self.second.geocode.assert_not_called()
+
+    def test_no_provider_can_geocode(self):
+        self.first.geocode.return_value = None
+        self.second.geocode.return_value = None
+        self.assertIsNone(self.service.geocode("1 Nowhere St"))
+
+    def test_results_are_cached(self):
+        self.first.geocode.return_value = None
+        self.service.geocode("1000 Dorchester Ave")
+        result = self.service.geocode("1000 dorchester avenue")
+        self.assertIsInstance(result, Coordinate)
+        self.assertEqual(1, self.second.geocode.call_count)
+
+    def test_arcgis_geocoder(self):
+        with mock.patch('mycity.utilities.arcgis_utils.'
+                        'geocode_address_candidates',
+                        return_value=test_constants.GEOCODE_ADDRESS_CANDIDATES):
+            coordinate = ArcGISGeocoder().geocode("1000 Dorchester Ave")
+        self.assertEqual(test_constants.ORIGIN_COORDINATE, coordinate)
+
+    def test_address_geocoded_for_one_intent_is_reused_by_another(self):
+        self.request.session_attributes['currentAddress'] = \
+            '1000 Dorchester Ave'
+        finder = FinderCSV(self.request, "www.fake.com", "Address",
+                           "{Address}", lambda record: None)
+        with mock.patch('mycity.utilities.arcgis_utils.'
+                        'geocode_address_candidates',
+                        return_value=test_constants.GEOCODE_ADDRESS_CANDIDATES
+                        ) as mock_candidates:
+            origin = finder.geocode_origin_address()
+            crime_coordinates = crime_api_utils._get_coordinates_for_address(
+                '1000 Dorchester Ave')
+        self.assertEqual(test_constants.ORIGIN_COORDINATE, origin)
+        self.assertEqual(("{:.2f}".format(origin.y),
+                          "{:.2f}".format(origin.x)), crime_coordinates)
+        self.assertEqual(1, mock_candidates.call_count)
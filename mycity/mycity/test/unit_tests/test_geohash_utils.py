@@ -0,0 +1,17 @@
+import mycity.test.unit_tests.base as base
+import mycity.utilities.geohash_utils as geohash_utils
+
+
+class GeohashUtilitiesTestCase(base.BaseTestCase):
+
+    def test_encode_known_geohash(self):
+        self.assertEqual("u4pruydqqvj",
+                         geohash_utils.encode(10.40744, 57.64911, 11))
+
+    def test_nearby_points_share_a_cell(self):
+        self.assertEqual(geohash_utils.encode(-71.05664, 42.31649),
+                         geohash_utils.encode(-71.05670, 42.31655))
+
+    def test_distant_points_are_in_different_cells(self):
+        self.assertNotEqual(geohash_utils.encode(-71.05664, 42.31649),
+                            geohash_utils.encode(-71.06411, 42.35859))
@@ -3,6 +3,8 @@ import mycity.test.unit_tests.base as base
 import mycity.intents.get_alerts_intent as get_alerts_intent
 import mycity.intents.speech_constants.get_alerts_intent as constants
 import typing
+import unittest.mock as mock
+import requests
 
 
 class GetAlertsIntentTestCase(base.BaseTestCase):
@@ -94,3 +96,13 @@ class GetAlertsIntentTestCase(base.BaseTestCase):
         }
         response = get_alerts_intent.get_inclement_weather_alert(self.request, self.stub_get_alerts)
         self.assertEqual(constants.NO_INCLEMENT_WEATHER_ALERTS, response.output_speech)
+
+    def test_get_alerts_raises_on_error_page(self):
+        error_page = self._mock_response(
+            status=503, content="<html>Service Unavailable</html>",
+            raise_for_status=requests.HTTPError("503 Server Error"))
+        with mock.patch('mycity.utilities.http_utils.get',
+                        return_value=error_page):
+            with self.assertRaises(requests.HTTPError):
+                get_alerts_intent.get_alerts()
+        error_page.close.assert_called_once_with()
@@ -8,8 +8,8 @@ import mycity.utilities.google_maps_utils as g_maps_utils
 class GISUtilitiesTestCase(base.BaseTestCase):
 
     @mock.patch(
-        'mycity.utilities.google_maps_utils._get_driving_info',
-        return_value=test_constants.GOOGLE_MAPS_JSON
+        'mycity.utilities.google_maps_utils.get_closest_driving_info',
+        return_value=test_constants.GOOGLE_MAPS_JSON[0]
     )
     def test_get_closest_feature(self, mock_get_driving_info):
         test_origin = "46 Everdean St Boston, MA"
@@ -40,6 +40,27 @@ class GISUtilitiesTestCase(base.BaseTestCase):
             result[g_maps_utils.DRIVING_DISTANCE_TEXT_KEY]
         )
 
+    @mock.patch(
+        'mycity.utilities.google_maps_utils.get_closest_driving_info',
+        return_value=None
+    )
+    def test_get_closest_feature_without_driving_info(self,
+                                                      mock_driving_info):
+        result = gis_utils.get_closest_feature(
+            "46 Everdean St Boston, MA", 1, "test", "Test error message",
+            [['close', '94 Sawyer Ave Boston, MA']]
+        )
+        self.assertFalse(result["test"])
+        self.assertFalse(result[g_maps_utils.DRIVING_TIME_TEXT_KEY])
+
+    def test_get_dest_coordinates_from_features(self):
+        features = [['-71.1', '42.3', '94 Sawyer Ave'],
+                    ['-71.2', '42.4', ''],
+                    ['-71.0', '42.2', '1 Main St']]
+        to_test = gis_utils._get_dest_coordinates_from_features(
+            2, (0, 1), features)
+        self.assertEqual([('-71.1', '42.3'), ('-71.0', '42.2')], to_test)
+
     def test_get_dest_addresses_from_features(self):
         to_test = \
             gis_utils._get_dest_addresses_from_features(
@@ -1,6 +1,9 @@
 import unittest
+import unittest.mock as mock
+import requests
 import mycity.test.unit_tests.base as base
 import mycity.utilities.google_maps_utils as g_maps_utils
+from mycity.utilities.geocoding_service import Coordinate
 
 
 class TestGoogleMapsUtilities(base.BaseTestCase):
@@ -32,3 +35,82 @@ class TestGoogleMapsUtilities(base.BaseTestCase):
         self.assertEqual(origin, to_test["origins"])
         self.assertEqual(dests, to_test["destinations"].split("|"))
         self.assertEqual("imperial", to_test["units"])    
+
+    def test_setup_google_maps_query_params_with_coordinate(self):
+        origin = Coordinate(-71.05, 42.31, "46 Everdean St Boston, MA")
+        to_test = g_maps_utils._setup_google_maps_query_params(
+            origin, ["123 Fake St Boston, MA"])
+        self.assertEqual("42.31,-71.05", to_test["origins"])
+
+    def _distance_matrix_response(self, params, headers=None, timeout=None,
+                                  stream=False):
+        # every destination is "<distance in meters> Main St"
+        destinations = params["destinations"].split("|")
+        response = mock.Mock(status_code=requests.codes.ok)
+        response.json.return_value = {"rows": [{"elements": [
+            {"distance": {"value": int(address.split()[0]),
+                          "text": address},
+             "duration": {"value": 60, "text": "1 min"}}
+            for address in destinations
+        ]}]}
+        return response
+
+    def _mock_distance_matrix(self):
+        return mock.patch(
+            'mycity.utilities.google_maps_utils.http_utils.get',
+            side_effect=lambda url, params=None, **kwargs:
+            self._distance_matrix_response(params)
+        )
+
+    def test_destinations_are_sent_in_chunks(self):
+        destinations = ["{} Main St".format(meters)
+                        for meters in range(1000, 1060)]
+        with self._mock_distance_matrix() as mock_get:
+            driving_infos = g_maps_utils._get_driving_info(
+                "46 Everdean St Boston, MA", "test", destinations)
+        self.assertEqual(3, mock_get.call_count)
+        for call in mock_get.call_args_list:
+            self.assertLessEqual(
+                len(call[1]["params"]["destinations"].split("|")),
+                g_maps_utils.MAX_DESTINATIONS_PER_REQUEST)
+        self.assertEqual(destinations,
+                         [info["test"] for info in driving_infos])
+
+    def test_closest_driving_info_across_chunks(self):
+        destinations = ["{} Main St".format(meters)
+                        for meters in range(2000, 1940, -1)]
+        with self._mock_distance_matrix():
+            closest = g_maps_utils.get_closest_driving_info(
+                "46 Everdean St Boston, MA", "test", destinations)
+        self.assertEqual("1941 Main St", closest["test"])
+        self.assertEqual(1941,
+                         closest[g_maps_utils.DRIVING_DISTANCE_VALUE_KEY])
+
+    def test_failed_chunk_is_skipped(self):
+        destinations = ["{} Main St".format(meters)
+                        for meters in range(1000, 1030)]
+
+        def fail_first_chunk(url, params=None, **kwargs):
+            if params["destinations"].startswith("1000 "):
+                raise requests.exceptions.ConnectionError("down")
+            return self._distance_matrix_response(params)
+
+        with mock.patch('mycity.utilities.google_maps_utils.http_utils.get',
+                        side_effect=fail_first_chunk):
+            closest = g_maps_utils.get_closest_driving_info(
+                "46 Everdean St Boston, MA", "test", destinations)
+        self.assertEqual("1025 Main St", closest["test"])
+
+    def test_no_driving_info(self):
+        with self._mock_distance_matrix():
+            self.assertIsNone(g_maps_utils.get_closest_driving_info(
+                "46 Everdean St Boston, MA", "test", []))
+
+    def test_straight_line_pre_filter(self):
+        origin = Coordinate(-71.05, 42.31, "46 Everdean St Boston, MA")
+        destinations = ["1 Near St", "2 Far St", "3 Nearer St", "4 Nowhere"]
+        coordinates = [(-71.06, 42.31), (-71.50, 42.60),
+                       (-71.05, 42.311), ("", "")]
+        to_test = g_maps_utils.filter_plausible_destinations(
+            origin, destinations, coordinates, 2)
+        self.assertEqual(["1 Near St", "3 Nearer St"], to_test)
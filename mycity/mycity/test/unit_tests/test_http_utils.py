@@ -0,0 +1,32 @@
+import mycity.test.unit_tests.base as base
+import mycity.utilities.http_utils as http_utils
+
+
+class HTTPUtilitiesTestCase(base.BaseTestCase):
+
+    def test_session_is_shared(self):
+        self.assertIs(http_utils.get_session(), http_utils.get_session())
+
+    def test_session_negotiates_gzip(self):
+        session = http_utils.get_session()
+        self.assertIn("gzip", session.headers["Accept-Encoding"])
+
+    def test_session_pools_connections_per_host(self):
+        adapter = http_utils.get_session().get_adapter("https://arcgis.com")
+        self.assertEqual(http_utils.CONNECTIONS_PER_HOST,
+                         adapter._pool_maxsize)
+
+    def test_encode_multipart_form(self):
+        params = {'f': 'json', 'token': 'FAKE-ABCD', 'facilities': '1,2;3,4'}
+        body, content_type = http_utils.encode_multipart_form(params)
+        self.assertTrue(content_type.startswith("multipart/form-data"))
+        boundary = content_type.split("boundary=")[1]
+        parts = [part for part in body.split(("--" + boundary).encode())
+                 if part.strip(b"-\r\n")]
+        self.assertEqual(len(params), len(parts))
+        for key, value in params.items():
+            self.assertIn(
+                'name="{}"\r\n\r\n{}\r\n'.format(key, value).encode(),
+                body
+            )
+        self.assertTrue(body.endswith(("--" + boundary + "--\r\n").encode()))
@@ -0,0 +1,34 @@
+import sys
+import unittest.mock as mock
+import mycity.intents.intent_registry as intent_registry
+import mycity.test.unit_tests.base as base
+
+
+class IntentRegistryTestCase(base.BaseTestCase):
+
+    def test_get_intent_handler_returns_handler_function(self):
+        handler = intent_registry.get_intent_handler("UnhandledIntent")
+        import mycity.intents.unhandled_intent as unhandled_intent
+        self.assertIs(handler, unhandled_intent.unhandled_intent)
+
+    def test_get_intent_handler_with_unknown_intent(self):
+        with self.assertRaises(ValueError):
+            intent_registry.get_intent_handler("MadeUpIntent")
+
+    def test_handler_module_is_not_imported_until_used(self):
+        module_path = "mycity.intents.latest_311_intent"
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop(module_path, None)
+            with mock.patch.dict(intent_registry._import_times_ms, clear=True):
+                self.assertNotIn(module_path, sys.modules)
+                intent_registry.get_intent_handler("LatestThreeOneOne")
+                self.assertIn(module_path, sys.modules)
+                report = intent_registry.get_cold_start_report()
+                self.assertIn("LatestThreeOneOne", report)
+                self.assertGreater(report["LatestThreeOneOne"], 0)
+
+    def test_every_registered_intent_resolves(self):
+        for intent_name in intent_registry.INTENT_HANDLERS:
+            self.assertTrue(callable(
+                intent_registry.get_intent_handler(intent_name)
+            ))
@@ -64,8 +64,8 @@ class MyCityControllerUnitTestCase(base.BaseTestCase):
         self.assertEqual(response.card_title, expected_card_title)
         self.assertIsNone(response.reprompt_text)
 
-    # if we change how we import intents in mycity_controller I think it will
-    # break these patches
+    # intent handlers are resolved through intent_registry when called, so
+    # patch them where they are defined rather than in mycity_controller
     @mock.patch('mycity.mycity_controller.set_address_in_session')
     def test_set_address_intent_no_address_prompted(self, mock_set_address):
         self.request.is_new_session = False
@@ -82,7 +82,7 @@ class MyCityControllerUnitTestCase(base.BaseTestCase):
         self.controller.on_intent(self.request)
         mock_get_addr.assert_called_with(self.request)
 
-    @mock.patch('mycity.mycity_controller.get_trash_day_info')
+    @mock.patch('mycity.intents.trash_intent.get_trash_day_info')
     def test_intent_that_needs_address_with_address_in_session_attributes(
             self,
             mock_intent
@@ -101,7 +101,7 @@ class MyCityControllerUnitTestCase(base.BaseTestCase):
         self.controller.on_intent(self.request)
         mock_intent.assert_called_with(self.request)
 
-    @mock.patch('requests.get')
+    @mock.patch('mycity.utilities.http_utils.get')
     def test_get_address_from_user_device(self, mock_get):
         mock_resp = self._mock_response(status=200, 
             json_data=test_constants.ALEXA_DEVICE_ADDRESS)
@@ -111,7 +111,7 @@ class MyCityControllerUnitTestCase(base.BaseTestCase):
         self.assertEquals(expected_output_text, 
             result.session_attributes[intent_constants.CURRENT_ADDRESS_KEY])
 
-    @mock.patch('requests.get')
+    @mock.patch('mycity.utilities.http_utils.get')
     def test_get_address_from_user_device_failure(self, mock_get):
         mock_resp = self._mock_response(status=403)
         mock_get.return_value = mock_resp
@@ -0,0 +1,93 @@
+import csv
+import os
+import tempfile
+import unittest.mock as mock
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.csv_utils as csv_utils
+import mycity.utilities.finder.NearestFacilityGrid as grid_module
+from mycity.utilities.finder.FinderCSV import FinderCSV
+from mycity.utilities.finder.NearestFacilityGrid import NearestFacilityGrid
+from mycity.utilities.finder.SpatialIndex import SpatialIndex
+
+FAKE_URL = "www.fake.com/parking.csv"
+# coarser than production so the test grid builds quickly
+CELL_WIDTH = 0.009
+CELL_HEIGHT = 0.00675
+
+
+class NearestFacilityGridTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(test_constants.PARKING_LOTS_TEST_CSV,
+                  encoding='utf-8-sig') as csv_file:
+            records = list(csv.DictReader(csv_file, delimiter=','))
+        self.records = csv_utils.add_city_and_state_to_records(
+            records, 'Address', 'Boston', 'MA')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.temp_dir.name,
+                            grid_module.grid_file_name(FAKE_URL))
+        self.covered = NearestFacilityGrid.build(
+            self.records, 'Address', FAKE_URL, path,
+            cell_width=CELL_WIDTH, cell_height=CELL_HEIGHT)
+        NearestFacilityGrid._grids.clear()
+        self.grid = NearestFacilityGrid.load(FAKE_URL, self.temp_dir.name)
+
+    def tearDown(self):
+        self.grid = None
+        NearestFacilityGrid._grids.clear()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_load_reads_grid_file(self):
+        self.assertIsNotNone(self.grid)
+        self.assertGreater(self.covered, 0)
+        self.assertEqual('Address', self.grid.address_key)
+        self.assertEqual(len(self.records), len(self.grid.facilities))
+
+    def test_load_without_grid_file(self):
+        self.assertIsNone(NearestFacilityGrid.load("www.other.com",
+                                                   self.temp_dir.name))
+
+    def test_lookup_matches_spatial_index_at_cell_center(self):
+        spatial_index = SpatialIndex(self.records, id_key='Address')
+        min_x, min_y = grid_module.BOSTON_BOUNDS[:2]
+        for column, row in [(3, 4), (10, 10), (20, 17)]:
+            x = min_x + (column + 0.5) * CELL_WIDTH
+            y = min_y + (row + 0.5) * CELL_HEIGHT
+            facility, minutes, miles = self.grid.lookup(x, y)
+            nearest, _ = spatial_index.k_nearest(x, y, 1)
+            self.assertEqual(nearest[0]['Address'], facility['Address'])
+            self.assertGreater(minutes, 0)
+            self.assertGreater(miles, 0)
+
+    def test_lookup_outside_bounds(self):
+        self.assertIsNone(self.grid.lookup(-70.0, 42.36))
+        self.assertIsNone(self.grid.lookup(-71.06, 41.0))
+
+    def test_rejects_file_that_is_not_a_grid(self):
+        path = os.path.join(self.temp_dir.name, "not_a_grid")
+        with open(path, "wb") as not_a_grid:
+            not_a_grid.write(b"X,Y,Address\n" * 10)
+        with self.assertRaises(ValueError):
+            NearestFacilityGrid(path)
+
+    def test_finder_answers_from_grid(self):
+        request = self.request
+        request.session_attributes['currentAddress'] = '1000 Dorchester Ave'
+        finder = FinderCSV(request, FAKE_URL, 'Address',
+                           "{Address} is {Driving_distance} away",
+                           lambda record: None)
+        with mock.patch.object(finder, 'geocode_origin_address',
+                               return_value=test_constants.ORIGIN_COORDINATE), \
+                mock.patch.object(finder, 'get_records') as mock_records, \
+                mock.patch('mycity.utilities.finder.Finder.arcgis_utils.'
+                           'find_closest_route') as mock_route:
+            finder.start()
+        mock_records.assert_not_called()
+        mock_route.assert_not_called()
+        origin = test_constants.ORIGIN_COORDINATE
+        facility, _, _ = self.grid.lookup(origin.x, origin.y)
+        self.assertTrue(finder.output_speech.startswith(facility['Address']))
+        self.assertTrue(finder.output_speech.endswith("miles away"))
@@ -0,0 +1,103 @@
+import calendar
+import copy
+import time
+import unittest.mock as mock
+import mycity.intents.trash_intent as trash_intent
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+from mycity.intents.custom_errors import MultipleAddressError
+from mycity.utilities.recollect_cache import RecollectCache
+
+# 2018-05-03 12:00:00 UTC, the day before the mocked next pickup
+NOW = calendar.timegm(time.strptime("2018-05-03 12:00:00",
+                                    "%Y-%m-%d %H:%M:%S"))
+HOUR = 60 * 60
+
+
+class RecollectCacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = NOW
+        self.cache = RecollectCache(max_entries=2, place_ttl_seconds=HOUR,
+                                    clock=lambda: self.now)
+        self.lookup = mock.Mock(
+            return_value=dict(test_constants.GET_ADDRESS_API_MOCK))
+        self.fetch = mock.Mock(
+            return_value=copy.deepcopy(test_constants.GET_TRASH_DAY_MOCK))
+
+    def test_place_is_looked_up_once(self):
+        self.cache.get_place("1000 Dorchester Ave", None, self.lookup)
+        place = self.cache.get_place("1000 dorchester avenue", None,
+                                     self.lookup)
+        self.assertEqual(test_constants.GET_ADDRESS_API_MOCK, place)
+        self.assertEqual(1, self.lookup.call_count)
+
+    def test_returned_place_can_be_modified(self):
+        place = self.cache.get_place("1000 Dorchester Ave", None,
+                                     self.lookup)
+        place.pop("name")
+        place = self.cache.get_place("1000 Dorchester Ave", None,
+                                     self.lookup)
+        self.assertIn("name", place)
+
+    def test_places_are_keyed_by_zip_code(self):
+        self.cache.get_place("1000 Dorchester Ave", "02125", self.lookup)
+        self.cache.get_place("1000 Dorchester Ave", "02122", self.lookup)
+        self.assertEqual(2, self.lookup.call_count)
+
+    def test_place_expires(self):
+        self.cache.get_place("1000 Dorchester Ave", None, self.lookup)
+        self.now += HOUR
+        self.cache.get_place("1000 Dorchester Ave", None, self.lookup)
+        self.assertEqual(2, self.lookup.call_count)
+
+    def test_missing_place_is_not_cached(self):
+        self.lookup.return_value = {}
+        self.assertEqual({}, self.cache.get_place("1 Nowhere St", None,
+                                                  self.lookup))
+        self.cache.get_place("1 Nowhere St", None, self.lookup)
+        self.assertEqual(2, self.lookup.call_count)
+
+    def test_lookup_errors_are_passed_on(self):
+        self.lookup.side_effect = MultipleAddressError
+        with self.assertRaises(MultipleAddressError):
+            self.cache.get_place("1000 Dorchester Ave", None, self.lookup)
+
+    def test_schedule_is_kept_until_next_event_has_passed(self):
+        place = test_constants.GET_ADDRESS_API_MOCK
+        self.cache.get_schedule(place, self.fetch)
+        # the next event is on 2018-05-04
+        self.now += 35 * HOUR
+        schedule = self.cache.get_schedule(place, self.fetch)
+        self.assertEqual(test_constants.GET_TRASH_DAY_MOCK, schedule)
+        self.assertEqual(1, self.fetch.call_count)
+        self.now += HOUR
+        self.cache.get_schedule(place, self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_schedule_without_next_event_is_not_cached(self):
+        self.fetch.return_value = {}
+        place = test_constants.GET_ADDRESS_API_MOCK
+        self.cache.get_schedule(place, self.fetch)
+        self.cache.get_schedule(place, self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_least_recently_used_place_is_evicted(self):
+        for address in ("1 A St", "2 B St", "1 A St", "3 C St", "1 A St"):
+            self.cache.get_place(address, None, self.lookup)
+        self.assertEqual(3, self.lookup.call_count)
+
+    def test_repeat_trash_question_makes_no_calls(self):
+        with mock.patch.object(trash_intent, 'recollect_cache',
+                               self.cache), \
+                mock.patch.object(trash_intent, 'get_address_api_info',
+                                  self.lookup), \
+                mock.patch.object(trash_intent, 'get_trash_day_data',
+                                  self.fetch):
+            for _ in range(2):
+                days = trash_intent.get_trash_and_recycling_days(
+                    "1000 Dorchester Ave")
+                self.assertEqual(["Friday"], days)
+        self.assertEqual(1, self.lookup.call_count)
+        self.assertEqual(1, self.fetch.call_count)
@@ -0,0 +1,72 @@
+import csv
+import numpy as np
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+from mycity.utilities.record_store import RecordStore
+
+
+class RecordStoreTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(test_constants.PARKING_LOTS_TEST_CSV,
+                  encoding='utf-8-sig') as csv_file:
+            self.records = list(csv.DictReader(csv_file, delimiter=','))
+        self.store = RecordStore.from_records(self.records)
+
+    def test_records_round_trip(self):
+        self.assertEqual(len(self.records), len(self.store))
+        self.assertEqual(self.records,
+                         [record.as_dict() for record in self.store])
+
+    def test_view_behaves_like_a_dictionary(self):
+        view = self.store[3]
+        self.assertEqual(self.records[3]['Name'], view['Name'])
+        self.assertEqual(self.records[3], {**view})
+        self.assertEqual(self.records[3].get('Fee'), view.get('Fee'))
+        self.assertIsNone(view.get('Missing'))
+        with self.assertRaises(KeyError):
+            view['Missing']
+
+    def test_views_have_no_instance_dictionary(self):
+        self.assertFalse(hasattr(self.store[0], '__dict__'))
+
+    def test_repeated_values_are_stored_once(self):
+        fees = [fee for fee in self.store.column('Fee') if fee == 'No Charge']
+        self.assertGreater(len(fees), 1)
+        self.assertTrue(all(fee is fees[0] for fee in fees))
+
+    def test_coordinates_are_float_arrays(self):
+        self.assertEqual(np.float64, self.store.xs.dtype)
+        self.assertEqual(float(self.records[0]['X']), self.store.xs[0])
+        missing = [i for i, record in enumerate(self.records)
+                   if not record['X']]
+        self.assertTrue(np.isnan(self.store.xs[missing]).all())
+
+    def test_with_column_shares_other_columns(self):
+        addresses = [address + ' Boston, MA'
+                     for address in self.store.column('Address')]
+        updated = self.store.with_column('Address', addresses)
+        self.assertEqual(addresses, updated.column('Address'))
+        self.assertEqual(self.records[0]['Address'], self.store[0]['Address'])
+        self.assertIs(self.store.column('Name'), updated.column('Name'))
+        self.assertIs(self.store.xs, updated.xs)
+
+    def test_select(self):
+        selected = self.store.select([5, 1])
+        self.assertEqual([self.records[5], self.records[1]],
+                         [record.as_dict() for record in selected])
+        self.assertEqual(float(self.records[1]['Y']), selected.ys[1])
+
+    def test_missing_fields_are_none(self):
+        store = RecordStore.from_records([{'Name': 'A'},
+                                          {'Name': 'B', 'X': '-71.0'}])
+        self.assertEqual(['Name', 'X'], store.fields)
+        self.assertIsNone(store[0]['X'])
+        self.assertTrue(np.isnan(store.xs[0]))
+        self.assertTrue(np.isnan(store.ys).all())
+
+    def test_columns_round_trip(self):
+        copy = RecordStore.from_columns(self.store.to_columns())
+        self.assertEqual([record.as_dict() for record in self.store],
+                         [record.as_dict() for record in copy])
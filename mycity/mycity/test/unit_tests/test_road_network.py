@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest.mock as mock
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.road_network as road_network_utils
+from mycity.utilities.geocoding_service import Coordinate
+from mycity.utilities.road_network import RoadNetwork
+
+ORIGIN = Coordinate(-71.060, 42.300, "origin")
+# straight-line closest, but only reachable through the slow side street
+SIDE_STREET = (-71.060, 42.3015)
+# further away, on the main road
+MAIN_ROAD = (-71.056, 42.300)
+UNREACHABLE = (-71.049, 42.310)
+
+
+class RoadNetworkTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.network = RoadNetwork.from_edge_csv_file(
+            test_constants.ROAD_NETWORK_TEST_CSV)
+
+    def test_builds_adjacency_from_edge_list(self):
+        self.assertEqual(7, len(self.network))
+        # four two way roads, one one way road and the isolated road
+        self.assertEqual(11, len(self.network.targets))
+        self.assertEqual(len(self.network) + 1, len(self.network.offsets))
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "road_network.npz")
+            self.network.save(path)
+            loaded = RoadNetwork.load(path)
+        self.assertEqual(self.network.offsets.tolist(),
+                         loaded.offsets.tolist())
+        self.assertEqual(self.network.targets.tolist(),
+                         loaded.targets.tolist())
+        self.assertEqual(self.network.seconds.tolist(),
+                         loaded.seconds.tolist())
+
+    def test_closest_by_driving_time(self):
+        destinations = {SIDE_STREET: "1 Side St", MAIN_ROAD: "2 Main St"}
+        closest = road_network_utils.find_closest_route(
+            self.network, ORIGIN, destinations)
+        self.assertEqual("2 Main St", closest['Address'])
+        self.assertEqual("0.5 minutes", closest['Driving_time'])
+        self.assertEqual("0.21 miles", closest['Driving_distance'])
+
+    def test_one_way_roads_are_followed(self):
+        origin = Coordinate(SIDE_STREET[0], SIDE_STREET[1], "origin")
+        closest = road_network_utils.find_closest_route(
+            self.network, origin, {(ORIGIN.x, ORIGIN.y): "3 Origin St"})
+        self.assertEqual("0.33 minutes", closest['Driving_time'])
+
+    def test_unreachable_destinations(self):
+        self.assertIsNone(road_network_utils.find_closest_route(
+            self.network, ORIGIN, {UNREACHABLE: "4 Island Rd"}))
+
+    def test_missing_origin_coordinate(self):
+        self.assertIsNone(road_network_utils.find_closest_route(
+            self.network, None, {MAIN_ROAD: "2 Main St"}))
+
+    def test_routing_engine_setting(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "road_network.npz")
+            road_network_utils.build_road_network_file(
+                test_constants.ROAD_NETWORK_TEST_CSV, path)
+            with mock.patch.object(road_network_utils, '_road_network',
+                                   None), \
+                    mock.patch.object(road_network_utils,
+                                      '_road_network_loaded', False):
+                with mock.patch.dict(os.environ, {'ROUTING_ENGINE': 'arcgis'}):
+                    self.assertIsNone(road_network_utils.get_road_network())
+                with mock.patch.dict(os.environ,
+                                     {'ROUTING_ENGINE': 'local',
+                                      'ROAD_NETWORK_FILE': path}):
+                    network = road_network_utils.get_road_network()
+        self.assertEqual(len(self.network), len(network))
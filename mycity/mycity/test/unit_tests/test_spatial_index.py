@@ -0,0 +1,49 @@
+import random
+import mycity.test.unit_tests.base as base
+import mycity.utilities.distance_utils as distance_utils
+from mycity.utilities.finder.SpatialIndex import SpatialIndex
+
+
+class SpatialIndexTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generator = random.Random(311)
+        self.records = [
+            {'OBJECTID': i,
+             'X': str(-71.19 + generator.random() * 0.2),
+             'Y': str(42.23 + generator.random() * 0.17)}
+            for i in range(500)
+        ]
+        self.records.append({'OBJECTID': 500, 'X': '', 'Y': ''})
+        self.index = SpatialIndex(self.records, id_key='OBJECTID')
+
+    def _brute_force(self, origin_x, origin_y, k):
+        with_coordinates = [record for record in self.records if record['X']]
+        distances = distance_utils.haversine_distances(
+            origin_x, origin_y,
+            [record['X'] for record in with_coordinates],
+            [record['Y'] for record in with_coordinates])
+        ranked = sorted(zip(distances, with_coordinates),
+                        key=lambda pair: pair[0])
+        return [record for _, record in ranked[:k]]
+
+    def test_records_without_coordinates_are_not_indexed(self):
+        self.assertEqual(500, len(self.index))
+
+    def test_k_nearest_finds_closest_records(self):
+        for origin_x, origin_y in [(-71.06, 42.36), (-71.12, 42.30),
+                                   (-70.90, 42.50)]:
+            records, distances = self.index.k_nearest(origin_x, origin_y, 7)
+            expected = self._brute_force(origin_x, origin_y, 7)
+            self.assertEqual([record['OBJECTID'] for record in expected],
+                             [record['OBJECTID'] for record in records])
+            self.assertEqual(sorted(distances), distances)
+
+    def test_k_larger_than_dataset(self):
+        records, _ = self.index.k_nearest(-71.06, 42.36, 10000)
+        self.assertEqual(500, len(records))
+
+    def test_get_by_facility_id(self):
+        self.assertEqual(self.records[42], self.index.get(42))
+        self.assertIsNone(self.index.get(-1))
@@ -0,0 +1,185 @@
+import calendar
+import datetime
+import unittest.mock as mock
+import mycity.intents.intent_constants as intent_constants
+import mycity.intents.speech_constants.trash_intent as speech_constants
+import mycity.intents.trash_intent as trash_intent
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.trash_calendar as trash_calendar
+from mycity.utilities.recollect_cache import RecollectCache, \
+    recollect_cache
+from mycity.utilities.trash_calendar import TrashCalendar
+
+# Friday of a week with no delay, and Tuesday of Memorial Day week
+FRIDAY = datetime.date(2018, 5, 4)
+MEMORIAL_DAY_WEEK = datetime.date(2018, 5, 29)
+
+
+def _make_calendar(start=datetime.date(2018, 4, 30),
+                   horizon=datetime.date(2018, 6, 30)):
+    # only the events ReCollect would return for the requested days
+    first_day = start.strftime(trash_calendar.DAY_FORMAT)
+    events = [event for event
+              in test_constants.GET_TRASH_CALENDAR_MOCK["events"]
+              if event.get("day", first_day) >= first_day]
+    return TrashCalendar.from_events_json({"events": events}, start,
+                                          horizon)
+
+
+class TrashCalendarTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calendar = _make_calendar()
+
+    def test_events_without_day_are_skipped(self):
+        self.assertEqual(4, len(self.calendar.events))
+
+    def test_next_collection(self):
+        self.assertEqual(FRIDAY,
+                         self.calendar.get_next_collection("trash", FRIDAY))
+        self.assertEqual(datetime.date(2018, 5, 11),
+                         self.calendar.get_next_collection("yard waste",
+                                                           FRIDAY))
+        self.assertEqual(datetime.date(2018, 6, 2),
+                         self.calendar.get_next_collection(
+                             "Recycling", datetime.date(2018, 5, 12)))
+
+    def test_no_next_collection_before_horizon(self):
+        self.assertIsNone(self.calendar.get_next_collection(
+            "christmas tree", FRIDAY))
+        self.assertIsNone(self.calendar.get_next_collection(
+            "yard waste", datetime.date(2018, 5, 12)))
+
+    def test_delays(self):
+        start, end = trash_calendar.get_week_bounds(MEMORIAL_DAY_WEEK)
+        self.assertEqual((datetime.date(2018, 5, 28),
+                          datetime.date(2018, 6, 3)), (start, end))
+        self.assertEqual([(datetime.date(2018, 5, 28), "Memorial Day delay")],
+                         self.calendar.get_delays(start, end))
+        start, end = trash_calendar.get_week_bounds(FRIDAY)
+        self.assertEqual([], self.calendar.get_delays(start, end))
+
+    def test_covers(self):
+        self.assertTrue(self.calendar.covers(datetime.date(2018, 6, 23)))
+        self.assertFalse(self.calendar.covers(datetime.date(2018, 6, 24)))
+        calendar = _make_calendar(start=MEMORIAL_DAY_WEEK)
+        self.assertFalse(calendar.covers(MEMORIAL_DAY_WEEK))
+
+
+class TrashCalendarCacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000
+        self.cache = RecollectCache(clock=lambda: self.now)
+        self.place = dict(test_constants.GET_ADDRESS_API_MOCK)
+        self.fetch = mock.Mock(
+            side_effect=lambda first_day, last_day:
+            _make_calendar(first_day, last_day))
+
+    def test_calendar_is_fetched_once_per_horizon(self):
+        self.cache.get_calendar(self.place, self.fetch, FRIDAY)
+        self.fetch.assert_called_once_with(
+            datetime.date(2018, 4, 30), FRIDAY + datetime.timedelta(
+                days=trash_calendar.CALENDAR_DAYS))
+        later = FRIDAY + datetime.timedelta(
+            days=trash_calendar.CALENDAR_DAYS -
+            trash_calendar.MIN_LOOKAHEAD_DAYS)
+        self.cache.get_calendar(self.place, self.fetch, later)
+        self.assertEqual(1, self.fetch.call_count)
+        self.cache.get_calendar(self.place, self.fetch,
+                                later + datetime.timedelta(days=1))
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_calendar_outlives_schedule_ttl(self):
+        self.now = calendar.timegm(FRIDAY.timetuple())
+        first = self.cache.get_calendar(self.place, self.fetch, FRIDAY)
+        later = FRIDAY + datetime.timedelta(days=30)
+        self.now = calendar.timegm(later.timetuple())
+        self.assertIs(first,
+                      self.cache.get_calendar(self.place, self.fetch, later))
+        self.assertEqual(1, self.fetch.call_count)
+
+    def test_failed_refresh_keeps_calendar(self):
+        cached = self.cache.get_calendar(self.place, self.fetch, FRIDAY)
+        self.fetch.side_effect = None
+        self.fetch.return_value = None
+        self.assertIs(cached, self.cache.get_calendar(
+            self.place, self.fetch, datetime.date(2018, 6, 30)))
+
+
+class TrashCalendarIntentTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.request.session_attributes[
+            intent_constants.CURRENT_ADDRESS_KEY] = "1000 Dorchester Ave"
+        self.get_address_api_info = mock.Mock(
+            return_value=dict(test_constants.GET_ADDRESS_API_MOCK))
+        self.get_trash_calendar_data = mock.Mock(
+            side_effect=lambda params, first_day, last_day:
+            _make_calendar(first_day, last_day))
+        self.patches = [
+            mock.patch.object(trash_intent, 'get_address_api_info',
+                              self.get_address_api_info),
+            mock.patch.object(trash_intent, 'get_trash_calendar_data',
+                              self.get_trash_calendar_data),
+            mock.patch.object(trash_calendar, 'today_in_boston',
+                              return_value=MEMORIAL_DAY_WEEK),
+            # cached calendars expire with the 2018 fixture's horizon
+            mock.patch.object(recollect_cache, '_clock', lambda:
+                              calendar.timegm(MEMORIAL_DAY_WEEK.timetuple()))
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        super().tearDown()
+
+    def test_delay(self):
+        response = trash_intent.get_trash_delay_info(self.request)
+        self.assertEqual(
+            speech_constants.DELAYED.format("Memorial Day delay on Monday"),
+            response.output_speech)
+
+    def test_delay_earlier_in_the_week(self):
+        wednesday = MEMORIAL_DAY_WEEK + datetime.timedelta(days=1)
+        with mock.patch.object(trash_calendar, 'today_in_boston',
+                               return_value=wednesday):
+            response = trash_intent.get_trash_delay_info(self.request)
+        self.assertEqual(
+            speech_constants.DELAYED.format("Memorial Day delay on Monday"),
+            response.output_speech)
+
+    def test_next_collection(self):
+        self.request.intent_variables["CollectionType"] = {
+            "name": "CollectionType", "value": "recycling"}
+        response = trash_intent.get_next_collection_info(self.request)
+        self.assertEqual(
+            speech_constants.NEXT_COLLECTION.format("recycling",
+                                                    "Saturday, June 2"),
+            response.output_speech)
+
+    def test_questions_share_one_calendar_request(self):
+        trash_intent.get_trash_delay_info(self.request)
+        trash_intent.get_next_collection_info(self.request)
+        self.assertEqual(1, self.get_address_api_info.call_count)
+        self.assertEqual(1, self.get_trash_calendar_data.call_count)
+
+    def test_address_not_found(self):
+        self.get_address_api_info.return_value = {}
+        response = trash_intent.get_next_collection_info(self.request)
+        self.assertEqual(
+            speech_constants.ADDRESS_NOT_FOUND.format("1000 Dorchester Ave"),
+            response.output_speech)
+
+    def test_failed_calendar_request(self):
+        self.get_trash_calendar_data.side_effect = None
+        self.get_trash_calendar_data.return_value = None
+        response = trash_intent.get_trash_delay_info(self.request)
+        self.assertEqual(speech_constants.BAD_API_RESPONSE,
+                         response.output_speech)
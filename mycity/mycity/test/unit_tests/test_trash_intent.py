@@ -0,0 +1,104 @@
+import copy
+import unittest.mock as mock
+import mycity.intents.intent_constants as intent_constants
+import mycity.intents.speech_constants.trash_intent as speech_constants
+import mycity.intents.trash_intent as trash_intent
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+from mycity.intents.custom_errors import MultipleAddressError
+
+
+def _make_place(zip_code, place_id):
+    place = dict(test_constants.GET_ADDRESS_API_MOCK)
+    place["name"] = "1000 Dorchester Ave, Boston, {}".format(zip_code)
+    place["place_id"] = place_id
+    return place
+
+
+def _make_schedule(zone_title):
+    schedule = copy.deepcopy(test_constants.GET_TRASH_DAY_MOCK)
+    schedule["next_event"]["zone"]["title"] = zone_title
+    return schedule
+
+
+class TrashMultipleAddressTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.request.session_attributes[
+            intent_constants.CURRENT_ADDRESS_KEY] = "1000 Dorchester Ave"
+        self.candidates = {"02125": _make_place("02125", "A"),
+                           "02122": _make_place("02122", "B")}
+        self.schedules = {"A": _make_schedule("Friday"),
+                          "B": _make_schedule("Monday & Thursday")}
+        self.get_address_api_info = mock.Mock(
+            side_effect=MultipleAddressError(candidates=self.candidates))
+        self.get_trash_day_data = mock.Mock(
+            side_effect=lambda params: self.schedules[params["place_id"]])
+        self.patches = [
+            mock.patch.object(trash_intent, 'get_address_api_info',
+                              self.get_address_api_info),
+            mock.patch.object(trash_intent, 'get_trash_day_data',
+                              self.get_trash_day_data)
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        super().tearDown()
+
+    def test_every_zip_code_is_looked_up(self):
+        trash_days = trash_intent.get_trash_days_by_zip_code(
+            "1000 Dorchester Ave", self.candidates)
+        self.assertEqual({"02125": ["Friday"],
+                          "02122": ["Monday", "Thursday"]}, trash_days)
+
+    def test_unmatched_address_has_no_days(self):
+        self.candidates["02122"]["name"] = "1000 Dorchester St, Boston, 02122"
+        trash_days = trash_intent.get_trash_days_by_zip_code(
+            "1000 Dorchester Ave", self.candidates)
+        self.assertIsNone(trash_days["02122"])
+
+    def test_common_trash_days(self):
+        self.assertEqual(["Friday"], trash_intent.get_common_trash_days(
+            {"02125": ["Friday"], "02122": ["Friday"]}))
+        self.assertIsNone(trash_intent.get_common_trash_days(
+            {"02125": ["Friday"], "02122": ["Monday"]}))
+        self.assertIsNone(trash_intent.get_common_trash_days(
+            {"02125": ["Friday"], "02122": None}))
+
+    def test_same_days_are_answered_directly(self):
+        self.schedules["B"] = _make_schedule("Friday")
+        response = trash_intent.get_trash_day_info(self.request)
+        self.assertEqual(speech_constants.PICK_UP_DAY.format("Friday"),
+                         response.output_speech)
+        self.assertIsNone(response.dialog_directive)
+
+    def test_zip_code_answer_needs_no_lookups(self):
+        response = trash_intent.get_trash_day_info(self.request)
+        self.assertEqual("Zipcode",
+                         response.dialog_directive["slotToElicit"])
+        self.assertEqual(2, self.get_trash_day_data.call_count)
+
+        self.request.session_attributes[intent_constants.ZIP_CODE_KEY] = \
+            "02122"
+        response = trash_intent.get_trash_day_info(self.request)
+        self.assertEqual(
+            speech_constants.PICK_UP_DAY.format("Monday and Thursday"),
+            response.output_speech)
+        self.assertEqual(1, self.get_address_api_info.call_count)
+        self.assertEqual(2, self.get_trash_day_data.call_count)
+
+    def test_stored_days_are_ignored_for_another_address(self):
+        trash_intent.get_trash_day_info(self.request)
+        self.request.session_attributes[
+            intent_constants.CURRENT_ADDRESS_KEY] = "1 Main St"
+        self.request.session_attributes[intent_constants.ZIP_CODE_KEY] = \
+            "02122"
+        self.get_address_api_info.side_effect = None
+        self.get_address_api_info.return_value = {}
+        response = trash_intent.get_trash_day_info(self.request)
+        self.assertEqual(2, self.get_address_api_info.call_count)
+        self.assertIn("1 Main St", response.output_speech)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest.mock as mock
+import mycity.intents.trash_intent as trash_intent
+import mycity.test.test_constants as test_constants
+import mycity.test.unit_tests.base as base
+import mycity.utilities.trash_schedule_index as trash_schedule_index
+from mycity.utilities.trash_schedule_index import TrashScheduleIndex
+
+
+class TrashScheduleIndexTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = TrashScheduleIndex.from_csv_file(
+            test_constants.TRASH_SCHEDULES_TEST_CSV)
+
+    def test_parse_trash_days(self):
+        self.assertEqual(["Monday", "Thursday"],
+                         trash_schedule_index.parse_trash_days("MTh"))
+        self.assertEqual(["Tuesday", "Friday"],
+                         trash_schedule_index.parse_trash_days("TF"))
+        self.assertEqual(["Tuesday", "Friday"],
+                         trash_schedule_index.parse_trash_days(
+                             "Friday & Tuesday"))
+        self.assertEqual([], trash_schedule_index.parse_trash_days(""))
+
+    def test_zones_are_shared(self):
+        self.assertEqual(7, len(self.index))
+        self.assertEqual([["Friday"], ["Tuesday", "Friday"],
+                          ["Monday", "Thursday"], ["Wednesday"]],
+                         self.index.zones)
+
+    def test_lookup(self):
+        self.assertEqual(["Friday"],
+                         self.index.lookup("1000 dorchester avenue"))
+        self.assertEqual(["Wednesday"],
+                         self.index.lookup("5 West 1st Street"))
+
+    def test_lookup_with_zip_code(self):
+        self.assertEqual(["Tuesday", "Friday"],
+                         self.index.lookup("1 Beacon St", "02108"))
+        self.assertEqual(["Monday", "Thursday"],
+                         self.index.lookup("1 Beacon St 02135"))
+
+    def test_street_in_zip_codes_with_different_days_needs_zip_code(self):
+        self.assertIsNone(self.index.lookup("1 Beacon St"))
+
+    def test_street_in_zip_codes_with_same_days(self):
+        self.assertEqual(["Monday", "Thursday"],
+                         self.index.lookup("12 Adams St"))
+
+    def test_misses(self):
+        self.assertIsNone(self.index.lookup("1002 Dorchester Ave"))
+        self.assertIsNone(self.index.lookup("40 Nowhere Ln"))
+        self.assertIsNone(self.index.lookup("1 Beacon St", "02125"))
+        self.assertIsNone(self.index.lookup("Boston City Hall"))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data", "trash.json.gz")
+            trash_schedule_index.build_trash_schedule_file(
+                test_constants.TRASH_SCHEDULES_TEST_CSV, path)
+            with mock.patch.object(trash_schedule_index,
+                                   '_trash_schedule_index', None), \
+                    mock.patch.object(trash_schedule_index,
+                                      '_trash_schedule_index_loaded', False), \
+                    mock.patch.dict(os.environ,
+                                    {'TRASH_SCHEDULE_FILE': path}):
+                index = trash_schedule_index.get_trash_schedule_index()
+        self.assertEqual(self.index.zones, index.zones)
+        self.assertIsNone(index.lookup("1 Beacon St"))
+        self.assertEqual(["Monday", "Thursday"],
+                         index.lookup("1 Beacon St", "02135"))
+
+    def test_missing_index_file(self):
+        with mock.patch.object(trash_schedule_index,
+                               '_trash_schedule_index', None), \
+                mock.patch.object(trash_schedule_index,
+                                  '_trash_schedule_index_loaded', False), \
+                mock.patch.dict(os.environ,
+                                {'TRASH_SCHEDULE_FILE': '/no/such/file'}):
+            self.assertIsNone(trash_schedule_index.get_trash_schedule_index())
+
+    def test_trash_intent_uses_index_first(self):
+        with mock.patch.object(trash_schedule_index,
+                               'get_trash_schedule_index',
+                               return_value=self.index), \
+                mock.patch.object(trash_intent, 'get_address_api_info',
+                                  return_value={}) as get_address_api_info:
+            self.assertEqual(["Friday"],
+                             trash_intent.get_trash_and_recycling_days(
+                                 "1000 Dorchester Ave"))
+            get_address_api_info.assert_not_called()
+            # misses fall back to ReCollect
+            with self.assertRaises(trash_intent.InvalidAddressError):
+                trash_intent.get_trash_and_recycling_days("1 Beacon St")
+            get_address_api_info.assert_called_once_with("1 Beacon St", None)
@@ -0,0 +1,201 @@
+"""
+Cached parser for the street addresses users give the skill
+
+A single request used to build several StreetAddressParser objects and
+parse the same address string again in each of them. parse_address keeps
+one parser with its street suffix, direction and suite tables built once,
+and remembers the result for each address string it has seen. Results are
+ParsedAddress tuples, which are immutable and so can be shared between
+callers. Each one carries a canonical key that caches and comparisons use
+instead of the raw string.
+"""
+
+import collections
+import functools
+import re
+from streetaddress.streetaddress import get_abbrev_suffix_dict, \
+    get_text2num_dict
+
+# Number of address strings whose parse results are kept
+PARSED_ADDRESS_CACHE_SIZE = 4096
+
+ParsedAddress = collections.namedtuple("ParsedAddress", [
+    "house",        # house number, e.g. "1000" or "12 1/2"
+    "street_name",  # street without its suffix, e.g. "Dorchester"
+    "street_type",  # street suffix as written, e.g. "Avenue"
+    "street_full",  # street name and suffix as written
+    "suite_type",   # e.g. "Apt" or "#"
+    "suite_num",
+    "other",        # anything after the street, e.g. "Boston MA 02125"
+    "street",       # normalized street name, e.g. "dorchester ave"
+    "zip_code",     # five digit zip code found in other, or None
+    "key"           # canonical form of the whole address
+])
+
+# Street suffixes used in Boston that aren't in the USPS table of
+# streetaddress, or are spelled differently there
+_BOSTON_STREET_SUFFIXES = {
+    "av": "ave",
+    "pkway": "pkwy",
+    "tce": "ter",
+    "terr": "ter",
+    "wharf": "whf",
+    "whf": "whf",
+    "wy": "way"
+}
+_DIRECTIONS = {"east": "e", "west": "w", "north": "n", "south": "s"}
+_SUITE_TYPES = frozenset([
+    "suite", "ste", "apt", "apartment", "room", "rm", "#", "unit", "un",
+    "unt"
+])
+_NON_WORD_CHARACTERS = re.compile(r"[^\w\s]")
+_ORDINAL = re.compile(r"^\d+(st|nd|rd|th)$", re.IGNORECASE)
+_HOUSE_NUMBER = re.compile(r"^\d\S*$")
+_ZIP_CODE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+
+class AddressParser(object):
+
+    """
+    Splits an address into house number, street, suite and the rest,
+    following the rules of streetaddress's StreetAddressParser
+    """
+
+    def __init__(self):
+        # lowercase suffix -> lowercase abbreviation ("avenue" -> "ave")
+        self.street_suffixes = {
+            suffix.lower(): abbreviation.lower()
+            for suffix, abbreviation in get_abbrev_suffix_dict().items()}
+        for abbreviation in list(self.street_suffixes.values()):
+            self.street_suffixes.setdefault(abbreviation, abbreviation)
+        self.street_suffixes.update(_BOSTON_STREET_SUFFIXES)
+        self.numbers = {word: str(number)
+                        for word, number in get_text2num_dict().items()}
+
+    def normalize_street_name(self, street):
+        """
+        Reduces a street name to a canonical form: lowercase, with the
+        street suffix ("Avenue" -> "ave") and numbered street directions
+        abbreviated
+
+        :param street: String containing a street name, e.g.
+            "Dorchester Avenue"
+        :return: String containing the normalized street name
+        """
+        words = _NON_WORD_CHARACTERS.sub(" ", street).lower().split()
+        for index, word in enumerate(words[:-1]):
+            # only directions before a numbered street, e.g. "West 1st St"
+            if word in _DIRECTIONS and words[index + 1][0].isdigit():
+                words[index] = _DIRECTIONS[word]
+        if words:
+            words[-1] = self.street_suffixes.get(words[-1], words[-1])
+        return " ".join(words)
+
+    def parse(self, address):
+        """
+        :param address: String containing an address
+        :return: ParsedAddress object
+        """
+        fields = self._split(address.split())
+        street_full = fields["street_full"]
+        zip_code = _ZIP_CODE.search(fields["other"] or "")
+        return ParsedAddress(
+            street=self.normalize_street_name(street_full)
+            if street_full else None,
+            zip_code=zip_code.group(1) if zip_code else None,
+            key=self._get_key(address),
+            **fields)
+
+    def _get_key(self, address):
+        """
+        :param address: String containing an address
+        :return: String containing the lowercase normalized address, the
+            same for different spellings of an address
+            ("1000 Dorchester Avenue, Boston, MA" and
+            "1000 dorchester ave Boston MA")
+        """
+        tokens = _NON_WORD_CHARACTERS.sub(" ", address).split()
+        fields = self._split(tokens)
+        if not fields["house"]:
+            return " ".join(tokens).lower()
+        parts = [fields["house"],
+                 self.normalize_street_name(fields["street_full"] or ""),
+                 fields["suite_type"], fields["suite_num"], fields["other"]]
+        return " ".join(part for part in parts if part).lower()
+
+    def _split(self, tokens):
+        """
+        :param tokens: list of the words of an address
+        :return: dictionary of the ParsedAddress fields read from the words
+        """
+        house = None
+        start = 0
+        if tokens:
+            first = tokens[0].lower()
+            if first in self.numbers:
+                house = self.numbers[first]
+                start = 1
+            elif _ORDINAL.match(first):
+                # the address starts with a numbered street, not a house
+                pass
+            elif _HOUSE_NUMBER.match(first):
+                house = tokens[0]
+                start = 1
+            if house and len(tokens) >= 2 and tokens[1] == "1/2":
+                house += " 1/2"
+                start = 2
+
+        street_words = []
+        other_words = []
+        street_type = suite_type = suite_num = None
+        state = "street"
+        for word in tokens[start:]:
+            # trailing dots of abbreviations and commas between parts
+            word = word.rstrip(".,")
+            lower_word = word.lower()
+            if lower_word in self.street_suffixes and street_words:
+                street_type = word
+                state = "other"
+            elif lower_word in _SUITE_TYPES:
+                suite_type = word
+                state = "suite"
+            elif len(word) > 1 and word[0] == "#" and suite_num is None:
+                suite_type = "#"
+                suite_num = word[1:]
+                state = "other"
+            elif state == "street":
+                street_words.append(word)
+            elif state == "suite":
+                suite_num = word
+                state = "other"
+            else:
+                other_words.append(word)
+
+        street_name = " ".join(street_words) or None
+        street_full = " ".join(word for word in (street_name, street_type)
+                               if word) or None
+        return {
+            "house": house,
+            "street_name": street_name,
+            "street_type": street_type,
+            "street_full": street_full,
+            "suite_type": suite_type,
+            "suite_num": suite_num,
+            "other": " ".join(other_words) or None
+        }
+
+
+# parser shared by every request in this container
+address_parser = AddressParser()
+
+
+@functools.lru_cache(maxsize=PARSED_ADDRESS_CACHE_SIZE)
+def parse_address(address):
+    """
+    Parses an address, reusing the result of earlier calls with the same
+    string
+
+    :param address: String containing an address
+    :return: ParsedAddress object
+    """
+    return address_parser.parse(address)
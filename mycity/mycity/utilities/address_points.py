@@ -0,0 +1,138 @@
+"""
+Offline geocoding against the city's address-point dataset
+
+Boston publishes every address in the city, with its coordinates, as the
+Street Address Management (SAM) dataset. Loading a csv export of it into
+an AddressPointIndex lets us answer most geocoding requests from memory,
+only falling back to a geocoding service for addresses we don't have.
+"""
+
+import csv
+import sys
+import numpy as np
+import mycity.utilities.address_utils as address_utils
+import mycity.utilities.distance_utils as distance_utils
+from mycity.utilities.address_parser import parse_address
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of the SAM address-point csv
+X_FIELD = "X"
+Y_FIELD = "Y"
+HOUSE_NUMBER_FIELD = "STREET_NUMBER"
+STREET_FIELD = "FULL_STREET_NAME"
+ZIP_CODE_FIELD = "ZIP_CODE"
+ADDRESS_FIELD = "FULL_ADDRESS"
+
+# Marks a house number and street that exists in more than one zip code,
+# which can't be geocoded without the zip code
+AMBIGUOUS = -1
+
+
+def _normalize_zip_code(zip_code):
+    """
+    :param zip_code: String containing a zip code, or None
+    :return: String containing the five digit zip code, or the stripped
+        input if it isn't numeric
+    """
+    zip_code = (zip_code or "").strip()
+    # csv exports sometimes drop the leading zero of Boston zip codes
+    return zip_code.zfill(5) if zip_code.isdigit() else zip_code
+
+
+class AddressPointIndex(object):
+
+    """
+    Exact match index of address points, keyed by normalized house
+    number, street name and zip code. Coordinates are kept in NumPy
+    arrays and the hash tables only map keys to row numbers.
+    """
+
+    def __init__(self, records):
+        """
+        :param records: iterable of dictionaries with the SAM csv fields
+        """
+        xs = []
+        ys = []
+        self._addresses = []
+        self._zip_codes = []
+        # (house number, street, zip code) -> row
+        self._by_zip_code = {}
+        # (house number, street) -> row, or AMBIGUOUS
+        self._by_street = {}
+
+        for record in records:
+            house_number = (record[HOUSE_NUMBER_FIELD] or "").strip().lower()
+            street = address_utils.normalize_street_name(
+                record[STREET_FIELD] or "")
+            if not house_number or not street:
+                continue
+            row = len(xs)
+            xs.append(record[X_FIELD])
+            ys.append(record[Y_FIELD])
+            self._addresses.append(record[ADDRESS_FIELD])
+            # street names and zip codes repeat on every address point
+            street = sys.intern(street)
+            zip_code = sys.intern(
+                _normalize_zip_code(record[ZIP_CODE_FIELD]))
+            self._zip_codes.append(zip_code)
+
+            self._by_zip_code.setdefault((house_number, street, zip_code),
+                                         row)
+            street_key = (house_number, street)
+            indexed_row = self._by_street.get(street_key)
+            if indexed_row is None:
+                self._by_street[street_key] = row
+            elif indexed_row != AMBIGUOUS and \
+                    self._zip_codes[indexed_row] != zip_code:
+                self._by_street[street_key] = AMBIGUOUS
+
+        self._xs = distance_utils.coordinates_to_floats(xs)
+        self._ys = distance_utils.coordinates_to_floats(ys)
+        logger.debug("Indexed {} address points".format(len(self._xs)))
+
+    @classmethod
+    def from_csv_file(cls, path):
+        """
+        Builds an index from a csv export of the SAM dataset
+
+        :param path: path of the csv file
+        :return: AddressPointIndex object
+        """
+        logger.debug("Loading address points from " + path)
+        with open(path, encoding="utf-8-sig", newline="") as csv_file:
+            return cls(csv.DictReader(csv_file))
+
+    def __len__(self):
+        return len(self._xs)
+
+    def lookup(self, address):
+        """
+        Finds the address point matching an address exactly. Addresses
+        without a zip code only match when the house number and street
+        exist in a single zip code
+
+        :param address: String containing an address, e.g.
+            "1000 Dorchester Ave Boston MA 02125"
+        :return: Three-Tuple containing 1) longitude, 2) latitude and
+            3) the dataset's full address string, or None if there is
+            no match
+        """
+        parsed_address = parse_address(address)
+        if not parsed_address.house or not parsed_address.street:
+            return None
+        house_number = parsed_address.house.lower()
+        street = parsed_address.street
+
+        if parsed_address.zip_code is not None:
+            row = self._by_zip_code.get(
+                (house_number, street, parsed_address.zip_code))
+        else:
+            row = self._by_street.get((house_number, street))
+        if row is None or row == AMBIGUOUS:
+            return None
+        if np.isnan(self._xs[row]) or np.isnan(self._ys[row]):
+            return None
+        return (float(self._xs[row]), float(self._ys[row]),
+                self._addresses[row])
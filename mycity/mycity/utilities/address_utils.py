@@ -3,8 +3,8 @@ Utility function for building an address string from a mycity request
 
 """
 
-from streetaddress import StreetAddressParser
 import mycity.intents.intent_constants as intent_constants
+from mycity.utilities.address_parser import address_parser, parse_address
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,17 +19,37 @@ def build_origin_address(req):
     :return: String containing full address
     """
     logger.debug('MyCityRequestDataModel received:' + req.get_logger_string())
-    address_parser = StreetAddressParser()
     current_address = \
         req.session_attributes[intent_constants.CURRENT_ADDRESS_KEY]
-    parsed_address = address_parser.parse(current_address)
-    origin_address = " ".join([parsed_address["house"],
-                               parsed_address["street_full"]])
-    if parsed_address["other"]:
-        origin_address += " {}".format(parsed_address["other"])
+    parsed_address = parse_address(current_address)
+    origin_address = " ".join([parsed_address.house,
+                               parsed_address.street_full])
+    if parsed_address.other:
+        origin_address += " {}".format(parsed_address.other)
     else:
         origin_address += " Boston MA"
 
     return origin_address
 
 
+def normalize_street_name(street):
+    """
+    Reduces a street name to a canonical form: lowercase, with the street
+    suffix ("Avenue" -> "ave") and numbered street directions abbreviated
+
+    :param street: String containing a street name, e.g. "Dorchester Avenue"
+    :return: String containing the normalized street name
+    """
+    return address_parser.normalize_street_name(street)
+
+
+def normalize_address(address):
+    """
+    Reduces an address to a canonical form, so that different spellings of
+    the same address ("1000 Dorchester Avenue, Boston, MA" and
+    "1000 dorchester ave Boston MA") can share cache entries
+
+    :param address: String containing an address
+    :return: String containing the lowercase normalized address
+    """
+    return parse_address(address).key
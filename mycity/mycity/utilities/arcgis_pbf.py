@@ -0,0 +1,402 @@
+"""
+Decoder for FeatureServer query results in protocol buffer form (f=pbf)
+
+ArcGIS FeatureServers can return query results as an esriPBuffer
+FeatureCollectionPBuffer message, which is several times smaller than the
+same result as JSON. This module reads the protobuf wire format directly,
+so no generated code or protobuf package is needed, and returns the same
+dictionary a JSON query returns: 'fields', 'features' (each with
+'attributes' and 'geometry') and 'exceededTransferLimit'.
+
+Geometries in the message are quantized: coordinates are integers, delta
+encoded from the previous vertex, and mapped back to real coordinates
+with the transform's scale and translate.
+"""
+
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/x-protobuf"
+
+WIRE_VARINT = 0
+WIRE_64BIT = 1
+WIRE_LENGTH_DELIMITED = 2
+WIRE_32BIT = 5
+
+# FeatureCollectionPBuffer.GeometryType
+GEOMETRY_TYPES = {
+    0: "esriGeometryPoint",
+    1: "esriGeometryMultipoint",
+    2: "esriGeometryPolyline",
+    3: "esriGeometryPolygon",
+    4: "esriGeometryMultipatch",
+    127: "esriGeometryNull"
+}
+
+# FeatureCollectionPBuffer.FieldType
+FIELD_TYPES = {
+    0: "esriFieldTypeSmallInteger",
+    1: "esriFieldTypeInteger",
+    2: "esriFieldTypeSingle",
+    3: "esriFieldTypeDouble",
+    4: "esriFieldTypeString",
+    5: "esriFieldTypeDate",
+    6: "esriFieldTypeOID",
+    7: "esriFieldTypeGeometry",
+    8: "esriFieldTypeBlob",
+    9: "esriFieldTypeRaster",
+    10: "esriFieldTypeGUID",
+    11: "esriFieldTypeGlobalID",
+    12: "esriFieldTypeXML"
+}
+
+# FeatureCollectionPBuffer.QuantizeOriginPostion
+UPPER_LEFT_ORIGIN = 0
+# Index of the z and m values in the transform's scale and translate,
+# which are stored in x, y, m, z order
+Z_INDEX = 3
+M_INDEX = 2
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+
+
+class PbfDecodeError(ValueError):
+    """
+    Raised when a response isn't a valid FeatureCollectionPBuffer
+    """
+
+
+def _read_varint(data, position):
+    """
+    :param data: bytes of a protobuf message
+    :param position: offset of the varint
+    :return: Two-Tuple containing 1) the unsigned value and 2) the offset
+        after it
+    :raises: PbfDecodeError if the varint is truncated or too long
+    """
+    result = 0
+    shift = 0
+    end = len(data)
+    while position < end:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return (result, position)
+        shift += 7
+        if shift > 63:
+            raise PbfDecodeError("Varint longer than 64 bits")
+    raise PbfDecodeError("Truncated varint")
+
+
+def _iter_fields(data):
+    """
+    Iterates over the fields of a protobuf message
+
+    :param data: bytes of a protobuf message
+    :return: generator of (field number, wire type, value) tuples. The
+        value is an int for varints and bytes for every other wire type
+    :raises: PbfDecodeError if the message is malformed
+    """
+    position = 0
+    end = len(data)
+    while position < end:
+        key, position = _read_varint(data, position)
+        number = key >> 3
+        wire_type = key & 0x7
+        if wire_type == WIRE_VARINT:
+            value, position = _read_varint(data, position)
+        elif wire_type == WIRE_LENGTH_DELIMITED:
+            length, position = _read_varint(data, position)
+            value = data[position:position + length]
+            position += length
+        elif wire_type == WIRE_64BIT:
+            value = data[position:position + 8]
+            position += 8
+        elif wire_type == WIRE_32BIT:
+            value = data[position:position + 4]
+            position += 4
+        else:
+            raise PbfDecodeError("Unsupported wire type {}".format(wire_type))
+        if position > end:
+            raise PbfDecodeError("Truncated field {}".format(number))
+        yield (number, wire_type, value)
+
+
+def _zigzag(value):
+    """
+    :param value: zigzag encoded unsigned integer (sint32/sint64)
+    :return: the signed integer
+    """
+    return (value >> 1) ^ -(value & 1)
+
+
+def _signed_64(value):
+    """
+    :param value: unsigned varint holding an int64
+    :return: the signed integer
+    """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _packed_varints(data):
+    """
+    :param data: bytes of a packed repeated varint field
+    :return: list of the unsigned values
+    """
+    values = []
+    position = 0
+    end = len(data)
+    while position < end:
+        value, position = _read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def _repeated_varints(values, wire_type, value):
+    """
+    Adds the values of a repeated varint field, which may be packed or not
+
+    :param values: list to add to
+    :param wire_type: wire type the field was read with
+    :param value: value the field was read with
+    :return: None
+    """
+    if wire_type == WIRE_LENGTH_DELIMITED:
+        values.extend(_packed_varints(value))
+    else:
+        values.append(value)
+
+
+def _decode_value(data):
+    """
+    :param data: bytes of a Value message
+    :return: the attribute value, or None if the value is null
+    """
+    for number, _, value in _iter_fields(data):
+        if number == 1:
+            return value.decode("utf-8")
+        if number == 2:
+            return _FLOAT.unpack(value)[0]
+        if number == 3:
+            return _DOUBLE.unpack(value)[0]
+        if number in (4, 8):
+            return _zigzag(value)
+        if number in (5, 7):
+            return value
+        if number == 6:
+            return _signed_64(value)
+        if number == 9:
+            return bool(value)
+    return None
+
+
+def _decode_field(data):
+    """
+    :param data: bytes of a Field message
+    :return: Dictionary with the field's name, type and alias
+    """
+    field = {"name": "", "type": FIELD_TYPES[0], "alias": ""}
+    for number, _, value in _iter_fields(data):
+        if number == 1:
+            field["name"] = value.decode("utf-8")
+        elif number == 2:
+            field["type"] = FIELD_TYPES.get(value, str(value))
+        elif number == 3:
+            field["alias"] = value.decode("utf-8")
+    return field
+
+
+def _decode_transform(data):
+    """
+    :param data: bytes of a Transform message
+    :return: Dictionary with the origin position and the scale and
+        translate of every dimension
+    """
+    transform = {"origin": UPPER_LEFT_ORIGIN,
+                 "scale": [1.0, 1.0, 1.0, 1.0],
+                 "translate": [0.0, 0.0, 0.0, 0.0]}
+    for number, _, value in _iter_fields(data):
+        if number == 1:
+            transform["origin"] = value
+        elif number in (2, 3):
+            # Scale and Translate are x, y, m, z doubles
+            target = transform["scale" if number == 2 else "translate"]
+            for dimension, _, component in _iter_fields(value):
+                if 1 <= dimension <= 4:
+                    target[dimension - 1] = _DOUBLE.unpack(component)[0]
+    return transform
+
+
+def _decode_coordinates(coords, transform, extra_dimensions):
+    """
+    Turns delta encoded, quantized integer coordinates into vertices
+
+    :param coords: list of zigzag decoded coordinate deltas
+    :param transform: Dictionary returned by _decode_transform
+    :param extra_dimensions: list of (name, transform index) of the values
+        stored after x and y in each vertex (z, then m)
+    :return: list of [x, y, ...] vertices
+    """
+    scale = transform["scale"]
+    translate = transform["translate"]
+    # y grows downwards from an upper left origin
+    y_scale = -scale[1] if transform["origin"] == UPPER_LEFT_ORIGIN \
+        else scale[1]
+    extra = [(scale[index], translate[index])
+             for _, index in extra_dimensions]
+    dimensions = 2 + len(extra)
+
+    vertices = []
+    totals = [0] * dimensions
+    for start in range(0, len(coords) - dimensions + 1, dimensions):
+        for dimension in range(dimensions):
+            totals[dimension] += coords[start + dimension]
+        vertex = [translate[0] + totals[0] * scale[0],
+                  translate[1] + totals[1] * y_scale]
+        for dimension, (extra_scale, extra_translate) in \
+                enumerate(extra, 2):
+            vertex.append(extra_translate + totals[dimension] * extra_scale)
+        vertices.append(vertex)
+    return vertices
+
+
+def _decode_geometry(data, geometry_type, transform, extra_dimensions):
+    """
+    :param data: bytes of a Geometry message
+    :param geometry_type: esri geometry type name of the layer
+    :param transform: Dictionary returned by _decode_transform
+    :param extra_dimensions: list of (name, transform index) of the values
+        stored after x and y in each vertex
+    :return: geometry dictionary in the same form as JSON query results,
+        or None if the geometry is empty
+    """
+    lengths = []
+    coords = []
+    for number, wire_type, value in _iter_fields(data):
+        if number == 2:
+            _repeated_varints(lengths, wire_type, value)
+        elif number == 3:
+            deltas = []
+            _repeated_varints(deltas, wire_type, value)
+            coords.extend(_zigzag(delta) for delta in deltas)
+    vertices = _decode_coordinates(coords, transform, extra_dimensions)
+    if not vertices:
+        return None
+
+    if geometry_type == "esriGeometryPoint":
+        vertex = vertices[0]
+        geometry = {"x": vertex[0], "y": vertex[1]}
+        for (key, _), coordinate in zip(extra_dimensions, vertex[2:]):
+            geometry[key] = coordinate
+        return geometry
+    if geometry_type == "esriGeometryMultipoint":
+        return {"points": vertices}
+
+    parts = []
+    start = 0
+    for length in lengths or [len(vertices)]:
+        parts.append(vertices[start:start + length])
+        start += length
+    key = "paths" if geometry_type == "esriGeometryPolyline" else "rings"
+    return {key: parts}
+
+
+def _decode_feature(data, field_names, geometry_type, transform,
+                    extra_dimensions):
+    """
+    :param data: bytes of a Feature message
+    :param field_names: list of attribute names, in the message's order
+    :param geometry_type: esri geometry type name of the layer
+    :param transform: Dictionary returned by _decode_transform
+    :param extra_dimensions: list of (name, transform index) of the values
+        stored after x and y in each vertex
+    :return: feature dictionary with 'attributes' and, if the feature has
+        one, 'geometry' keys
+    """
+    values = []
+    geometry = None
+    for number, _, value in _iter_fields(data):
+        if number == 1:
+            values.append(_decode_value(value))
+        elif number == 2:
+            geometry = _decode_geometry(value, geometry_type, transform,
+                                        extra_dimensions)
+    feature = {"attributes": dict(zip(field_names, values))}
+    if geometry is not None:
+        feature["geometry"] = geometry
+    return feature
+
+
+def _decode_feature_result(data):
+    """
+    :param data: bytes of a FeatureResult message
+    :return: Dictionary in the same form as a JSON query result
+    """
+    result = {"fields": [], "features": [],
+              "geometryType": GEOMETRY_TYPES[0],
+              "exceededTransferLimit": False}
+    has_z = False
+    has_m = False
+    transform = _decode_transform(b"")
+    feature_messages = []
+    for number, _, value in _iter_fields(data):
+        if number == 1:
+            result["objectIdFieldName"] = value.decode("utf-8")
+        elif number == 7:
+            result["geometryType"] = GEOMETRY_TYPES.get(value, str(value))
+        elif number == 8:
+            for sr_number, _, sr_value in _iter_fields(value):
+                if sr_number == 1:
+                    result["spatialReference"] = {"wkid": sr_value}
+        elif number == 9:
+            result["exceededTransferLimit"] = bool(value)
+        elif number == 10:
+            has_z = bool(value)
+        elif number == 11:
+            has_m = bool(value)
+        elif number == 12:
+            transform = _decode_transform(value)
+        elif number == 13:
+            result["fields"].append(_decode_field(value))
+        elif number == 15:
+            # fields and transform may come after the features
+            feature_messages.append(value)
+
+    field_names = [field["name"] for field in result["fields"]]
+    extra_dimensions = []
+    if has_z:
+        extra_dimensions.append(("z", Z_INDEX))
+    if has_m:
+        extra_dimensions.append(("m", M_INDEX))
+    result["features"] = [
+        _decode_feature(message, field_names, result["geometryType"],
+                        transform, extra_dimensions)
+        for message in feature_messages
+    ]
+    return result
+
+
+def decode_feature_collection(data):
+    """
+    Decodes a FeatureServer query response sent with f=pbf
+
+    :param data: bytes of a FeatureCollectionPBuffer message
+    :return: Dictionary in the same form as the JSON response to the same
+        query
+    :raises: PbfDecodeError if data isn't a feature query result
+    """
+    try:
+        for number, _, value in _iter_fields(bytes(data)):
+            if number != 2:
+                continue
+            # QueryResult
+            for result_number, _, result_value in _iter_fields(value):
+                if result_number == 1:
+                    return _decode_feature_result(result_value)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise PbfDecodeError(str(e))
+    raise PbfDecodeError("Response has no feature result")
@@ -2,7 +2,11 @@ import requests
 import json
 import os
 import sys
+import threading
+import time
 import urllib
+import mycity.utilities.arcgis_pbf as arcgis_pbf
+import mycity.utilities.http_utils as http_utils
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,13 +19,112 @@ EMPTY_RECORD = ""
 ARCGIS_AUTH_URL = "https://www.arcgis.com/sharing/rest/oauth2/token"
 ARCGIS_CLOSEST_FACILITY_URL = "https://route.arcgis.com/arcgis/rest/services/World/ClosestFacility/NAServer/ClosestFacility_World/solveClosestFacility"
 ARCGIS_GEOCODE_URL = "https://geocode.arcgis.com/arcgis/rest/services/World/GeocodeServer/findAddressCandidates"
+# Refresh the cached access token this many seconds before it expires
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+# Token lifetime assumed when the OAuth response omits expires_in
+DEFAULT_TOKEN_LIFETIME_SECONDS = 7200
+# ArcGIS error codes for an invalid (498) or missing (499) token
+INVALID_TOKEN_CODES = (498, 499)
+# (connect, read) timeout for a ClosestFacility solve. Callers fall back
+# to a straight-line answer rather than waiting on a slow solver
+ROUTE_SOLVE_TIMEOUT = (3.05, 4)
+# Number of features requested per page when querying a FeatureServer layer
+FEATURE_SERVER_PAGE_SIZE = 1000
+# Spatial reference of longitude/latitude coordinates
+WGS84_WKID = 4326
+# Formats FeatureServer query results can be requested in. Protocol
+# buffer results are several times smaller, but slower to decode in
+# Python than JSON
+JSON_FORMAT = "json"
+PBF_FORMAT = "pbf"
+# Error code of queries with parameters a layer doesn't support, e.g.
+# f=pbf on servers older than 10.7
+INVALID_PARAMETERS_ERROR_CODE = 400
+
+
+class ArcGISTokenManager(object):
+    """
+    Process-wide cache for the ArcGIS OAuth access token.
+
+    The token is reused until shortly before it expires. When it needs to
+    be refreshed, only one thread requests a new token while any others
+    wait for and reuse the result.
+    """
+
+    def __init__(self, fetch_token=None, clock=time.monotonic,
+                 expiry_margin=TOKEN_EXPIRY_MARGIN_SECONDS):
+        """
+        :param fetch_token: function returning a (token, expires_in seconds)
+            tuple, defaults to requesting a token from ArcGIS
+        :param clock: function returning the current time in seconds
+        :param expiry_margin: seconds before expiry at which the token is
+            considered stale
+        """
+        self._fetch_token = fetch_token or _request_access_token
+        self._clock = clock
+        self._expiry_margin = expiry_margin
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0
+
+    def _is_fresh(self):
+        return self._token is not None and \
+            self._clock() < self._expires_at - self._expiry_margin
+
+    def get_token(self):
+        """
+        Returns the cached token, refreshing it if it is missing or about
+        to expire
+
+        :return: String containing access token, or None if a token
+            could not be generated
+        """
+        if self._is_fresh():
+            return self._token
+
+        with self._lock:
+            # another thread may have refreshed while we waited on the lock
+            if self._is_fresh():
+                return self._token
+
+            token, expires_in = self._fetch_token()
+            if token is None:
+                return None
+            self._token = token
+            self._expires_at = self._clock() + expires_in
+            return self._token
+
+    def invalidate(self, token=None):
+        """
+        Drops the cached token so the next get_token call fetches a new one
+
+        :param token: if provided, the cache is only cleared when it still
+            holds this token (so a token refreshed by another thread is kept)
+        :return: None
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0
+
 
 def generate_access_token():
     """
-    Generates a temporary access token fro ArcGIS REST APIs
+    Returns a temporary access token for ArcGIS REST APIs. The token is
+    shared by the whole process and reused until shortly before it expires
 
     :return: String containing temporary access token
     """
+    return token_manager.get_token()
+
+
+def _request_access_token():
+    """
+    Requests a new temporary access token from the ArcGIS OAuth service
+
+    :return: Two-Tuple containing 1) String containing access token (or None
+        if the request failed) and 2) number of seconds until it expires
+    """
     try:
         client_id = get_client_id()
         client_secret = get_client_secret()
@@ -35,14 +138,19 @@ def generate_access_token():
         if response.status_code == 200:
             response_json = response.json()
             access_token = response_json['access_token']
-            return access_token
+            expires_in = int(response_json.get('expires_in',
+                                               DEFAULT_TOKEN_LIFETIME_SECONDS))
+            return (access_token, expires_in)
         else:
             logger.debug("Response Error: {}, Response: {}".format(str(response.status_code), response.text))
-            return None
+            return (None, 0)
 
     except Exception as e:
         logger.debug(e)
-        return None
+        return (None, 0)
+
+
+token_manager = ArcGISTokenManager()
 
 def get_client_id():
     """
@@ -74,7 +182,7 @@ def find_closest_route(api_access_token, origin_address, destination_addresses):
     given the coordinates of an origin and possible destinations
 
     :param api_access_token: String containing temporary ArcGIS REST API access token
-    :param origin_address: Dictionary containing coordinates and address string of origin
+    :param origin_address: Coordinate of the origin
     :param destination_addresses: Dictionary with (x, y) coordinate values as the keys,
         and the associated address string as the values
     :return: Dictionary containing address, driving time and driving distance of closest destination
@@ -86,8 +194,8 @@ def find_closest_route(api_access_token, origin_address, destination_addresses):
 
     # (x, y) coordinates of origin address
     try:
-        incidents = "{},{}".format(origin_address['x'], origin_address['y'])
-    except KeyError as e:
+        incidents = "{},{}".format(origin_address.x, origin_address.y)
+    except AttributeError as e:
         logger.debug("Missing coordinate in orgin_address - {}".format(str(e)))
         return None
 
@@ -106,9 +214,23 @@ def find_closest_route(api_access_token, origin_address, destination_addresses):
             'facilities': facilities
             }
 
-    body_as_string, updated_header = format_multipart_form_request(ARCGIS_CLOSEST_FACILITY_URL, params)
-    # POST request over network
-    response = _post_request(ARCGIS_CLOSEST_FACILITY_URL, body_as_string, updated_header)
+    try:
+        body, updated_header = format_multipart_form_request(params)
+        # POST request over network
+        response = _post_request(ARCGIS_CLOSEST_FACILITY_URL, body,
+                                 updated_header, ROUTE_SOLVE_TIMEOUT)
+
+        if _is_invalid_token_response(response):
+            # Token expired or was revoked early, retry once with a fresh one
+            logger.debug("Access token rejected, retrying with a new token")
+            token_manager.invalidate(api_access_token)
+            params['token'] = token_manager.get_token()
+            body, updated_header = format_multipart_form_request(params)
+            response = _post_request(ARCGIS_CLOSEST_FACILITY_URL, body,
+                                     updated_header, ROUTE_SOLVE_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        logger.debug("Route solve failed: {}".format(str(e)))
+        return None
 
     if response.status_code == 200:
         response_json = response.json()
@@ -124,21 +246,13 @@ def find_closest_route(api_access_token, origin_address, destination_addresses):
             logger.debug(str(e))
             return None
 
-        formatted_travel_time_in_minutes = _format_float(float(travel_time_in_minutes))
-        formatted_travel_distance_in_miles = _format_float(float(travel_distance_in_miles))
-
-        travel_time_string = "{} minutes".format(formatted_travel_time_in_minutes)
-        travel_distance_string = "{} miles".format(formatted_travel_distance_in_miles)
-
         facility_key_index = int(facility_id) - 1
         facility_key = facility_key_list[facility_key_index]
         facility_address = destination_addresses[facility_key]
 
-        destination_dict = {
-                'Address': facility_address,
-                'Driving_time': travel_time_string,
-                'Driving_distance': travel_distance_string
-                }
+        destination_dict = build_destination_dict(facility_address,
+                                                  travel_time_in_minutes,
+                                                  travel_distance_in_miles)
 
         logger.debug("Returning closest destination: {}".format(str(destination_dict)))
         return destination_dict
@@ -147,52 +261,66 @@ def find_closest_route(api_access_token, origin_address, destination_addresses):
         return None
 
 
-def format_multipart_form_request(url, params):
+def build_destination_dict(address, travel_time_in_minutes,
+                           travel_distance_in_miles):
     """
-    Formats a multipart/form POST request
-    for requests module properly for
-    ESRI ArcGIS API
+    Builds the dictionary describing a destination returned by
+    find_closest_route
 
-    :param url: String containg URL of API
-    :param params: Dictionary of paramters
-    :return Two-Tuple containing 1) String representing
-        params to be passed as data to POST request
-        and 2) Dictionary with modified headers
+    :param address: String containing address of the destination
+    :param travel_time_in_minutes: driving time to the destination
+    :param travel_distance_in_miles: driving distance to the destination
+    :return: Dictionary containing address, driving time and driving distance
     """
-    logger.debug("URL: {}, Params: {}".format(url, str(params)))
-
-    updated_params = _modify_multipart_form_params(params)
-    req = requests.Request('POST', url, files=updated_params)
-    prepared_request = req.prepare()
+    formatted_travel_time_in_minutes = _format_float(float(travel_time_in_minutes))
+    formatted_travel_distance_in_miles = _format_float(float(travel_distance_in_miles))
 
-    updated_header = prepared_request.headers
-    updated_header.pop('Content-Length')
-    updated_header['cache-control'] = "no-cache"
+    travel_time_string = "{} minutes".format(formatted_travel_time_in_minutes)
+    travel_distance_string = "{} miles".format(formatted_travel_distance_in_miles)
 
-    # Change body from byte string to string
-    body_as_bytes = prepared_request.body
-    body_as_string = body_as_bytes.decode('utf-8')
+    return {
+            'Address': address,
+            'Driving_time': travel_time_string,
+            'Driving_distance': travel_distance_string
+            }
 
-    return (body_as_string, updated_header)
 
+def _is_invalid_token_response(response):
+    """
+    Checks whether an ArcGIS response rejected the access token. ArcGIS
+    reports this either with an HTTP status of 498/499 or with a 200
+    response whose JSON body contains an error with that code
 
+    :param response: request.Response object
+    :return: True if the token was rejected, else False
+    """
+    if response.status_code in INVALID_TOKEN_CODES:
+        return True
+    try:
+        error = response.json().get('error', {})
+    except (ValueError, AttributeError):
+        return False
+    return error.get('code') in INVALID_TOKEN_CODES
 
 
-def _modify_multipart_form_params(params):
+def format_multipart_form_request(params):
     """
-    Helper function for _format_multipart_form_request
-    that properly formats param dictionary
+    Formats a multipart/form POST request
+    body properly for ESRI ArcGIS API
 
-    :param params: Dictionary of request body paramters
-    :return Dictionary of updated request body parameters
+    :param params: Dictionary of paramters
+    :return Two-Tuple containing 1) bytes representing
+        params to be passed as data to POST request
+        and 2) Dictionary with headers for the request
     """
-    updated_params = {}
-    for key, value in params.items():
-        updated_params[key] = (None, str(value))
-    logger.debug("Updated Parameters: {}".format(str(updated_params)))
-    return updated_params
-
+    logger.debug("Params: {}".format(str(params)))
 
+    body, content_type = http_utils.encode_multipart_form(params)
+    headers = {
+            'Content-Type': content_type,
+            'cache-control': "no-cache"
+            }
+    return (body, headers)
 
 
 def _format_float(input_float):
@@ -208,23 +336,20 @@ def _format_float(input_float):
     as_string = str(rounded)
     return as_string
 
-def _post_request(url, params, headers):
+def _post_request(url, params, headers, timeout=http_utils.DEFAULT_TIMEOUT):
     """
-    Utilizes requests module to formulate
-    HTTP POST request over the network
+    Sends an HTTP POST request over the network
+    through the shared HTTP session
 
     :param url: String representing base URL of request
-    :param params: String or Dictionary containing parameters
+    :param params: Bytes, String or Dictionary containing parameters
     :param headers: Dictionary containing headers
+    :param timeout: (connect, read) timeout tuple in seconds
     :return: request.Response object
     """
     logger.debug("URL: {}, Params: {}, Headers: {}".format(url, str(params), str(headers)))
 
-    session = requests.Session()
-    request = requests.Request("POST", url, data=params, headers=headers)
-    prepared_request = request.prepare()
-    response = session.send(prepared_request)
-    return response
+    return http_utils.post(url, data=params, headers=headers, timeout=timeout)
 
 
 
@@ -243,7 +368,7 @@ def geocode_address_candidates(input_address):
             "singleLine": input_address,
             "outFields":"Match_addr,Addr_type"
             }
-    response = requests.request("GET", ARCGIS_GEOCODE_URL, params=params)
+    response = http_utils.get(ARCGIS_GEOCODE_URL, params=params)
     if response.status_code == 200:
         return response.json()
     else:
@@ -277,3 +402,223 @@ def select_top_address_candidate(geocode_candidate_response_json):
                 }
         return coordinate_dict
 
+
+def geocode_top_candidate(input_address):
+    """
+    Geocodes an address, keeping only the highest scoring candidate
+
+    :param input_address: String of address to be geocoded
+    :return: Dict containing address string and location information
+        ((X, Y) coordinates), or None if the address couldn't be geocoded
+    """
+    candidates = geocode_address_candidates(input_address)
+    if not candidates:
+        return None
+    top_candidate = select_top_address_candidate(candidates)
+    if top_candidate == -1:
+        return None
+    return top_candidate
+
+
+
+def query_feature_layer(layer_url, where="1=1", out_fields="*",
+                        return_geometry=True,
+                        page_size=FEATURE_SERVER_PAGE_SIZE,
+                        near=None, distance_in_miles=None, out_sr=None,
+                        response_format=JSON_FORMAT):
+    """
+    Queries a FeatureServer layer through the ArcGIS REST API, following
+    resultOffset/resultRecordCount pages until the server reports no more
+    features are available. With near and distance_in_miles, the server
+    only returns features within that distance of the point. Layers that
+    can't answer in the requested response_format are queried as JSON
+
+    :param layer_url: String containing URL of the FeatureServer layer
+        (ending in the layer index, e.g. ".../FeatureServer/0")
+    :param where: SQL where clause used to select features
+    :param out_fields: String or list of attribute fields to return
+    :param return_geometry: Boolean, whether geometries should be returned
+    :param page_size: maximum number of features requested per page
+    :param near: optional (longitude, latitude) of a point to filter
+        features around
+    :param distance_in_miles: radius of the filter around near
+    :param out_sr: optional spatial reference id geometries are returned
+        in (e.g. WGS84_WKID), instead of the layer's own
+    :param response_format: JSON_FORMAT or PBF_FORMAT
+    :return: list of feature dictionaries with 'attributes' (and
+        'geometry' if requested) keys, or None if the query failed
+    """
+    logger.debug("Layer URL: {}, where: {}, outFields: {}"
+                 .format(layer_url, where, str(out_fields)))
+
+    if not isinstance(out_fields, str):
+        out_fields = ",".join(out_fields)
+    query_url = layer_url.rstrip("/") + "/query"
+    params = {
+            "f": "json",
+            "where": where,
+            "outFields": out_fields,
+            "returnGeometry": "true" if return_geometry else "false",
+            "resultRecordCount": page_size
+            }
+    if near is not None:
+        params.update({
+            "geometry": "{},{}".format(near[0], near[1]),
+            "geometryType": "esriGeometryPoint",
+            "inSR": WGS84_WKID,
+            "spatialRel": "esriSpatialRelIntersects"
+        })
+        if distance_in_miles is not None:
+            params["distance"] = distance_in_miles
+            params["units"] = "esriSRUnit_StatuteMile"
+    if out_sr is not None:
+        params["outSR"] = out_sr
+
+    features = []
+    while True:
+        params["resultOffset"] = len(features)
+        response_json = _query_page(query_url, params, response_format)
+        if response_json is None:
+            return None
+
+        page = response_json.get("features", [])
+        features.extend(page)
+        if not page or not response_json.get("exceededTransferLimit", False):
+            break
+
+    return features
+
+
+# Query URLs of layers that answered they don't support protocol buffer
+# results, and are queried as JSON for the rest of the process
+_json_only_layers = set()
+
+
+def _query_page(query_url, params, response_format):
+    """
+    Requests one page of a FeatureServer query, falling back to JSON if
+    the layer doesn't return a protocol buffer result. Only layers that
+    answer they don't support protocol buffers are queried as JSON from
+    then on; after other failures the next page asks for pbf again
+
+    :param query_url: String containing URL of the layer's query endpoint
+    :param params: Dictionary of query parameters, 'f' is set here
+    :param response_format: JSON_FORMAT or PBF_FORMAT
+    :return: Dictionary in the form of a JSON query result, or None if the
+        query failed
+    """
+    pbf_unsupported = False
+    if response_format == PBF_FORMAT and query_url not in _json_only_layers:
+        params["f"] = PBF_FORMAT
+        response_json, pbf_unsupported = _query_pbf_page(query_url, params)
+        if response_json is not None:
+            return response_json
+        logger.debug("Querying {} as JSON".format(query_url))
+
+    params["f"] = JSON_FORMAT
+    response = http_utils.get(query_url, params=params)
+    if response.status_code != 200:
+        logger.debug("Response Error: {}".format(str(response.status_code)))
+        return None
+    response_json = response.json()
+    if "error" in response_json:
+        logger.debug("Query Error: {}".format(str(response_json["error"])))
+        return None
+    if pbf_unsupported:
+        _json_only_layers.add(query_url)
+    return response_json
+
+
+def _query_pbf_page(query_url, params):
+    """
+    Requests one page of a FeatureServer query as a protocol buffer
+
+    :param query_url: String containing URL of the layer's query endpoint
+    :param params: Dictionary of query parameters, with 'f' set to pbf
+    :return: Two-Tuple containing 1) Dictionary in the form of a JSON query
+        result, or None if there was no protocol buffer result and 2) True
+        if the layer answered that it doesn't support protocol buffers
+    """
+    response = http_utils.get(query_url, params=params)
+    if response.status_code != 200:
+        logger.debug("Response Error: {}".format(str(response.status_code)))
+        return (None, False)
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith(arcgis_pbf.CONTENT_TYPE):
+        try:
+            return (arcgis_pbf.decode_feature_collection(response.content),
+                    False)
+        except arcgis_pbf.PbfDecodeError as e:
+            logger.debug("Could not decode pbf result: {}".format(str(e)))
+            return (None, False)
+    logger.debug("Layer returned {} for f=pbf".format(content_type))
+    return (None, _is_unsupported_format_response(response))
+
+
+def _is_unsupported_format_response(response):
+    """
+    :param response: requests.Response to a query sent with f=pbf that
+        isn't a protocol buffer
+    :return: True if the layer ignored f=pbf and answered in JSON, or
+        rejected it as an invalid parameter
+    """
+    try:
+        response_json = response.json()
+    except ValueError:
+        return False
+    if not isinstance(response_json, dict):
+        return False
+    error = response_json.get("error")
+    if error is None:
+        return True
+    return error.get("code") == INVALID_PARAMETERS_ERROR_CODE
+
+
+def query_feature_layer_object_ids(layer_url, where="1=1"):
+    """
+    Queries the object ids of every feature in a FeatureServer layer
+    matching a where clause. Unlike feature queries, id queries aren't
+    limited to the layer's maxRecordCount
+
+    :param layer_url: String containing URL of the FeatureServer layer
+    :param where: SQL where clause used to select features
+    :return: list of object ids, or None if the query failed
+    """
+    logger.debug("Layer URL: {}, where: {}".format(layer_url, where))
+
+    params = {
+            "f": "json",
+            "where": where,
+            "returnIdsOnly": "true"
+            }
+    response = http_utils.get(layer_url.rstrip("/") + "/query", params=params)
+    if response.status_code != 200:
+        logger.debug("Response Error: {}".format(str(response.status_code)))
+        return None
+    response_json = response.json()
+    if "error" in response_json:
+        logger.debug("Query Error: {}".format(str(response_json["error"])))
+        return None
+    return response_json.get("objectIds") or []
+
+
+def get_layer_last_edit_date(layer_url):
+    """
+    Reads when a FeatureServer layer was last edited from its description,
+    which changes whenever any feature of the layer does
+
+    :param layer_url: String containing URL of the FeatureServer layer
+    :return: last edit time in milliseconds since the epoch, or None if the
+        request failed or the layer doesn't track edits
+    """
+    logger.debug("Layer URL: {}".format(layer_url))
+
+    response = http_utils.get(layer_url.rstrip("/"), params={"f": "json"})
+    if response.status_code != 200:
+        logger.debug("Response Error: {}".format(str(response.status_code)))
+        return None
+    response_json = response.json()
+    if "error" in response_json:
+        logger.debug("Layer Error: {}".format(str(response_json["error"])))
+        return None
+    return (response_json.get("editingInfo") or {}).get("lastEditDate")
@@ -4,7 +4,8 @@ Utilities for querying with the Boston crime incidents API
 """
 
 import requests
-from mycity.utilities.gis_utils import geocode_address
+import mycity.utilities.http_utils as http_utils
+from mycity.utilities.geocoding_service import geocoding_service
 import logging
 
 RESOURCEID = "12cb3883-56f5-47de-afa5-3b1cf61b257b"
@@ -23,26 +24,27 @@ def get_crime_incident_response(address):
     :return: the raw json response
 
     """
-    url_parameters = {"sql": _build_query_string(address)}
+    coordinates = _get_coordinates_for_address(address)
+    if coordinates is None:
+        return {"success": False}
+    url_parameters = {"sql": _build_query_string(coordinates)}
     logger.debug("Finding crime incidents information for {} using query {}"
         .format(address, url_parameters))
-    with requests.Session() as session:
-        response = session.get(CRIME_INCIDENTS_SQL_URL, params=url_parameters)
+    response = http_utils.get(CRIME_INCIDENTS_SQL_URL, params=url_parameters)
 
     if response.status_code == requests.codes.ok:
         return response.json()
     return {}
 
 
-def _build_query_string(address):
+def _build_query_string(coordinates):
     """
-    Builds the SQL query given an address
+    Builds the SQL query given the coordinates of an address
 
-    :param address: address to query
+    :param coordinates: a tuple of the form (lat, long)
     :return: a SQL query string
 
     """
-    coordinates = _get_coordinates_for_address(address)
     return """SELECT * FROM "{}" WHERE "lat" LIKE '{}%' AND \
         "long" LIKE '{}%' LIMIT {}""" \
         .format(RESOURCEID, coordinates[0], coordinates[1], QUERY_LIMIT)
@@ -53,11 +55,14 @@ def _get_coordinates_for_address(address):
     Populates the GPS coordinates for the provided address
 
     :param address: address to query
-    :return: a tuple of the form (lat, long)
+    :return: a tuple of the form (lat, long), or None if the address
+        couldn't be geocoded
 
     """
-    coordinates = geocode_address(address)
-    logger.debug("Got coordinates: {}".format(coordinates))
-    _lat = "{:.2f}".format(float(coordinates[1]))
-    _long = "{:.2f}".format(float(coordinates[0]))
-    return (_lat, _long)
\ No newline at end of file
+    coordinate = geocoding_service.geocode(address + ", Boston, MA")
+    logger.debug("Got coordinates: {}".format(coordinate))
+    if coordinate is None:
+        return None
+    _lat = "{:.2f}".format(float(coordinate.y))
+    _long = "{:.2f}".format(float(coordinate.x))
+    return (_lat, _long)
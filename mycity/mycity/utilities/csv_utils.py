@@ -3,11 +3,25 @@ Utility functions for manipulating csv files
 
 """
 
+import codecs
 import collections
+import csv
+from mycity.utilities.record_store import RecordStore
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Byte order marks we recognize, checked in order (the UTF-32 marks start
+# with the UTF-16 ones so they must come first)
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+DEFAULT_ENCODING = 'utf-8'
+
 
 def create_record_model(model_name, attributes):
     """
@@ -49,19 +63,27 @@ def add_city_and_state_to_records(records, address_key, city, state):
     Append '{city}, {state}' to the Address fields of each record 
     in records.
 
-    :param records: filtered CSV.DictReader
+    :param records: filtered CSV.DictReader or RecordStore
     :param address_key: key to access address field in a record
     :param city: name of city stored as a string
     :param state: name of state stored as a string
-    :return: a copy of records with Address fields modified
+    :return: a copy of records with Address fields modified (a RecordStore
+        sharing its other columns if records is a RecordStore)
     """
     logger.debug('records: ' + str(records) +
                  ', address_key: ' + str(address_key) +
                  ', city: ' + str(city) +
                  ', state: ' + str(state))
     suffix = " " + city + ", " + state
+    if isinstance(records, RecordStore):
+        return records.with_column(
+            address_key,
+            [address + suffix for address in records.column(address_key)]
+        )
     ret = []
     for record in records:
+        # copy so that records shared through a cache aren't modified
+        record = dict(record)
         record[address_key] = record[address_key] + suffix
         ret.append(record)
     return ret
@@ -82,3 +104,82 @@ def map_attribute_to_records(attribute, records):
     :return: dictionary mapping an string Address to namedtuple record
     """
     return {getattr(record, attribute) : record for record in records}
+
+
+def get_declared_encoding(headers):
+    """
+    Returns the charset declared in a response's Content-Type header
+
+    :param headers: dictionary of response headers
+    :return: name of the declared encoding, or None if no charset
+        was declared
+    """
+    content_type = headers.get('Content-Type', '')
+    for parameter in content_type.split(';')[1:]:
+        name, _, value = parameter.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return None
+
+
+def detect_encoding(first_chunk, declared_encoding=None):
+    """
+    Chooses the encoding of a file from a byte order mark at the start
+    of its first chunk, falling back to the declared encoding and then
+    UTF-8. This avoids guessing the encoding from the whole file
+
+    :param first_chunk: bytes at the start of the file
+    :param declared_encoding: encoding declared by the server, if any
+    :return: name of the encoding
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if first_chunk.startswith(bom):
+            return encoding
+    return declared_encoding or DEFAULT_ENCODING
+
+
+def iter_decoded_lines(chunks, declared_encoding=None):
+    """
+    Incrementally decodes a stream of byte chunks into lines of text.
+    Only the current chunk and an unfinished line are held in memory
+
+    :param chunks: iterable of bytes, e.g. response.iter_content()
+    :param declared_encoding: encoding declared by the server, if any
+    :return: generator of lines, each ending with its line terminator
+        (except possibly the last)
+    """
+    decoder = None
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if decoder is None:
+            encoding = detect_encoding(chunk, declared_encoding)
+            logger.debug('Decoding stream as ' + encoding)
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        pending += decoder.decode(chunk)
+        # anything after the last newline may continue in the next chunk
+        end_of_lines = pending.rfind('\n') + 1
+        if end_of_lines:
+            for line in pending[:end_of_lines].split('\n')[:-1]:
+                yield line + '\n'
+            pending = pending[end_of_lines:]
+    if decoder is not None:
+        pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_csv_records(chunks, declared_encoding=None, delimiter=','):
+    """
+    Streams a csv file into dictionaries, one per row, without holding
+    the whole file in memory
+
+    :param chunks: iterable of bytes, e.g. response.iter_content()
+    :param declared_encoding: encoding declared by the server, if any
+    :param delimiter: csv field delimiter
+    :return: generator of dictionaries, each representing one row
+    """
+    lines = iter_decoded_lines(chunks, declared_encoding)
+    for row in csv.DictReader(lines, delimiter=delimiter):
+        yield dict(row)
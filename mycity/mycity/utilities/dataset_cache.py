@@ -0,0 +1,354 @@
+"""
+Per-container cache for the location datasets Finder classes work with
+
+Parsed records are kept in memory and in a JSON file under the temporary
+directory (/tmp on Lambda), so warm invocations, and new containers that
+inherit a populated /tmp, skip the download and parse entirely. Once an
+entry's TTL runs out it is revalidated with a conditional GET
+(If-None-Match / If-Modified-Since), so an unchanged dataset is not
+downloaded again. A dataset's version comes from its ETag and
+Last-Modified headers, or when the server sends neither, from a hash of
+the body taken as it streams through the parser.
+
+Records may be a list or a RecordStore, which is written to the cache file
+column by column. Cached records are shared between requests and must not
+be modified.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+import mycity.utilities.http_utils as http_utils
+from mycity.utilities.record_store import RecordStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+# Datasets kept in memory before the least recently used one is dropped.
+# Datasets with a cache file are read from it again when next needed
+DEFAULT_MAX_ENTRIES = 256
+CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "mycity_datasets")
+
+# records ::= list of records in the dataset
+# version ::= string identifying the contents of the dataset
+CachedDataset = collections.namedtuple("CachedDataset", ["records", "version"])
+
+
+class DatasetCache(object):
+
+    """
+    Memory and file backed cache of parsed datasets, keyed by URL
+    """
+
+    def __init__(self, cache_directory=CACHE_DIRECTORY,
+                 ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        """
+        :param cache_directory: directory the cache files are written to
+        :param ttl_seconds: seconds a dataset is used before revalidating it
+        :param max_entries: number of datasets kept in memory
+        :param clock: function returning the current time in seconds
+        """
+        self.cache_directory = cache_directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        # key -> entry, least recently used first
+        self._entries = collections.OrderedDict()
+        # key -> lock held while that dataset is read or downloaded
+        self._key_locks = {}
+        # guards _entries and _key_locks
+        self._lock = threading.Lock()
+
+    def get(self, url, parse_response, ttl_seconds=None):
+        """
+        Returns the dataset at url, downloading and parsing it only if it
+        isn't cached or has changed since it was cached
+
+        :param url: String containing URL of the dataset
+        :param parse_response: function taking a requests.Response and
+            returning the records it contains (a list or RecordStore)
+        :param ttl_seconds: optional TTL overriding the cache's default
+        :return: CachedDataset, or None if the dataset isn't cached and
+            couldn't be downloaded
+        """
+        return self._get(url, ttl_seconds,
+                         lambda entry: self._fetch(url, parse_response, entry))
+
+    def get_or_load(self, key, load, ttl_seconds=None, persist=True):
+        """
+        Returns the records cached under key, calling load to get them if
+        they aren't cached or their TTL has run out. Used for datasets that
+        can't be revalidated with a conditional GET
+
+        :param key: String identifying the dataset
+        :param load: function taking no arguments and returning the records
+            (a list or RecordStore), or None if they couldn't be loaded
+        :param ttl_seconds: optional TTL overriding the cache's default
+        :param persist: if False the records are only kept in memory, for
+            short lived datasets under keys that keep changing
+        :return: CachedDataset, or None if the dataset isn't cached and
+            couldn't be loaded
+        """
+        def fetch(entry):
+            records = load()
+            if records is None:
+                return None
+            serialized = json.dumps(_serialize_records(records),
+                                    sort_keys=True).encode("utf-8")
+            return self._new_entry(records,
+                                   hashlib.sha1(serialized).hexdigest(),
+                                   None, None)
+        return self._get(key, ttl_seconds, fetch, persist)
+
+    def clear(self):
+        """
+        Removes every dataset from memory (cache files are left in place)
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+
+    def _get(self, key, ttl_seconds, fetch, persist=True):
+        """
+        Returns the dataset cached under key, calling fetch to refresh it
+        once its TTL has run out. Downloads only hold the lock of their own
+        key, so a slow (or abandoned) download doesn't hold up requests
+        for other datasets, and a request whose dataset is already being
+        refreshed is answered with the stale copy
+
+        :param key: String identifying the dataset
+        :param ttl_seconds: TTL of the dataset, or None for the default
+        :param fetch: function taking the cached entry (or None) and
+            returning the new entry, or None if it couldn't be fetched
+        :param persist: if False no cache file is read or written
+        :return: CachedDataset, or None
+        """
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        if self._is_fresh(entry, ttl_seconds):
+            return self._to_dataset(entry)
+        if entry is not None and not key_lock.acquire(blocking=False):
+            logger.debug("Using stale copy of {} while it's refreshed"
+                         .format(key))
+            return self._to_dataset(entry)
+        if entry is None:
+            key_lock.acquire()
+
+        try:
+            # another request may have refreshed it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None and persist:
+                entry = self._read_file(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if self._is_fresh(entry, ttl_seconds):
+                return self._to_dataset(entry)
+
+            try:
+                fetched = fetch(entry)
+            except requests.exceptions.RequestException as e:
+                logger.debug("Failed to refresh {}: {}".format(key, str(e)))
+                fetched = None
+
+            if fetched is None:
+                if entry is not None:
+                    # serve the stale copy rather than nothing
+                    logger.debug("Using stale copy of " + key)
+                    return self._to_dataset(entry)
+                return None
+
+            self._store(key, fetched)
+            if persist and fetched is entry:
+                # revalidated, only the time it was checked changed
+                self._touch_file(key, fetched)
+            elif persist:
+                self._write_file(key, fetched)
+            return self._to_dataset(fetched)
+        finally:
+            key_lock.release()
+
+    def _store(self, key, entry):
+        """
+        Keeps an entry in memory, dropping the least recently used entries
+        beyond max_entries
+
+        :param key: String identifying the dataset
+        :param entry: entry to keep
+        :return: None
+        """
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def _is_fresh(self, entry, ttl_seconds):
+        """
+        :param entry: cached entry, or None
+        :param ttl_seconds: TTL of the dataset
+        :return: True if the entry was fetched or revalidated within its TTL
+        """
+        return entry is not None and \
+            self._clock() - entry["checked_at"] < ttl_seconds
+
+    def _fetch(self, url, parse_response, entry):
+        """
+        Downloads a dataset, or revalidates the cached entry for it
+
+        :param url: String containing URL of the dataset
+        :param parse_response: function turning a response into records
+        :param entry: the cached entry for url, or None
+        :return: the new (or revalidated) entry, or None if the request
+            failed
+        """
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = http_utils.get(url, headers=headers, stream=True)
+        try:
+            if response.status_code == 304 and entry is not None:
+                logger.debug("Dataset unchanged: " + url)
+                entry["checked_at"] = self._clock()
+                return entry
+            if response.status_code != 200:
+                logger.debug("Error downloading {}: {}"
+                             .format(url, str(response.status_code)))
+                return None
+            logger.debug("Downloading dataset: " + url)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            digest = hashlib.sha1()
+            if etag or last_modified:
+                digest.update("{}\n{}".format(etag, last_modified)
+                              .encode("utf-8"))
+            else:
+                response.iter_content = _hash_chunks(response.iter_content,
+                                                     digest)
+            records = parse_response(response)
+            return self._new_entry(records, digest.hexdigest(), etag,
+                                   last_modified)
+        finally:
+            response.close()
+
+    def _new_entry(self, records, version, etag, last_modified):
+        return {
+            "records": records,
+            "version": version,
+            "etag": etag,
+            "last_modified": last_modified,
+            "checked_at": self._clock()
+        }
+
+    @staticmethod
+    def _to_dataset(entry):
+        return CachedDataset(entry["records"], entry["version"])
+
+    def _file_path(self, key):
+        file_name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+        return os.path.join(self.cache_directory, file_name)
+
+    def _read_file(self, key):
+        path = self._file_path(key)
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                entry = json.load(cache_file)
+            entry["records"] = _deserialize_records(entry["records"])
+            # the file's modification time is when it was last revalidated
+            entry["checked_at"] = max(entry["checked_at"],
+                                      os.path.getmtime(path))
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _touch_file(self, key, entry):
+        """
+        Records that the cache file of key was revalidated at
+        entry["checked_at"], without writing the records again
+
+        :param key: String identifying the dataset
+        :param entry: revalidated entry
+        :return: None
+        """
+        path = self._file_path(key)
+        try:
+            os.utime(path, (entry["checked_at"], entry["checked_at"]))
+        except OSError:
+            self._write_file(key, entry)
+
+    def _write_file(self, key, entry):
+        path = self._file_path(key)
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(dict(entry,
+                               records=_serialize_records(entry["records"])),
+                          cache_file)
+            os.replace(temp_path, path)
+            os.utime(path, (entry["checked_at"], entry["checked_at"]))
+        except OSError as e:
+            logger.debug("Could not write cache file {}: {}"
+                         .format(path, str(e)))
+
+
+def _hash_chunks(iter_content, digest):
+    """
+    Wraps a response's iter_content so every chunk read is added to digest
+
+    :param iter_content: iter_content method of a requests.Response
+    :param digest: hashlib hash object
+    :return: function with the same arguments as iter_content
+    """
+    def hashed_iter_content(*args, **kwargs):
+        for chunk in iter_content(*args, **kwargs):
+            digest.update(chunk)
+            yield chunk
+    return hashed_iter_content
+
+
+def _serialize_records(records):
+    """
+    Converts records to a JSON serializable value
+
+    :param records: list of records or RecordStore
+    :return: records, or the RecordStore's columns tagged so they can be
+        told apart from a list when the file is read
+    """
+    if isinstance(records, RecordStore):
+        return {"record_store": records.to_columns()}
+    return records
+
+
+def _deserialize_records(serialized):
+    """
+    Reverses _serialize_records
+
+    :param serialized: value read from a cache file
+    :return: list of records or RecordStore
+    """
+    if isinstance(serialized, dict) and "record_store" in serialized:
+        return RecordStore.from_columns(serialized["record_store"])
+    return serialized
+
+
+# cache shared by every Finder in this container
+dataset_cache = DatasetCache()
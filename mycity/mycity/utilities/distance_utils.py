@@ -0,0 +1,100 @@
+"""
+Utility functions for straight-line (great circle) distances between
+longitude/latitude coordinates, vectorized with NumPy so they can be
+computed for every location in a dataset at once
+"""
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+# Driving distances in the city are typically this much longer than
+# the straight-line distance
+ROAD_DETOUR_FACTOR = 1.3
+# Average driving speed used to estimate driving time without routing
+ESTIMATED_DRIVING_SPEED_MPH = 15
+
+
+def haversine_distances(origin_x, origin_y, xs, ys):
+    """
+    Computes the great circle distance from an origin to many points
+
+    :param origin_x: longitude of the origin
+    :param origin_y: latitude of the origin
+    :param xs: sequence or array of longitudes
+    :param ys: sequence or array of latitudes
+    :return: NumPy array of distances in miles, in the same order as xs
+        and ys
+    """
+    origin_lon = np.radians(float(origin_x))
+    origin_lat = np.radians(float(origin_y))
+    lons = np.radians(np.asarray(xs, dtype=float))
+    lats = np.radians(np.asarray(ys, dtype=float))
+
+    a = np.sin((lats - origin_lat) / 2) ** 2 + \
+        np.cos(origin_lat) * np.cos(lats) * \
+        np.sin((lons - origin_lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+def nearest_indices(origin_x, origin_y, xs, ys, k):
+    """
+    Finds the k points closest to an origin by straight-line distance.
+    Points with missing (NaN) coordinates are never returned.
+
+    :param origin_x: longitude of the origin
+    :param origin_y: latitude of the origin
+    :param xs: sequence or array of longitudes
+    :param ys: sequence or array of latitudes
+    :param k: number of points to return
+    :return: Two-Tuple containing 1) NumPy array of the indices of the
+        closest points, nearest first and 2) NumPy array of their
+        distances in miles
+    """
+    distances = haversine_distances(origin_x, origin_y, xs, ys)
+    valid = np.flatnonzero(~np.isnan(distances))
+    k = min(k, len(valid))
+    if k == 0:
+        return (np.array([], dtype=int), np.array([], dtype=float))
+
+    valid_distances = distances[valid]
+    if k < len(valid):
+        candidates = np.argpartition(valid_distances, k - 1)[:k]
+    else:
+        candidates = np.arange(len(valid))
+    ordered = candidates[np.argsort(valid_distances[candidates],
+                                    kind="stable")]
+    return (valid[ordered], valid_distances[ordered])
+
+
+def coordinates_to_floats(values):
+    """
+    Converts coordinate values read from a dataset to a float array,
+    treating empty or malformed values as missing (NaN)
+
+    :param values: sequence of coordinate values (strings or numbers)
+    :return: NumPy array of floats
+    """
+    floats = np.empty(len(values), dtype=float)
+    for index, value in enumerate(values):
+        try:
+            floats[index] = float(value)
+        except (TypeError, ValueError):
+            floats[index] = np.nan
+    return floats
+
+
+def estimate_driving_distance_and_time(straight_line_miles):
+    """
+    Estimates the driving distance and time for a trip from its straight
+    line distance, for use when a route can't be solved
+
+    :param straight_line_miles: great circle distance in miles
+    :return: Two-Tuple containing 1) estimated driving distance in miles
+        and 2) estimated driving time in minutes
+    """
+    driving_miles = straight_line_miles * ROAD_DETOUR_FACTOR
+    driving_minutes = driving_miles / ESTIMATED_DRIVING_SPEED_MPH * 60
+    return (driving_miles, driving_minutes)
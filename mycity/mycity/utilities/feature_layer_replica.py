@@ -0,0 +1,334 @@
+"""
+Local replica of a FeatureServer layer, kept in sync by edit date
+
+Live layers (e.g. parking availability) change a few features at a time,
+so after the first full download a replica only asks the server for the
+features edited since it last synced, plus the object ids of every
+current feature to find the ones that were deleted. Replicas are stored
+in a sqlite database under the temporary directory (/tmp on Lambda) so a
+new process in a warm container continues from the last sync.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import requests
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.gis_utils as gis_utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = os.path.join(tempfile.gettempdir(),
+                             "mycity_feature_replicas.sqlite")
+DEFAULT_TTL_SECONDS = 60
+OBJECT_ID_FIELD = "OBJECTID"
+EDIT_DATE_FIELD = "EditDate"
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS replicas (
+           replica TEXT PRIMARY KEY,
+           last_edit_date INTEGER NOT NULL,
+           synced_at REAL NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS features (
+           replica TEXT NOT NULL,
+           object_id INTEGER NOT NULL,
+           record TEXT NOT NULL,
+           PRIMARY KEY (replica, object_id))"""
+]
+
+
+class FeatureLayerReplica(object):
+
+    """
+    Replica of the features of a FeatureServer layer matching a where
+    clause, as flat location records with X/Y coordinates
+
+    @property: version ::= String identifying the replica's contents
+    """
+
+    def __init__(self, layer_url, where="1=1", out_fields="*",
+                 object_id_field=OBJECT_ID_FIELD,
+                 edit_date_field=EDIT_DATE_FIELD,
+                 ttl_seconds=DEFAULT_TTL_SECONDS,
+                 database_file=DATABASE_FILE, clock=time.time,
+                 response_format=arcgis_utils.JSON_FORMAT):
+        """
+        :param layer_url: String containing URL of the FeatureServer layer
+        :param where: SQL where clause selecting the replicated features
+        :param out_fields: String or list of attribute fields to replicate.
+            The object id and edit date fields are always included
+        :param object_id_field: field holding the layer's object ids
+        :param edit_date_field: field holding the time a feature was last
+            edited (ArcGIS editor tracking)
+        :param ttl_seconds: seconds between syncs with the server
+        :param database_file: path of the sqlite database, or None to keep
+            the replica in memory only
+        :param clock: function returning the current time in seconds
+        :param response_format: format features are requested in,
+            arcgis_utils.JSON_FORMAT or arcgis_utils.PBF_FORMAT
+        """
+        if not isinstance(out_fields, str):
+            out_fields = ",".join(out_fields)
+        if out_fields != "*":
+            fields = out_fields.split(",")
+            for field in (object_id_field, edit_date_field):
+                if field not in fields:
+                    fields.append(field)
+            out_fields = ",".join(fields)
+        self.layer_url = layer_url
+        self.where = where
+        self.out_fields = out_fields
+        self.object_id_field = object_id_field
+        self.edit_date_field = edit_date_field
+        self.ttl_seconds = ttl_seconds
+        self.database_file = database_file
+        self._clock = clock
+        self.response_format = response_format
+        # identifies this replica's rows in the database
+        self._key = "{}?where={}&outFields={}".format(layer_url, where,
+                                                      out_fields)
+        # object id -> record
+        self._records = None
+        self._last_edit_date = None
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return "{}:{}".format(self._last_edit_date,
+                              len(self._records or {}))
+
+    def get_records(self):
+        """
+        Returns the replicated features, syncing with the server first if
+        the TTL has run out. If a sync fails the last replica is returned
+
+        :return: list of record dictionaries, or None if the layer was never
+            loaded
+        """
+        with self._lock:
+            if self._records is None:
+                self._load_database()
+            if self._synced_at is None or \
+                    self._clock() - self._synced_at >= self.ttl_seconds:
+                self._sync()
+            if self._records is None:
+                return None
+            return list(self._records.values())
+
+    def _sync(self):
+        """
+        Brings the replica up to date: a full load the first time, then
+        only the features edited since the last sync, and removal of the
+        features that no longer exist. Must be called with the lock held
+
+        :return: None
+        """
+        if self._records is None:
+            logger.debug("Full load of " + self._key)
+            try:
+                features = arcgis_utils.query_feature_layer(
+                    self.layer_url,
+                    where=self.where,
+                    out_fields=self.out_fields,
+                    out_sr=arcgis_utils.WGS84_WKID,
+                    response_format=self.response_format
+                )
+            except requests.exceptions.RequestException as e:
+                logger.debug("Could not load {}: {}"
+                             .format(self._key, str(e)))
+                return
+            if features is None:
+                return
+            records = {}
+            self._add_features(records, features)
+            self._records = records
+            self._last_edit_date = max(
+                [self._edit_date(record) for record in records.values()],
+                default=0)
+            self._synced_at = self._clock()
+            self._save_database(changed=records.values(), deleted=None,
+                                replace=True)
+            return
+
+        try:
+            edited = arcgis_utils.query_feature_layer(
+                self.layer_url,
+                where="({}) AND {} > TIMESTAMP '{}'".format(
+                    self.where, self.edit_date_field,
+                    _format_timestamp(self._last_edit_date)),
+                out_fields=self.out_fields,
+                out_sr=arcgis_utils.WGS84_WKID,
+                response_format=self.response_format
+            )
+            object_ids = arcgis_utils.query_feature_layer_object_ids(
+                self.layer_url, where=self.where)
+        except requests.exceptions.RequestException as e:
+            logger.debug("Could not sync {}, keeping last replica: {}"
+                         .format(self._key, str(e)))
+            return
+        if edited is None or object_ids is None:
+            logger.debug("Could not sync {}, keeping last replica"
+                         .format(self._key))
+            return
+
+        changed = {}
+        self._add_features(changed, edited)
+        self._records.update(changed)
+        current_ids = set(object_ids)
+        deleted = [object_id for object_id in self._records
+                   if object_id not in current_ids]
+        for object_id in deleted:
+            del self._records[object_id]
+        self._last_edit_date = max(
+            [self._last_edit_date] +
+            [self._edit_date(record) for record in changed.values()])
+        self._synced_at = self._clock()
+        logger.debug("Synced {}: {} edited, {} deleted"
+                     .format(self._key, len(changed), len(deleted)))
+        self._save_database(changed=changed.values(), deleted=deleted)
+
+    def _add_features(self, records, features):
+        """
+        :param records: Dictionary of object id -> record to add to
+        :param features: list of feature dictionaries from the server
+        :return: None
+        """
+        for feature in features:
+            record = gis_utils.feature_to_record(feature)
+            records[record[self.object_id_field]] = record
+
+    def _edit_date(self, record):
+        """
+        :param record: record dictionary
+        :return: edit date of the record in milliseconds since the epoch,
+            or 0 if it has none
+        """
+        return record.get(self.edit_date_field) or 0
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database_file)
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def _load_database(self):
+        """
+        Reads the replica saved by an earlier process, if there is one.
+        Must be called with the lock held
+
+        :return: None
+        """
+        if self.database_file is None:
+            return
+        try:
+            connection = self._connect()
+            try:
+                replica = connection.execute(
+                    "SELECT last_edit_date, synced_at FROM replicas "
+                    "WHERE replica = ?", (self._key,)).fetchone()
+                if replica is None:
+                    return
+                rows = connection.execute(
+                    "SELECT record FROM features WHERE replica = ?",
+                    (self._key,)).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.debug("Could not read replica database {}: {}"
+                         .format(self.database_file, str(e)))
+            return
+        records = {}
+        for (record,) in rows:
+            record = json.loads(record)
+            records[record[self.object_id_field]] = record
+        self._records = records
+        self._last_edit_date, self._synced_at = replica
+        logger.debug("Loaded {} features of {} from {}"
+                     .format(len(records), self._key, self.database_file))
+
+    def _save_database(self, changed, deleted, replace=False):
+        """
+        Writes changes to the replica database. Must be called with the
+        lock held
+
+        :param changed: iterable of added or edited records
+        :param deleted: list of deleted object ids, or None
+        :param replace: if True, every saved feature is replaced first
+        :return: None
+        """
+        if self.database_file is None:
+            return
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    if replace:
+                        connection.execute(
+                            "DELETE FROM features WHERE replica = ?",
+                            (self._key,))
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO features "
+                        "(replica, object_id, record) VALUES (?, ?, ?)",
+                        [(self._key, record[self.object_id_field],
+                          json.dumps(record)) for record in changed])
+                    if deleted:
+                        connection.executemany(
+                            "DELETE FROM features "
+                            "WHERE replica = ? AND object_id = ?",
+                            [(self._key, object_id)
+                             for object_id in deleted])
+                    connection.execute(
+                        "INSERT OR REPLACE INTO replicas "
+                        "(replica, last_edit_date, synced_at) "
+                        "VALUES (?, ?, ?)",
+                        (self._key, self._last_edit_date, self._synced_at))
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.debug("Could not write replica database {}: {}"
+                         .format(self.database_file, str(e)))
+
+
+def _format_timestamp(milliseconds):
+    """
+    :param milliseconds: time in milliseconds since the epoch
+    :return: String containing the UTC time, to the second, in the format
+        ArcGIS where clauses use for TIMESTAMP literals
+    """
+    return time.strftime("%Y-%m-%d %H:%M:%S",
+                         time.gmtime(milliseconds / 1000))
+
+
+# replica key -> FeatureLayerReplica, shared by all Finders
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+
+def get_replica(layer_url, where="1=1", out_fields="*",
+                ttl_seconds=DEFAULT_TTL_SECONDS,
+                response_format=arcgis_utils.JSON_FORMAT):
+    """
+    Returns the shared replica of a layer, creating it on first use
+
+    :param layer_url: String containing URL of the FeatureServer layer
+    :param where: SQL where clause selecting the replicated features
+    :param out_fields: String or list of attribute fields to replicate
+    :param ttl_seconds: seconds between syncs with the server
+    :param response_format: format features are requested in, used when
+        the replica is created
+    :return: FeatureLayerReplica object
+    """
+    if not isinstance(out_fields, str):
+        out_fields = ",".join(out_fields)
+    key = (layer_url, where, out_fields)
+    with _replicas_lock:
+        if key not in _replicas:
+            _replicas[key] = FeatureLayerReplica(
+                layer_url, where, out_fields, ttl_seconds=ttl_seconds,
+                database_file=DATABASE_FILE, response_format=response_format)
+        return _replicas[key]
@@ -3,13 +3,51 @@ Abstract parent class upon which subclasses are built that find location
 based information about city services
 """
 
+import collections
+import concurrent.futures
+import threading
+import time
 import mycity.utilities.address_utils as address_utils
 import mycity.utilities.csv_utils as csv_utils
 import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.distance_utils as distance_utils
+import mycity.utilities.geohash_utils as geohash_utils
+import mycity.utilities.road_network as road_network_utils
+from mycity.utilities.geocoding_service import geocoding_service
+from mycity.utilities.finder.NearestFacilityGrid import NearestFacilityGrid
+from mycity.utilities.finder.SpatialIndex import SpatialIndex
+from mycity.utilities.record_store import RecordStore
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on network stages run at the same time, shared by all Finders
+MAX_CONCURRENT_STAGES = 4
+_stage_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_STAGES
+)
+_stage_executor_lock = threading.Lock()
+
+
+def _replace_stage_executor(executor):
+    """
+    Gives later stages a new thread pool once a stage of executor has timed
+    out. The timed out stage can keep its worker busy in a request for much
+    longer than its timeout, so it is left to finish on the old pool
+    instead of delaying the stages of the next request
+
+    :param executor: ThreadPoolExecutor a stage timed out on
+    :return: None
+    """
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is not executor:
+            return
+        _stage_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_STAGES
+        )
+    executor.shutdown(wait=False)
+
 
 class Finder(object):
     
@@ -24,6 +62,14 @@ class Finder(object):
         fields in the returned record for output_speech formatted string
     @property: origin_address ::= string that represents the address we will
         calculated driving distances from
+    @property: spatial_index ::= SpatialIndex over the records, set once
+        records are processed
+    @property: dataset_version ::= version of the dataset the records came
+        from, if the subclass knows it
+    @property: layer_version ::= version of the whole source the records
+        were selected from, if the subclass knows it and it differs from
+        dataset_version (e.g. FinderGIS only fetches the features near the
+        origin). Closest facility answers are kept per layer_version
 
     """
 
@@ -31,6 +77,30 @@ class Finder(object):
     CITY = "Boston"
     STATE = "MA"
     ERROR_MESSAGE = "Uh oh. Something went wrong!"
+    # Seconds each independent stage in start() may take before we give up
+    RECORDS_TIMEOUT = 5
+    GEOCODE_TIMEOUT = 3
+    TOKEN_TIMEOUT = 3
+    # Number of facilities, closest by straight-line distance, that are
+    # sent to the ArcGIS route solver
+    MAX_ROUTED_FACILITIES = 10
+
+    # Closest facility answers are shared by every origin in the same
+    # geohash cell (~150 m), and this many cells are kept per dataset
+    ANSWER_CELL_PRECISION = geohash_utils.DEFAULT_PRECISION
+    MAX_CACHED_ANSWERS = 4096
+
+    # Spatial indexes kept per dataset, for subclasses whose records
+    # differ from request to request (e.g. the features near the origin)
+    MAX_CACHED_INDEXES = 8
+
+    # resource_url -> OrderedDict of dataset version -> SpatialIndex, least
+    # recently used first, shared by all Finders so an index is only built
+    # once per version of a dataset
+    _spatial_indexes = {}
+    # resource_url -> (dataset version, OrderedDict of geohash -> closest
+    # record), least recently used cell first
+    _closest_answers = {}
 
     def __init__(
             self,
@@ -61,6 +131,13 @@ class Finder(object):
         self.field_formatter = output_speech_prep_func
         # pull the origin address from request data model
         self.origin_address = Finder.address_builder(req)
+        self.spatial_index = None
+        self.dataset_version = None
+        self.layer_version = None
+        # the origin is geocoded once, even if several stages need it
+        self._geocoded_origin = None
+        self._origin_geocoded = False
+        self._geocode_lock = threading.Lock()
 
     def get_records(self):
         """
@@ -77,41 +154,242 @@ class Finder(object):
         """
         Begins process of retrieving records
         
-        All subclasses should provide a get_records for start
+        All subclasses should provide a get_records for start. If a
+        precomputed grid covers the origin the answer is read from it.
+        Otherwise fetching the records, geocoding the origin address and
+        getting an ArcGIS access token (unless routing over the local road
+        network) don't depend on each other, so they run at the same time
+        and are joined before finding the closest route.
         
         :return: None
         """
         logger.debug('')
-        records = self.get_records()
-        self._start(records)
+        if self.answer_from_grid():
+            return
+        stages = [
+            (self.get_records, self.RECORDS_TIMEOUT),
+            (self.geocode_origin_address, self.GEOCODE_TIMEOUT)
+        ]
+        if road_network_utils.get_road_network() is None:
+            # Only the ArcGIS route solver needs an access token
+            stages.append((arcgis_utils.generate_access_token,
+                           self.TOKEN_TIMEOUT))
+        try:
+            results = self._run_stages(stages)
+        except concurrent.futures.TimeoutError:
+            logger.error('Timed out waiting for a Finder stage')
+            self.output_speech = Finder.ERROR_MESSAGE
+            return
+        records, geocoded_origin_address = results[:2]
+        api_access_token = results[2] if len(results) > 2 else None
+        self._start(records, geocoded_origin_address, api_access_token)
+
+    @staticmethod
+    def _run_stages(stages):
+        """
+        Runs independent stages concurrently on the shared thread pool and
+        waits for all of them. Each stage's timeout counts from when the
+        stage was submitted. If a stage times out, the stages that haven't
+        started are cancelled and the running ones are abandoned.
+
+        :param stages: list of (function, timeout in seconds) tuples
+        :return: list of stage results, in the same order as stages
+        :raises: concurrent.futures.TimeoutError if a stage takes longer
+            than its timeout
+        """
+        with _stage_executor_lock:
+            executor = _stage_executor
+            submitted_at = time.monotonic()
+            futures = [(executor.submit(function), timeout)
+                       for function, timeout in stages]
+        results = []
+        try:
+            for future, timeout in futures:
+                remaining = max(0, submitted_at + timeout - time.monotonic())
+                results.append(future.result(timeout=remaining))
+        except concurrent.futures.TimeoutError:
+            for future, _ in futures:
+                future.cancel()
+            _replace_stage_executor(executor)
+            raise
+        return results
+
+    def answer_from_grid(self):
+        """
+        Sets output_speech from the precomputed nearest facility grid for
+        this dataset, if one was bundled and it covers the origin
+
+        :return: True if output_speech was set, False if the answer has to
+            be found with live routing
+        """
+        grid = NearestFacilityGrid.load(self.resource_url)
+        if grid is None:
+            return False
+        try:
+            origin, = self._run_stages([(self.geocode_origin_address,
+                                         self.GEOCODE_TIMEOUT)])
+        except concurrent.futures.TimeoutError:
+            return False
+        if origin is None:
+            return False
+        answer = grid.lookup(origin.x, origin.y)
+        if answer is None:
+            logger.debug('Origin not covered by the nearest facility grid')
+            return False
+
+        record, minutes, miles = answer
+        driving_info = arcgis_utils.build_destination_dict(
+            record[grid.address_key], minutes, miles)
+        closest_record = {**record, **driving_info}
+        self.field_formatter(closest_record)
+        self.set_output_speech(closest_record)
+        return True
 
-    def _start(self, records):
+    def _start(self, records, geocoded_origin_address, api_access_token):
         """
         Process list of records and set the output_speech field. output_speech
         will be queried by creator of a Finder object and used to 
         construct a MyCityResponseDataModel
         
-        :param records: a list of all location records, records are stored as 
-            dictionaries
+        :param records: RecordStore, or list of all location records stored
+            as dictionaries
+        :param geocoded_origin_address: Coordinate of the origin address,
+            or None if it couldn't be geocoded
+        :param api_access_token: String containing ArcGIS access token
         :return: None
         """
         logger.debug('Last 5 records: ' + str(records[:5]))
-        records = self.add_city_and_state_to_records(records)
-        
-        geocoded_origin_address = self.geocode_origin_address()
-        destination_coordinate_dictionary = self.records_to_coordinate_dict(records)
-        api_access_token = arcgis_utils.generate_access_token()
-        closest_dest = arcgis_utils.find_closest_route(api_access_token,
-                                                        geocoded_origin_address,
-                                                        destination_coordinate_dictionary)
+        records = self.add_city_and_state_to_records(
+            RecordStore.from_records(records)
+        )
+        version = self.get_dataset_version(records)
+        self.spatial_index = self.get_spatial_index(records, version)
+        # a reused index holds the same records, look them up there
+        records = self.spatial_index.records
+
+        # the closest facility of a cell only changes with the whole layer
+        if self.layer_version is not None:
+            version = self.layer_version
+        cell = self.get_origin_cell(geocoded_origin_address)
+        closest_record = self.get_cached_answer(version, cell)
+        if closest_record is None:
+            closest_record, routed = self.solve_closest_record(
+                records,
+                geocoded_origin_address,
+                api_access_token
+            )
+            if routed:
+                self.cache_answer(version, cell, closest_record)
 
-        closest_record = \
-            self.get_closest_record_with_driving_info(closest_dest,
-                                                      records)
         formatted_record = self.field_formatter(closest_record)
         # TODO: Should this be called with formatted_record?
         self.set_output_speech(closest_record)
         
+    def solve_closest_record(self, records, origin, api_access_token):
+        """
+        Finds the record closest to the origin by driving distance, routing
+        to the facilities closest by straight-line distance
+
+        :param records: RecordStore the spatial index was built over
+        :param origin: Coordinate of the origin address, or None
+        :param api_access_token: String containing ArcGIS access token, or
+            None when routing over the local road network
+        :return: Two-Tuple containing 1) the closest record merged with its
+            driving information and 2) True if the route solver answered,
+            False if the driving information is a straight-line estimate
+        """
+        candidates, distances = self.find_k_nearest(
+            origin,
+            self.MAX_ROUTED_FACILITIES
+        )
+
+        destination_coordinate_dictionary = self.records_to_coordinate_dict(candidates)
+        road_network = road_network_utils.get_road_network()
+        if road_network is not None:
+            closest_dest = road_network_utils.find_closest_route(
+                road_network,
+                origin,
+                destination_coordinate_dictionary
+            )
+        else:
+            closest_dest = arcgis_utils.find_closest_route(
+                api_access_token,
+                origin,
+                destination_coordinate_dictionary
+            )
+        routed = closest_dest is not None
+        if not routed and distances:
+            # The route solver is down or too slow, answer with the
+            # closest facility by straight-line distance instead
+            logger.debug('Falling back to straight-line closest facility')
+            closest_dest = self.estimate_driving_info(candidates[0],
+                                                      distances[0])
+
+        closest_record = \
+            self.get_closest_record_with_driving_info(closest_dest,
+                                                      records)
+        return (closest_record, routed)
+
+    def get_origin_cell(self, origin):
+        """
+        Returns the geohash cell holding the origin, which origins share
+        closest facility answers in
+
+        :param origin: Coordinate of the origin address, or None
+        :return: String containing the geohash, or None if the origin has
+            no coordinates
+        """
+        try:
+            return geohash_utils.encode(float(origin.x), float(origin.y),
+                                        self.ANSWER_CELL_PRECISION)
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def get_cached_answer(self, version, cell):
+        """
+        Returns the closest record found earlier for an origin in the same
+        cell, using the same version of the dataset
+
+        :param version: version of the dataset
+        :param cell: geohash of the origin's cell, or None
+        :return: copy of the closest record, or None if there is no answer
+            for this cell
+        """
+        cached = Finder._closest_answers.get(self.resource_url)
+        if cell is None or cached is None or cached[0] != version:
+            return None
+        answers = cached[1]
+        answer = answers.get(cell)
+        if answer is None:
+            return None
+        answers.move_to_end(cell)
+        logger.debug('Closest facility answer cached for cell ' + cell)
+        # the field formatter modifies the record it's given
+        return dict(answer)
+
+    def cache_answer(self, version, cell, closest_record):
+        """
+        Saves the closest record for every origin in a cell. Answers for
+        older versions of the dataset are dropped
+
+        :param version: version of the dataset
+        :param cell: geohash of the origin's cell, or None
+        :param closest_record: the closest record merged with its driving
+            information
+        :return: None
+        """
+        if cell is None or closest_record is None:
+            return
+        cached = Finder._closest_answers.get(self.resource_url)
+        if cached is None or cached[0] != version:
+            cached = (version, collections.OrderedDict())
+            Finder._closest_answers[self.resource_url] = cached
+        answers = cached[1]
+        answers[cell] = dict(closest_record)
+        answers.move_to_end(cell)
+        while len(answers) > self.MAX_CACHED_ANSWERS:
+            answers.popitem(last=False)
+
     def get_output_speech(self):
         """
         Return formatted speech output or the standard error message
@@ -166,6 +444,12 @@ class Finder(object):
         """
         logger.debug('driving_info:' + str(driving_info) +
                      'records:' + str(records))
+        if self.spatial_index is not None and \
+                self.spatial_index.records is records:
+            record = self.spatial_index.get(driving_info[self.address_key])
+            if record is not None:
+                return {**record, **driving_info}
+            return None
         for record in records:
             if driving_info[self.address_key] == record[self.address_key]:
                 # NOTE: This will overwrite any common fields (however
@@ -209,15 +493,108 @@ class Finder(object):
 
 
 
-    def geocode_origin_address(self):
+    def get_dataset_version(self, records):
         """
-        Utilizes ArcGIS to geocode the origin address,
-        which means to assign (X, Y) coordinates to the address
+        Returns a value identifying this version of the dataset. Records
+        with the same coordinates and addresses share a version, so their
+        spatial index can be reused. The version reported by the dataset
+        cache is used when the subclass set one
 
-        :return: Dict containing address string and geocode coordinates
+        :param records: a list of all location records, records are stored
+            as dictionaries
+        :return: hashable dataset version
         """
-        geocoded_origin_address_candidates = arcgis_utils.geocode_address_candidates(self.origin_address)
-        geocoded_origin_address = arcgis_utils.select_top_address_candidate(geocoded_origin_address_candidates)
-        return geocoded_origin_address
+        if self.dataset_version is not None:
+            return self.dataset_version
+        if isinstance(records, RecordStore):
+            return hash(tuple(zip(records.column('X'), records.column('Y'),
+                                  records.column(self.address_key))))
+        return hash(tuple((record['X'], record['Y'], record[self.address_key])
+                          for record in records))
 
+    def get_spatial_index(self, records, version=None):
+        """
+        Returns the spatial index for these records, building it only if
+        this version of the dataset hasn't been indexed yet
 
+        :param records: a list of all location records, records are stored
+            as dictionaries
+        :param version: version of the dataset, if already known
+        :return: SpatialIndex object
+        """
+        if version is None:
+            version = self.get_dataset_version(records)
+        indexes = Finder._spatial_indexes.setdefault(
+            self.resource_url, collections.OrderedDict())
+        spatial_index = indexes.get(version)
+        if spatial_index is not None:
+            indexes.move_to_end(version)
+            return spatial_index
+
+        logger.debug('Building spatial index for ' + str(self.resource_url))
+        spatial_index = SpatialIndex(records, id_key=self.address_key)
+        indexes[version] = spatial_index
+        while len(indexes) > self.MAX_CACHED_INDEXES:
+            indexes.popitem(last=False)
+        return spatial_index
+
+    def find_k_nearest(self, origin, k):
+        """
+        Finds the k records closest to the origin by straight-line
+        distance, for example so that only those are sent to the route
+        solver
+
+        :param origin: Coordinate of the origin address, or None
+        :param k: maximum number of records to return
+        :return: Two-Tuple containing 1) list of the closest records, nearest
+            first and 2) list of their straight-line distances in miles. If
+            the origin has no coordinates all records are returned with no
+            distances
+        """
+        if self.spatial_index is None:
+            records = self.add_city_and_state_to_records(self.get_records())
+            self.spatial_index = self.get_spatial_index(records)
+
+        try:
+            origin_x = float(origin.x)
+            origin_y = float(origin.y)
+        except (AttributeError, TypeError, ValueError):
+            logger.debug('Origin has no coordinates, not pre-filtering')
+            return (self.spatial_index.records, [])
+
+        return self.spatial_index.k_nearest(origin_x, origin_y, k)
+
+    def estimate_driving_info(self, record, straight_line_miles):
+        """
+        Estimates driving information for a record from its straight-line
+        distance, in the same format find_closest_route returns
+
+        :param record: dictionary representing a location record
+        :param straight_line_miles: straight-line distance to the record
+        :return: Dictionary containing address, estimated driving time and
+            estimated driving distance of the record
+        """
+        driving_miles, driving_minutes = \
+            distance_utils.estimate_driving_distance_and_time(
+                straight_line_miles
+            )
+        return arcgis_utils.build_destination_dict(record[self.address_key],
+                                                   driving_minutes,
+                                                   driving_miles)
+
+    def geocode_origin_address(self):
+        """
+        Geocodes the origin address, which means to assign (X, Y)
+        coordinates to the address. Addresses geocoded before (by any
+        intent) are answered from the geocoding service's cache, and
+        concurrent stages of this Finder share one lookup
+
+        :return: Coordinate of the origin address, or None if it couldn't
+            be geocoded
+        """
+        with self._geocode_lock:
+            if not self._origin_geocoded:
+                self._geocoded_origin = \
+                    geocoding_service.geocode(self.origin_address)
+                self._origin_geocoded = True
+        return self._geocoded_origin
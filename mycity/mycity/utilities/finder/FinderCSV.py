@@ -2,8 +2,9 @@
 Uses csv files to find location based information about Boston city services
 """
 
-import csv
-import requests
+import mycity.utilities.csv_utils as csv_utils
+from mycity.utilities.dataset_cache import dataset_cache
+from mycity.utilities.record_store import RecordStore
 from mycity.utilities.finder.Finder import Finder
 import logging
 
@@ -19,6 +20,10 @@ class FinderCSV(Finder):
     
     """
     default_filter = lambda record : record  # filter that filters nothing
+    # Seconds a downloaded csv file is used before checking it for changes
+    CACHE_TTL_SECONDS = 6 * 60 * 60
+    # Bytes read from the response at a time while parsing the csv file
+    CHUNK_SIZE = 64 * 1024
 
     def __init__(
             self,
@@ -66,44 +71,67 @@ class FinderCSV(Finder):
         Subclasses must provide a get_records method. Base class will
         handle all processing
 
-        :return: list of dictionaries representing the resource csv file
+        :return: RecordStore holding the records in the resource csv file
         """
         logger.debug('')
-        return self.file_to_filtered_records(self.fetch_resource())
+        dataset = self.fetch_resource()
+        if dataset is None:
+            return []
+        records = RecordStore.from_records(dataset.records)
+        kept = self.get_filtered_indices(records)
+        # Finders on the same url can have different filters, so the
+        # version names the records this filter kept as well
+        self.dataset_version = (dataset.version, hash(tuple(kept)))
+        return records.select(kept)
 
     def fetch_resource(self):
         """
-        Make api call to get csv resource and return it as a string
+        Get the parsed csv resource from the dataset cache, which downloads
+        it only when it isn't cached or has changed
         
-        :return: a string representation of the csv file
+        :return: CachedDataset with the records in the csv file and its
+            version, or None if the csv file couldn't be downloaded
         """
         logger.debug('')
+        return dataset_cache.get(self.resource_url,
+                                 self.response_to_records,
+                                 ttl_seconds=self.CACHE_TTL_SECONDS)
 
-        r = requests.get(self.resource_url)
-        if r.status_code == 200:
-            file_contents = r.content.decode(r.apparent_encoding)
-        else:
-            file_contents = None
-        r.close()
-        return file_contents
+    def response_to_records(self, response):
+        """
+        Convert a successful GET on resource_url into a RecordStore. The
+        body is streamed through the csv reader, using the declared (or
+        byte order mark) encoding, and each row is added to the store's
+        columns as it's read, so neither the body nor a dictionary per
+        row is ever held in memory as a whole
+
+        :param response: streamed requests.Response object for the csv file
+        :return: RecordStore holding one record per row of the csv
+        """
+        declared_encoding = csv_utils.get_declared_encoding(response.headers)
+        return RecordStore.from_records(csv_utils.iter_csv_records(
+            response.iter_content(chunk_size=self.CHUNK_SIZE),
+            declared_encoding
+        ))
 
-    def file_to_filtered_records(self, file_contents):
+    def filter_records(self, records):
         """
-        Convert the string representation of the csv file into a list of
-        dictionaries, each representing one record
+        Remove the records rejected by this finder's filter
         
-        :param file_contents: contents from successful GET on resource_url,
-            a string representation of the csv file
-        :return: a list of dictionaries (OrderedDict) each representing one
-            row from the csv
+        :param records: RecordStore, or list of dictionaries each
+            representing one row from the csv
+        :return: RecordStore holding the records accepted by the filter
         """
-        logger.debug('file_contents:' + str(file_contents).replace('\n', '\r'))
-        return list(
-            filter(
-                self._filter,
-                csv.DictReader(
-                   file_contents.splitlines(),
-                   delimiter=','
-                )
-            )
-        )
+        records = RecordStore.from_records(records)
+        return records.select(self.get_filtered_indices(records))
+
+    def get_filtered_indices(self, records):
+        """
+        Find the records accepted by this finder's filter
+
+        :param records: RecordStore holding the rows of the csv
+        :return: list of the positions of the accepted records
+        """
+        logger.debug('count(records): ' + str(len(records)))
+        return [index for index, record in enumerate(records)
+                if self._filter(record)]
@@ -2,8 +2,12 @@
 Uses ArcGIS to find location based information about Boston city services
 """
 
+import string
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.feature_layer_replica as feature_layer_replica
+from mycity.utilities.dataset_cache import dataset_cache
 from mycity.utilities.finder.Finder import Finder
-from mycity.utilities.gis_utils import get_features_from_feature_server
+from mycity.utilities.gis_utils import get_feature_records
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,10 +17,31 @@ class FinderGIS(Finder):
     """
     Finder subclass to find Feature locations from ArcGIS Feature Server
     @property: query ::= parameter for call to ArcGIS server
+    @property: out_fields ::= list of attribute fields requested from the
+        server
+    @property: replicate ::= if True, records are read from a local replica
+        of the whole layer, synced by edit date, instead of querying around
+        the origin
+    @property: response_format ::= format features are requested in
 
     """
     # default query returns all records
     DEFAULT_QUERY = "1=1"
+    # Seconds queried features are reused. Feature Server layers can be
+    # live (e.g. parking availability) so they are kept only briefly
+    CACHE_TTL_SECONDS = 60
+    # Features are only requested within these distances of the origin,
+    # widening until at least MIN_FEATURES come back. None queries the
+    # whole layer, so a facility is found even far from the origin
+    SEARCH_RADII_MILES = (0.5, 1, 2, 5, None)
+    MIN_FEATURES = Finder.MAX_ROUTED_FACILITIES
+    # Origins are rounded to this many decimal places (~10 m) when caching
+    # the features found around them. Those results are only kept in
+    # memory, in the dataset cache's LRU
+    ORIGIN_CACHE_DECIMALS = 4
+    # Fields added to records by Finder rather than read from the server
+    COMPUTED_FIELDS = (arcgis_utils.DRIVING_DISTANCE_TEXT_KEY,
+                       arcgis_utils.DRIVING_TIME_TEXT_KEY)
 
     def __init__(
             self,
@@ -25,7 +50,10 @@ class FinderGIS(Finder):
             address_key,
             output_speech,
             output_speech_prep_func,
-            query=DEFAULT_QUERY
+            query=DEFAULT_QUERY,
+            out_fields=None,
+            replicate=False,
+            response_format=arcgis_utils.JSON_FORMAT
     ):
         """
         Call super constructor and save query
@@ -44,6 +72,16 @@ class FinderGIS(Finder):
             and modify fields in the returned record for output_speech
             formatted string
         :param query: parameter for call to ArcGIS server 
+        :param out_fields: list of attribute fields to request. Defaults to
+            the address field and the fields output_speech uses; pass the
+            fields output_speech_prep_func reads if it needs others
+        :param replicate: if True, read from a local replica of the layer.
+            Suits small, live layers (e.g. parking availability) where few
+            features change between requests
+        :param response_format: arcgis_utils.JSON_FORMAT, or
+            arcgis_utils.PBF_FORMAT for layers whose results are large
+            enough that the smaller download outweighs the slower decode
+            (layers that can't answer in pbf fall back to JSON)
         """
         super().__init__(
             req,
@@ -53,16 +91,132 @@ class FinderGIS(Finder):
             output_speech_prep_func
         )
         self.query = query
+        self.out_fields = out_fields if out_fields is not None \
+            else self.get_template_fields()
+        self.replicate = replicate
+        self.response_format = response_format
+
+    def get_template_fields(self):
+        """
+        Returns the fields the output speech template reads from a record
+
+        :return: list of field names, starting with the address field
+        """
+        fields = [self.address_key]
+        for _, field, _, _ in string.Formatter().parse(self.output_speech):
+            if field and field not in fields and \
+                    field not in self.COMPUTED_FIELDS:
+                fields.append(field)
+        return fields
 
     def get_records(self):
         """
-        Query City of Boston Feature Server, and return a list of features
+        Query City of Boston Feature Server for the features around the
+        origin, and return them as records. The search radius widens until
+        enough features are found. Results are shared through the dataset
+        cache for CACHE_TTL_SECONDS. layer_version is set from the layer's
+        last edit date, so closest facility answers are shared by every
+        origin until the layer changes
         
-        :return: list of features corresponding to query
+        :return: list of records corresponding to query
         """
         logger.debug('')
 
-        return get_features_from_feature_server(
+        if self.replicate:
+            return self.get_replicated_records()
+
+        origin = self.geocode_origin_address()
+        if origin is None:
+            # without an origin there is nothing to filter around
+            near = None
+            radii = (None,)
+        else:
+            near = (round(float(origin.x), self.ORIGIN_CACHE_DECIMALS),
+                    round(float(origin.y), self.ORIGIN_CACHE_DECIMALS))
+            radii = self.SEARCH_RADII_MILES
+
+        dataset = dataset_cache.get_or_load(
+            "{}?where={}&outFields={}&near={}".format(
+                self.resource_url, self.query, ",".join(self.out_fields),
+                near),
+            # an empty result is treated as a failed query and not cached
+            lambda: self.query_nearby_records(near, radii) or None,
+            ttl_seconds=self.CACHE_TTL_SECONDS,
+            persist=False
+        )
+        if dataset is None:
+            return []
+        self.dataset_version = dataset.version
+        self.layer_version = self.get_layer_version()
+        return dataset.records
+
+    def get_layer_version(self):
+        """
+        Returns a version of the whole layer, which changes when any of its
+        features is edited. The layer's last edit date is shared through the
+        dataset cache for CACHE_TTL_SECONDS
+
+        :return: hashable layer version, or None if the layer doesn't
+            report when it was last edited
+        """
+        def load():
+            last_edit_date = arcgis_utils.get_layer_last_edit_date(
+                self.resource_url)
+            return [last_edit_date] if last_edit_date is not None else None
+
+        layer = dataset_cache.get_or_load(
+            "{}?f=json".format(self.resource_url),
+            load,
+            ttl_seconds=self.CACHE_TTL_SECONDS
+        )
+        if layer is None:
+            return None
+        # Finders with other queries on the layer find other facilities
+        return (layer.version, self.query, tuple(self.out_fields))
+
+    def get_replicated_records(self):
+        """
+        Returns every feature matching the query from the layer's local
+        replica, syncing it first if it's older than CACHE_TTL_SECONDS
+
+        :return: list of records corresponding to query
+        """
+        replica = feature_layer_replica.get_replica(
             self.resource_url,
-            self.query
+            self.query,
+            self.out_fields,
+            ttl_seconds=self.CACHE_TTL_SECONDS,
+            response_format=self.response_format
         )
+        records = replica.get_records()
+        if records is None:
+            return []
+        self.dataset_version = replica.version
+        return records
+
+    def query_nearby_records(self, near, radii):
+        """
+        Queries features within each radius of a point in turn, until at
+        least MIN_FEATURES are found
+
+        :param near: (longitude, latitude) to search around, or None
+        :param radii: increasing search radii in miles. None searches the
+            whole layer
+        :return: list of records from the last query made, or None if a
+            query failed
+        """
+        records = None
+        for radius in radii:
+            records = get_feature_records(
+                self.resource_url,
+                self.query,
+                out_fields=self.out_fields,
+                near=near if radius is not None else None,
+                distance_in_miles=radius,
+                response_format=self.response_format
+            )
+            if records is None or len(records) >= self.MIN_FEATURES:
+                break
+            logger.debug('Found {} features within {} miles, widening search'
+                         .format(len(records), radius))
+        return records
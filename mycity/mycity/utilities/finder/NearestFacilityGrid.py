@@ -0,0 +1,260 @@
+"""
+Precomputed nearest facility answers for a grid covering Boston
+
+For static datasets (e.g. snow emergency parking) the closest facility and
+its estimated driving time and distance are computed at build time for the
+center of every grid cell and written to a compact binary file. At runtime
+the file is memory mapped, so answering a request is one array lookup.
+
+File layout (little endian):
+    header      HEADER struct (see below)
+    metadata    UTF-8 JSON with the facility records and dataset details
+    padding     to an 8 byte boundary
+    cells       rows x columns array of CELL_DTYPE
+"""
+
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+import mycity.utilities.csv_utils as csv_utils
+import mycity.utilities.distance_utils as distance_utils
+import mycity.utilities.http_utils as http_utils
+from mycity.utilities.finder.SpatialIndex import SpatialIndex
+from mycity.utilities.record_store import RecordStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MCNG"
+FORMAT_VERSION = 1
+# magic, format version, columns, rows, min x, min y, cell width,
+# cell height, metadata length
+HEADER = struct.Struct("<4sHIIddddI")
+# facility ::= row of the facility in the metadata's records
+# minutes ::= estimated driving time in tenths of a minute
+# miles ::= estimated driving distance in hundredths of a mile
+CELL_DTYPE = np.dtype([("facility", "<u2"), ("minutes", "<u2"),
+                       ("miles", "<u2")])
+UNCOVERED = 0xFFFF
+
+# (min longitude, min latitude, max longitude, max latitude) of Boston
+BOSTON_BOUNDS = (-71.20, 42.22, -70.98, 42.40)
+# Roughly 150 m x 150 m at Boston's latitude
+CELL_WIDTH_DEGREES = 0.0018
+CELL_HEIGHT_DEGREES = 0.00135
+# Cells further than this from every facility are left to live routing
+MAX_COVERED_MILES = 5
+
+# Grid files are bundled in this directory of the mycity package
+GRID_PACKAGE_PATH = os.path.join("data", "nearest_facility_grids")
+GRID_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)))),
+    GRID_PACKAGE_PATH
+)
+
+
+def grid_file_name(resource_url):
+    """
+    :param resource_url: String containing URL of the facility dataset
+    :return: name of the grid file for the dataset
+    """
+    return hashlib.sha1(resource_url.encode("utf-8")).hexdigest()[:16] + \
+        ".grid"
+
+
+class NearestFacilityGrid(object):
+
+    """
+    Read only, memory mapped nearest facility grid
+
+    @property: facilities ::= RecordStore of the facility records
+    @property: address_key ::= field of the facility records holding the
+        address
+    """
+
+    # resource_url -> NearestFacilityGrid (or None if there is no grid file),
+    # shared by all Finders
+    _grids = {}
+
+    def __init__(self, path):
+        """
+        :param path: path of the grid file
+        :raises: ValueError if the file isn't a grid file
+        """
+        with open(path, "rb") as grid_file:
+            header = grid_file.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError("Truncated grid file: " + path)
+            (magic, version, self._columns, self._rows, self._min_x,
+             self._min_y, self._cell_width, self._cell_height,
+             metadata_length) = HEADER.unpack(header)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError("Not a version {} grid file: {}"
+                                 .format(FORMAT_VERSION, path))
+            metadata = json.loads(grid_file.read(metadata_length)
+                                  .decode("utf-8"))
+
+        self.address_key = metadata["address_key"]
+        self.resource_url = metadata["resource_url"]
+        self.facilities = RecordStore.from_columns(metadata["facilities"])
+        self._cells = np.memmap(path, dtype=CELL_DTYPE, mode="r",
+                                offset=_cells_offset(metadata_length),
+                                shape=(self._rows, self._columns))
+        logger.debug("Loaded {}x{} grid of {} facilities built at {}"
+                     .format(self._columns, self._rows,
+                             len(self.facilities), metadata["built_at"]))
+
+    @classmethod
+    def load(cls, resource_url, directory=None):
+        """
+        Returns the grid for a dataset, if one was bundled
+
+        :param resource_url: String containing URL of the facility dataset
+        :param directory: directory holding grid files
+        :return: NearestFacilityGrid, or None if there is no usable grid
+            for the dataset
+        """
+        if resource_url in cls._grids:
+            return cls._grids[resource_url]
+        path = os.path.join(directory or GRID_DIRECTORY,
+                            grid_file_name(resource_url))
+        grid = None
+        if os.path.isfile(path):
+            try:
+                grid = cls(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Could not load grid {}: {}"
+                             .format(path, str(e)))
+        cls._grids[resource_url] = grid
+        return grid
+
+    def lookup(self, x, y):
+        """
+        Finds the precomputed closest facility for a coordinate
+
+        :param x: longitude of the origin
+        :param y: latitude of the origin
+        :return: Three-Tuple containing 1) RecordView of the facility,
+            2) estimated driving time in minutes and 3) estimated driving
+            distance in miles, or None if the grid doesn't cover the origin
+        """
+        column = int(np.floor((float(x) - self._min_x) / self._cell_width))
+        row = int(np.floor((float(y) - self._min_y) / self._cell_height))
+        if not (0 <= column < self._columns and 0 <= row < self._rows):
+            return None
+        cell = self._cells[row, column]
+        if cell["facility"] == UNCOVERED:
+            return None
+        return (self.facilities[int(cell["facility"])],
+                cell["minutes"] / 10.0,
+                cell["miles"] / 100.0)
+
+    @staticmethod
+    def build(records, address_key, resource_url, path,
+              bounds=BOSTON_BOUNDS, cell_width=CELL_WIDTH_DEGREES,
+              cell_height=CELL_HEIGHT_DEGREES,
+              max_covered_miles=MAX_COVERED_MILES):
+        """
+        Computes the closest facility to the center of every cell and
+        writes the grid file
+
+        :param records: RecordStore or list of facility records, with the
+            addresses as they should be spoken
+        :param address_key: field of the records holding the address
+        :param resource_url: String containing URL of the facility dataset
+        :param path: path of the grid file to write
+        :param bounds: (min x, min y, max x, max y) covered by the grid
+        :param cell_width: width of a cell in degrees of longitude
+        :param cell_height: height of a cell in degrees of latitude
+        :param max_covered_miles: cells further than this from every
+            facility are left uncovered
+        :return: number of covered cells
+        """
+        facilities = RecordStore.from_records(records)
+        if len(facilities) >= UNCOVERED:
+            raise ValueError("Too many facilities for a grid: {}"
+                             .format(len(facilities)))
+        spatial_index = SpatialIndex(facilities, id_key=address_key)
+        min_x, min_y, max_x, max_y = bounds
+        columns = int(np.ceil((max_x - min_x) / cell_width))
+        rows = int(np.ceil((max_y - min_y) / cell_height))
+
+        cells = np.zeros((rows, columns), dtype=CELL_DTYPE)
+        cells["facility"] = UNCOVERED
+        covered = 0
+        for row in range(rows):
+            center_y = min_y + (row + 0.5) * cell_height
+            for column in range(columns):
+                center_x = min_x + (column + 0.5) * cell_width
+                nearest, distances = spatial_index.k_nearest(center_x,
+                                                             center_y, 1)
+                if not nearest or distances[0] > max_covered_miles:
+                    continue
+                miles, minutes = \
+                    distance_utils.estimate_driving_distance_and_time(
+                        distances[0])
+                cells[row, column] = (nearest[0].index,
+                                      min(int(round(minutes * 10)),
+                                          UNCOVERED - 1),
+                                      min(int(round(miles * 100)),
+                                          UNCOVERED - 1))
+                covered += 1
+
+        metadata = json.dumps({
+            "resource_url": resource_url,
+            "address_key": address_key,
+            "facilities": facilities.to_columns(),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }).encode("utf-8")
+        with open(path, "wb") as grid_file:
+            grid_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, columns, rows,
+                                        min_x, min_y, cell_width,
+                                        cell_height, len(metadata)))
+            grid_file.write(metadata)
+            grid_file.write(b"\0" * (_cells_offset(len(metadata)) -
+                                     HEADER.size - len(metadata)))
+            grid_file.write(cells.tobytes())
+        logger.debug("Wrote grid {} covering {} of {} cells"
+                     .format(path, covered, rows * columns))
+        return covered
+
+
+def _cells_offset(metadata_length):
+    """
+    :param metadata_length: length of the metadata block in bytes
+    :return: offset of the cell array, aligned to 8 bytes
+    """
+    end_of_metadata = HEADER.size + metadata_length
+    return (end_of_metadata + 7) // 8 * 8
+
+
+def build_grid_file(resource_url, address_key, directory, city, state):
+    """
+    Downloads a csv facility dataset and writes its grid file
+
+    :param resource_url: String containing URL of the csv dataset
+    :param address_key: field of the records holding the address
+    :param directory: directory to write the grid file to
+    :param city: city appended to the addresses, as Finder does
+    :param state: state appended to the addresses, as Finder does
+    :return: path of the grid file
+    """
+    response = http_utils.get(resource_url, stream=True)
+    try:
+        response.raise_for_status()
+        records = RecordStore.from_records(csv_utils.iter_csv_records(
+            response.iter_content(chunk_size=64 * 1024),
+            csv_utils.get_declared_encoding(response.headers)
+        ))
+    finally:
+        response.close()
+    records = csv_utils.add_city_and_state_to_records(records, address_key,
+                                                      city, state)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, grid_file_name(resource_url))
+    NearestFacilityGrid.build(records, address_key, resource_url, path)
+    return path
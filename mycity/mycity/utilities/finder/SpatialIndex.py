@@ -0,0 +1,158 @@
+"""
+KD-tree over the X (longitude) and Y (latitude) coordinates of location
+records, used by Finder to find the records closest to an origin without
+scanning the whole dataset
+"""
+
+import heapq
+import numpy as np
+import mycity.utilities.distance_utils as distance_utils
+from mycity.utilities.record_store import RecordStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SpatialIndex(object):
+
+    """
+    Static KD-tree built once over a list of records.
+
+    Longitudes are scaled by the cosine of the dataset's mean latitude so
+    that euclidean distance in the tree approximates ground distance at
+    city scale. Records are also indexed by facility id for O(1) lookups.
+
+    @property: records ::= RecordStore holding the records the index was
+        built over
+    """
+
+    # Nodes holding this many points or fewer are searched by brute force
+    LEAF_SIZE = 8
+
+    def __init__(self, records, id_key, x_key='X', y_key='Y'):
+        """
+        :param records: RecordStore, or list of location records stored as
+            dictionaries (which is converted to a RecordStore)
+        :param id_key: key of the field that identifies a facility
+        :param x_key: key of the longitude field
+        :param y_key: key of the latitude field
+        """
+        self.records = RecordStore.from_records(records, x_key, y_key)
+        ids = self.records.column(id_key) \
+            if self.records.has_field(id_key) else []
+        self._by_id = {facility_id: position
+                       for position, facility_id in enumerate(ids)}
+
+        xs = self.records.coordinates(x_key)
+        ys = self.records.coordinates(y_key)
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        self._record_positions = np.flatnonzero(valid)
+        self._xs = xs[valid]
+        self._ys = ys[valid]
+
+        mean_latitude = self._ys.mean() if len(self._ys) else 0.0
+        self._x_scale = np.cos(np.radians(mean_latitude))
+        self._points = np.column_stack((self._xs * self._x_scale, self._ys))
+        self._order = np.arange(len(self._points))
+        self._build(0, len(self._points), 0)
+        logger.debug('Built spatial index over {} of {} records'
+                     .format(len(self._points), len(records)))
+
+    def __len__(self):
+        return len(self._points)
+
+    def _build(self, lo, hi, depth):
+        """
+        Arranges self._order[lo:hi] into an implicit KD-tree: the median
+        point on the splitting axis sits at the middle position, with
+        smaller points before it and larger points after it
+
+        :param lo: first position of the subtree
+        :param hi: position after the last position of the subtree
+        :param depth: depth of the subtree, which selects the splitting axis
+        :return: None
+        """
+        if hi - lo <= self.LEAF_SIZE:
+            return
+        axis = depth % 2
+        mid = (lo + hi) // 2
+        segment = self._order[lo:hi]
+        partitioned = np.argpartition(self._points[segment, axis], mid - lo)
+        self._order[lo:hi] = segment[partitioned]
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def get(self, facility_id):
+        """
+        Looks up a record by facility id
+
+        :param facility_id: value of the record's id field
+        :return: RecordView of the record, or None if no record has this id
+        """
+        position = self._by_id.get(facility_id)
+        if position is None:
+            return None
+        return self.records[position]
+
+    def k_nearest(self, origin_x, origin_y, k):
+        """
+        Finds the k records closest to an origin
+
+        :param origin_x: longitude of the origin
+        :param origin_y: latitude of the origin
+        :param k: number of records to return
+        :return: Two-Tuple containing 1) list of RecordViews of the closest
+            records, nearest first and 2) list of their straight-line
+            distances in miles
+        """
+        k = min(k, len(self._points))
+        if k <= 0:
+            return ([], [])
+
+        query = (float(origin_x) * self._x_scale, float(origin_y))
+        heap = []  # max-heap of (-squared distance, point) pairs
+        self._search(0, len(self._points), 0, query, k, heap)
+        points = [point for _, point in sorted(heap, reverse=True)]
+
+        distances = distance_utils.haversine_distances(
+            origin_x, origin_y, self._xs[points], self._ys[points])
+        records = [self.records[int(self._record_positions[point])]
+                   for point in points]
+        return (records, list(distances))
+
+    def _search(self, lo, hi, depth, query, k, heap):
+        """
+        Recursively collects the k points nearest to query in the
+        subtree self._order[lo:hi]
+
+        :return: None
+        """
+        if hi - lo <= self.LEAF_SIZE:
+            for point in self._order[lo:hi]:
+                self._offer(point, query, k, heap)
+            return
+
+        axis = depth % 2
+        mid = (lo + hi) // 2
+        point = self._order[mid]
+        self._offer(point, query, k, heap)
+
+        difference = query[axis] - self._points[point, axis]
+        if difference < 0:
+            near, far = (lo, mid), (mid + 1, hi)
+        else:
+            near, far = (mid + 1, hi), (lo, mid)
+        self._search(near[0], near[1], depth + 1, query, k, heap)
+        # only search the other side of the split if it could hold a
+        # point closer than the furthest one found so far
+        if len(heap) < k or difference ** 2 < -heap[0][0]:
+            self._search(far[0], far[1], depth + 1, query, k, heap)
+
+    def _offer(self, point, query, k, heap):
+        dx = self._points[point, 0] - query[0]
+        dy = self._points[point, 1] - query[1]
+        entry = (-(dx * dx + dy * dy), int(point))
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
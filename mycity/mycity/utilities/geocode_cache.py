@@ -0,0 +1,183 @@
+"""
+Per-container cache of geocoded addresses
+
+Most requests come from a small set of household addresses, and a session
+geocodes the same address for several intents. Results are kept in a
+least recently used map, keyed by the normalized address, and mirrored to
+a JSON file under the temporary directory (/tmp on Lambda) so a new
+process in a warm container starts with them.
+"""
+
+import collections
+import json
+import os
+import tempfile
+import threading
+import time
+import mycity.utilities.address_utils as address_utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Addresses rarely move, so geocodes are kept for a long time
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1024
+CACHE_FILE = os.path.join(tempfile.gettempdir(), "mycity_geocodes.json")
+
+
+class GeocodeCache(object):
+
+    """
+    Memory and file backed LRU cache of geocoding results, keyed by
+    normalized address
+
+    @property: hits ::= number of lookups answered from the cache
+    @property: misses ::= number of lookups that had to geocode
+    """
+
+    def __init__(self, cache_file=CACHE_FILE,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.time):
+        """
+        :param cache_file: path of the file entries are mirrored to, or None
+            to keep them in memory only
+        :param max_entries: number of addresses kept before the least
+            recently used one is evicted
+        :param ttl_seconds: seconds a geocode is used before it's looked up
+            again
+        :param clock: function returning the current time in seconds
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        # normalized address -> (time stored, geocode), least recent first
+        self._entries = collections.OrderedDict()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self, address):
+        """
+        Returns the cached geocode for an address
+
+        :param address: String containing an address
+        :return: the cached geocode, or None if the address isn't cached or
+            its entry has expired
+        """
+        key = address_utils.normalize_address(address)
+        with self._lock:
+            self._load_file()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, address, geocode):
+        """
+        Caches the geocode for an address, evicting the least recently used
+        address if the cache is full
+
+        :param address: String containing an address
+        :param geocode: JSON serializable geocoding result
+        :return: None
+        """
+        key = address_utils.normalize_address(address)
+        with self._lock:
+            self._load_file()
+            self._entries[key] = (self._clock(), geocode)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._write_file()
+
+    def get_or_geocode(self, address, geocode):
+        """
+        Returns the cached geocode for an address, calling geocode to look
+        it up if it isn't cached. Failed lookups (None) aren't cached
+
+        :param address: String containing an address
+        :param geocode: function taking the address and returning its
+            geocode, or None if it couldn't be geocoded
+        :return: the geocode, or None
+        """
+        cached = self.get(address)
+        if cached is not None:
+            self.hits += 1
+            logger.debug("Geocode cache hit for {} ({} hits, {} misses)"
+                         .format(address, self.hits, self.misses))
+            return cached
+
+        self.misses += 1
+        result = geocode(address)
+        if result is not None:
+            self.put(address, result)
+        return result
+
+    def clear(self):
+        """
+        Removes every entry from memory and from the cache file
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+            if self.cache_file is not None:
+                try:
+                    os.remove(self.cache_file)
+                except OSError:
+                    pass
+
+    def _load_file(self):
+        """
+        Reads the cache file into memory the first time the cache is used.
+        Must be called with the lock held
+
+        :return: None
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, encoding="utf-8") as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        now = self._clock()
+        for key, stored_at, geocode in stored[-self.max_entries:]:
+            if now - stored_at < self.ttl_seconds:
+                self._entries[key] = (stored_at, geocode)
+        logger.debug("Loaded {} geocodes from {}"
+                     .format(len(self._entries), self.cache_file))
+
+    def _write_file(self):
+        """
+        Writes the cache to the cache file, least recently used entry
+        first. Must be called with the lock held
+
+        :return: None
+        """
+        if self.cache_file is None:
+            return
+        stored = [[key, stored_at, geocode]
+                  for key, (stored_at, geocode) in self._entries.items()]
+        try:
+            temp_path = self.cache_file + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(stored, cache_file)
+            os.replace(temp_path, self.cache_file)
+        except OSError as e:
+            logger.debug("Could not write cache file {}: {}"
+                         .format(self.cache_file, str(e)))
+
+
+# cache shared by every intent in this container
+geocode_cache = GeocodeCache()
@@ -0,0 +1,172 @@
+"""
+Single entry point for turning addresses into coordinates
+
+Every intent geocodes through the shared GeocodingService, which asks an
+ordered chain of providers for the address and caches the first answer in
+the shared geocode cache. An address resolved for one intent is then never
+geocoded again for another.
+"""
+
+import collections
+import os
+import threading
+import requests
+import mycity.utilities.arcgis_utils as arcgis_utils
+from mycity.utilities.address_points import AddressPointIndex
+from mycity.utilities.geocode_cache import geocode_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Path of a csv export of the city's SAM address points. When set, addresses
+# are looked up there first and only misses are sent to ArcGIS
+SAM_ADDRESS_POINTS_FILE = os.environ.get("SAM_ADDRESS_POINTS_FILE")
+
+# x ::= longitude
+# y ::= latitude
+# address ::= address string the provider matched
+Coordinate = collections.namedtuple("Coordinate", ["x", "y", "address"])
+
+
+class ArcGISGeocoder(object):
+
+    """
+    Geocoding provider backed by the ArcGIS World Geocoding REST API
+    """
+
+    name = "ArcGIS"
+
+    def geocode(self, address):
+        """
+        :param address: String containing an address
+        :return: Coordinate of the highest scoring candidate, or None if
+            the address couldn't be geocoded
+        """
+        top_candidate = arcgis_utils.geocode_top_candidate(address)
+        if top_candidate is None:
+            return None
+        return Coordinate(top_candidate['x'], top_candidate['y'],
+                          top_candidate['address'])
+
+
+class SAMGeocoder(object):
+
+    """
+    Offline geocoding provider backed by the city's SAM address points.
+    The csv file is loaded into an AddressPointIndex on first use
+    """
+
+    name = "SAM"
+
+    def __init__(self, csv_path):
+        """
+        :param csv_path: path of the SAM address-point csv file
+        """
+        self.csv_path = csv_path
+        self._index = None
+        self._load_failed = False
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        """
+        :param address: String containing an address
+        :return: Coordinate of the matching address point, or None if
+            there is no exact match
+        """
+        index = self._get_index()
+        if index is None:
+            return None
+        match = index.lookup(address)
+        if match is None:
+            return None
+        return Coordinate(*match)
+
+    def _get_index(self):
+        """
+        Returns the address-point index, loading it the first time
+
+        :return: AddressPointIndex, or None if the file couldn't be read
+        """
+        if self._index is None and not self._load_failed:
+            with self._lock:
+                if self._index is None and not self._load_failed:
+                    try:
+                        self._index = AddressPointIndex.from_csv_file(
+                            self.csv_path)
+                    except (OSError, KeyError) as e:
+                        logger.error("Could not load address points from "
+                                     "{}: {}".format(self.csv_path, str(e)))
+                        self._load_failed = True
+        return self._index
+
+
+class GeocodingService(object):
+
+    """
+    Geocodes addresses with an ordered chain of providers, falling back
+    to the next provider when one fails, and caches the results
+
+    @property: providers ::= list of providers, each with a name and a
+        geocode(address) method returning a Coordinate or None
+    """
+
+    def __init__(self, providers, cache=geocode_cache):
+        """
+        :param providers: list of providers, tried in order
+        :param cache: GeocodeCache shared by every caller
+        """
+        self.providers = providers
+        self.cache = cache
+
+    def geocode(self, address):
+        """
+        Returns the coordinates of an address
+
+        :param address: String containing an address
+        :return: Coordinate, or None if no provider could geocode the
+            address
+        """
+        cached = self.cache.get_or_geocode(address, self._geocode_uncached)
+        if cached is None:
+            return None
+        return Coordinate(**cached)
+
+    def _geocode_uncached(self, address):
+        """
+        Asks each provider in turn for the address
+
+        :param address: String containing an address
+        :return: Dictionary form of the first Coordinate found (so the
+            cache can store it as JSON), or None
+        """
+        for provider in self.providers:
+            try:
+                coordinate = provider.geocode(address)
+            except requests.exceptions.RequestException as e:
+                logger.debug("{} geocoder failed for {}: {}"
+                             .format(provider.name, address, str(e)))
+                continue
+            if coordinate is not None:
+                logger.debug("{} geocoded {} to {}"
+                             .format(provider.name, address, coordinate))
+                return dict(coordinate._asdict())
+        logger.debug("Could not geocode " + address)
+        return None
+
+
+def default_providers():
+    """
+    Builds the provider chain used in production: SAM address points (if
+    configured), then ArcGIS
+
+    :return: list of providers
+    """
+    providers = []
+    if SAM_ADDRESS_POINTS_FILE:
+        providers.append(SAMGeocoder(SAM_ADDRESS_POINTS_FILE))
+    providers.append(ArcGISGeocoder())
+    return providers
+
+
+# service shared by every intent in this container
+geocoding_service = GeocodingService(default_providers())
@@ -0,0 +1,52 @@
+"""
+Geohash encoding, used to bucket nearby coordinates into the same cell
+
+A geohash interleaves the bits of a longitude and latitude and writes them
+in base 32; coordinates sharing a geohash prefix are close together. At 7
+characters a cell is about 150 m on a side.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# ~153 m x 153 m cells
+DEFAULT_PRECISION = 7
+
+
+def encode(longitude, latitude, precision=DEFAULT_PRECISION):
+    """
+    Encodes a coordinate as a geohash
+
+    :param longitude: longitude in degrees
+    :param latitude: latitude in degrees
+    :param precision: number of characters in the geohash
+    :return: String containing the geohash of the cell holding the
+        coordinate
+    """
+    longitude_range = [-180.0, 180.0]
+    latitude_range = [-90.0, 90.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even_bit = True  # even bits refine longitude, odd bits latitude
+    while len(geohash) < precision:
+        if even_bit:
+            value, value_range = longitude, longitude_range
+        else:
+            value, value_range = latitude, latitude_range
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even_bit = not even_bit
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
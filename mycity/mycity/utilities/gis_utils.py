@@ -6,18 +6,17 @@ kill any computation that takes longer than 3 secs.
 
 """
 
-from arcgis.gis import *
-from arcgis.features import FeatureLayer
-from arcgis.geocoding import geocode
+import mycity.utilities.arcgis_utils as arcgis_utils
 import mycity.utilities.google_maps_utils as g_maps_utils
+from mycity.utilities.geocoding_service import geocoding_service
 import logging
 
 logger = logging.getLogger(__name__)
 
-dev_gis = GIS()  # this is needed to use geocoding
 
 def get_closest_feature(origin, feature_address_index, 
-                        feature_type, error_message, features):
+                        feature_type, error_message, features,
+                        feature_coordinate_indices=None):
     """
     Calculates the nearest feature given an origin
     
@@ -29,6 +28,9 @@ def get_closest_feature(origin, feature_address_index,
         calculating the shortest distance to
     :param error_message: string to print if we fail to find a closest feature
     :param features: list of features fetched from FeatureServer
+    :param feature_coordinate_indices: optional (x index, y index) where
+        the coordinates in features are stored. With a Coordinate origin,
+        only the features closest by straight-line distance are routed
     :return: dictionary with address, distance, and
         driving time for closest feature
     """
@@ -45,17 +47,20 @@ def get_closest_feature(origin, feature_address_index,
         feature_address_index,
         features
     )
-    location_driving_info = g_maps_utils._get_driving_info(
+    dest_coordinates = None
+    if feature_coordinate_indices is not None:
+        dest_coordinates = _get_dest_coordinates_from_features(
+            feature_address_index,
+            feature_coordinate_indices,
+            features
+        )
+    closest_location_info = g_maps_utils.get_closest_driving_info(
         origin,
         feature_type,
-        dest_addresses
+        dest_addresses,
+        dest_coordinates
     )
-    if len(location_driving_info) > 0:
-        closest_location_info = min(
-            location_driving_info,
-            key=lambda x: x[g_maps_utils.DRIVING_DISTANCE_VALUE_KEY]
-        )
-    else:
+    if closest_location_info is None:
         logger.debug(error_message)
         closest_location_info = {
             feature_type: False,
@@ -69,26 +74,87 @@ def get_closest_feature(origin, feature_address_index,
     return closest_location_info
 
 
-def get_features_from_feature_server(url, query):
+def get_features_from_feature_server(
+        url, query, response_format=arcgis_utils.JSON_FORMAT):
     """
     Given a url to a City of Boston Feature Server, return a list
     of Features (for example, parking lots that are not full)
     
     :param url: url for Feature Server
     :param query: query to select features (example: "Spaces > 0")
+    :param response_format: format the server is asked to answer in,
+        arcgis_utils.JSON_FORMAT or arcgis_utils.PBF_FORMAT
     :return: list of all features returned from the query
     """
 
     logger.debug('url received: ' + url + ', query received: ' + query)
 
-    features = []
-    f = FeatureLayer(url = url)
-    feature_set = f.query(where = query)
-    for feature in feature_set:
-        features.append(feature.as_dict)
+    features = arcgis_utils.query_feature_layer(
+        url,
+        where=query,
+        response_format=response_format
+    )
+    if features is None:
+        logger.debug('Failed to query Feature Server at ' + url)
+        return []
     return features
 
 
+def get_feature_records(url, query, out_fields="*", near=None,
+                        distance_in_miles=None, x_key="X", y_key="Y",
+                        response_format=arcgis_utils.JSON_FORMAT):
+    """
+    Queries a City of Boston Feature Server and returns the features as
+    flat location records, like rows of a csv dataset, with the point
+    geometry as longitude and latitude fields
+
+    :param url: url for Feature Server
+    :param query: query to select features (example: "Spaces > 0")
+    :param out_fields: String or list of attribute fields to return
+    :param near: optional (longitude, latitude) to only return features
+        around
+    :param distance_in_miles: radius of the filter around near
+    :param x_key: field the longitude is stored in
+    :param y_key: field the latitude is stored in
+    :param response_format: format the server is asked to answer in,
+        arcgis_utils.JSON_FORMAT or arcgis_utils.PBF_FORMAT
+    :return: list of record dictionaries, or None if the query failed
+    """
+    logger.debug('url received: ' + url + ', query received: ' + query +
+                 ', near: ' + str(near) +
+                 ', distance_in_miles: ' + str(distance_in_miles))
+
+    features = arcgis_utils.query_feature_layer(
+        url,
+        where=query,
+        out_fields=out_fields,
+        near=near,
+        distance_in_miles=distance_in_miles,
+        out_sr=arcgis_utils.WGS84_WKID,
+        response_format=response_format
+    )
+    if features is None:
+        logger.debug('Failed to query Feature Server at ' + url)
+        return None
+    return [feature_to_record(feature, x_key, y_key)
+            for feature in features]
+
+
+def feature_to_record(feature, x_key="X", y_key="Y"):
+    """
+    :param feature: feature dictionary with 'attributes' and 'geometry' keys
+    :param x_key: field to store the longitude in
+    :param y_key: field to store the latitude in
+    :return: dictionary of the feature's attributes and coordinates.
+        Features without a point geometry get empty coordinates
+    """
+    record = dict(feature.get("attributes", {}))
+    geometry = feature.get("geometry") or {}
+    record[x_key] = geometry.get("x", "")
+    record[y_key] = geometry.get("y", "")
+    return record
+
+
 def _get_dest_addresses_from_features(feature_address_index, features):
     """
     Generate and return a list of destination addresses (as strings)
@@ -115,12 +181,30 @@ def _get_dest_addresses_from_features(feature_address_index, features):
     return dest_addresses
 
 
+def _get_dest_coordinates_from_features(feature_address_index,
+                                        feature_coordinate_indices, features):
+    """
+    Generate and return a list of destination coordinates matching the
+    addresses returned by _get_dest_addresses_from_features
+
+    :param feature_address_index: to retrieve address string in feature
+    :param feature_coordinate_indices: (x index, y index) to retrieve
+        coordinates in feature
+    :param features: list of features retrieved from FeatureServer
+    :return: list of (x, y) destination coordinates
+    """
+    x_index, y_index = feature_coordinate_indices
+    return [(feature[x_index], feature[y_index]) for feature in features
+            if feature[feature_address_index]]
+
+
 def geocode_address(m_address):
     """
     :param m_address: address of interest in street form
-    :return: address in coordinate (X and Y) form
+    :return: address in coordinate (X and Y) form, or None if the address
+        could not be geocoded
     """
-    m_address = m_address + ", City: Boston, State: MA"
-    m_location = geocode(address=m_address)[0]
-    adict = (m_location['location'])
-    return list(adict.values())
+    coordinate = geocoding_service.geocode(m_address + ", Boston, MA")
+    if coordinate is None:
+        return None
+    return [coordinate.x, coordinate.y]
@@ -1,10 +1,17 @@
 """
 Utility functions using Google Maps to find driving distances/times from
 an origin address to a list of destinations
+
+The Distance Matrix API caps the number of destinations per request, so
+destinations are sent in chunks, in parallel.
 """
 
+import concurrent.futures
 import os
 import requests
+import mycity.utilities.distance_utils as distance_utils
+import mycity.utilities.http_utils as http_utils
+from mycity.utilities.geocoding_service import Coordinate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +23,16 @@ DRIVING_DISTANCE_VALUE_KEY = "Driving distance"
 DRIVING_DISTANCE_TEXT_KEY = "Driving distance text"
 DRIVING_TIME_VALUE_KEY = "Driving time"
 DRIVING_TIME_TEXT_KEY = "Driving time text"
+# The Distance Matrix API accepts at most 25 destinations per request
+MAX_DESTINATIONS_PER_REQUEST = 25
+# Upper bound on Distance Matrix requests in flight at once
+MAX_CONCURRENT_REQUESTS = 4
+# Destinations kept by the straight-line pre-filter
+DEFAULT_MAX_CANDIDATES = 10
+
+_request_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_REQUESTS
+)
 
 
 def _get_driving_info(origin, location_type, destinations):
@@ -23,7 +40,8 @@ def _get_driving_info(origin, location_type, destinations):
     Gets the driving info from the provided origin address to each destination
     address
     
-    :param origin: string containing driving starting address
+    :param origin: string containing driving starting address, or its
+        Coordinate
     :param location_type: string that identifies type of location we're getting 
         directions to
     :param destinations: list of destination address strings (to calculate
@@ -39,20 +57,137 @@ def _get_driving_info(origin, location_type, destinations):
         ', count(destinations): ' + str(len(destinations))
     )
 
+    driving_infos = []
+    for chunk_driving_infos in _iter_driving_info_chunks(origin,
+                                                         location_type,
+                                                         destinations):
+        driving_infos.extend(chunk_driving_infos)
+    return driving_infos
+
+
+def get_closest_driving_info(origin, location_type, destinations,
+                             destination_coordinates=None,
+                             max_candidates=DEFAULT_MAX_CANDIDATES):
+    """
+    Finds the destination closest to the origin by driving distance,
+    keeping only the closest one seen so far as chunks come back
+
+    :param origin: string containing driving starting address, or its
+        Coordinate
+    :param location_type: string that identifies type of location we're
+        getting directions to
+    :param destinations: list of destination address strings
+    :param destination_coordinates: optional list of (x, y) coordinates of
+        the destinations. When given with a Coordinate origin, only the
+        max_candidates destinations closest by straight-line distance are
+        sent to Google Maps
+    :param max_candidates: number of destinations kept by the straight-line
+        pre-filter
+    :return: dictionary with the driving data of the closest destination,
+        or None if no driving data was returned
+    """
+    if destination_coordinates is not None and \
+            isinstance(origin, Coordinate):
+        destinations = filter_plausible_destinations(
+            origin,
+            destinations,
+            destination_coordinates,
+            max_candidates
+        )
+
+    closest_driving_info = None
+    for chunk_driving_infos in _iter_driving_info_chunks(origin,
+                                                         location_type,
+                                                         destinations):
+        for driving_info in chunk_driving_infos:
+            if closest_driving_info is None or \
+                    driving_info[DRIVING_DISTANCE_VALUE_KEY] < \
+                    closest_driving_info[DRIVING_DISTANCE_VALUE_KEY]:
+                closest_driving_info = driving_info
+    return closest_driving_info
+
+
+def filter_plausible_destinations(origin, destinations,
+                                  destination_coordinates, max_candidates):
+    """
+    Keeps the destinations closest to the origin by straight-line distance
+
+    :param origin: Coordinate of the origin
+    :param destinations: list of destination address strings
+    :param destination_coordinates: list of (x, y) coordinates of the
+        destinations, in the same order
+    :param max_candidates: number of destinations to keep
+    :return: list of the closest destination address strings, in their
+        original order. Destinations without coordinates are dropped
+    """
+    xs = distance_utils.coordinates_to_floats(
+        [coordinate[0] for coordinate in destination_coordinates])
+    ys = distance_utils.coordinates_to_floats(
+        [coordinate[1] for coordinate in destination_coordinates])
+    nearest, _ = distance_utils.nearest_indices(origin.x, origin.y, xs, ys,
+                                                max_candidates)
+    logger.debug('Kept {} of {} destinations by straight-line distance'
+                 .format(len(nearest), len(destinations)))
+    return [destinations[index] for index in sorted(nearest)]
+
+
+def _iter_driving_info_chunks(origin, location_type, destinations):
+    """
+    Requests driving info for destinations in chunks the Distance Matrix
+    API accepts, with the requests in flight at the same time
+
+    :param origin: string containing driving starting address, or its
+        Coordinate
+    :param location_type: string that identifies type of location we're
+        getting directions to
+    :param destinations: list of destination address strings
+    :return: generator of lists of driving data dictionaries, one list per
+        chunk, in the order the chunks were sent. Failed chunks yield
+        empty lists
+    """
+    futures = [
+        _request_executor.submit(_request_driving_info, origin,
+                                 location_type,
+                                 destinations[start:start +
+                                              MAX_DESTINATIONS_PER_REQUEST])
+        for start in range(0, len(destinations),
+                           MAX_DESTINATIONS_PER_REQUEST)
+    ]
+    for future in futures:
+        try:
+            yield future.result()
+        except requests.exceptions.RequestException as e:
+            logger.warning("Failed to get driving directions: " + str(e))
+            yield []
+
+
+def _request_driving_info(origin, location_type, destinations):
+    """
+    Gets the driving info for one chunk of destinations with a single
+    Distance Matrix request
+
+    :param origin: string containing driving starting address, or its
+        Coordinate
+    :param location_type: string that identifies type of location we're
+        getting directions to
+    :param destinations: list of at most MAX_DESTINATIONS_PER_REQUEST
+        destination address strings
+    :return: list of dictionaries representing driving data for each
+        destination address
+    """
     url_parameters = _setup_google_maps_query_params(origin, destinations)
     driving_directions_url = GOOGLE_MAPS_URL
-    driving_infos = None
-    with requests.Session() as session:
-        response = session.get(driving_directions_url, params=url_parameters)
-        if response.status_code == requests.codes.ok:
-            all_driving_data = response.json()
-            driving_infos = combine_driving_data_with_destinations(
-                all_driving_data,
-                location_type,
-                destinations
-            )
-        else:
-            logger.warning("Failed to get driving directions")
+    driving_infos = []
+    response = http_utils.get(driving_directions_url, params=url_parameters)
+    if response.status_code == requests.codes.ok:
+        all_driving_data = response.json()
+        driving_infos = combine_driving_data_with_destinations(
+            all_driving_data,
+            location_type,
+            destinations
+        )
+    else:
+        logger.warning("Failed to get driving directions")
 
     return driving_infos
 
@@ -61,7 +196,8 @@ def _setup_google_maps_query_params(origin, destinations):
     """
     Builds a dictionary for querying Google Maps 
     
-    :param origin: "from" address in query
+    :param origin: "from" address in query, or its Coordinate (sent as
+        latitude,longitude so Google doesn't geocode it again)
     :param destinations: "to" addresses in query
     :return: a dictionary to use as url parameters for query
     """
@@ -70,6 +206,8 @@ def _setup_google_maps_query_params(origin, destinations):
         ', destinations received (last five): ' + str(destinations[:5]) +
         ', count(destinations): ' + str(len(destinations))
     )
+    if isinstance(origin, Coordinate):
+        origin = "{},{}".format(origin.y, origin.x)
     return {"origins": origin,
             "destinations": '|'.join(destinations),
             "key": GOOGLE_MAPS_API_KEY,
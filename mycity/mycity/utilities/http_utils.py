@@ -0,0 +1,121 @@
+"""
+Shared HTTP client used for every call to an upstream service
+
+All requests go through one requests.Session so that warm Lambda containers
+reuse pooled keep-alive (and TLS) connections to each host instead of
+opening a new one per call. Every request has explicit connect and read
+timeouts and asks for gzip compressed responses.
+"""
+
+import threading
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a connection to be established / for response data
+CONNECT_TIMEOUT_SECONDS = 3.05
+READ_TIMEOUT_SECONDS = 10
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)
+
+# Number of hosts to keep connection pools for, and the number of
+# connections kept open to each of those hosts
+POOLED_HOSTS = 10
+CONNECTIONS_PER_HOST = 10
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive"
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the session shared by the whole process, creating it on
+    first use
+
+    :return: requests.Session object
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def _create_session():
+    """
+    Builds a requests.Session with a connection pool per host
+
+    :return: requests.Session object
+    """
+    logger.debug('Creating shared HTTP session')
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOLED_HOSTS,
+                          pool_maxsize=CONNECTIONS_PER_HOST)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT,
+        stream=False):
+    """
+    Sends a GET request through the shared session
+
+    :param url: String containing URL of request
+    :param params: Dictionary of query parameters
+    :param headers: Dictionary of additional headers
+    :param timeout: (connect, read) timeout tuple in seconds
+    :param stream: if True, the response body is not downloaded until
+        it is accessed
+    :return: requests.Response object
+    """
+    logger.debug("GET {}, params: {}".format(url, str(params)))
+    return get_session().get(url, params=params, headers=headers,
+                             timeout=timeout, stream=stream)
+
+
+def post(url, data=None, json=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Sends a POST request through the shared session
+
+    :param url: String containing URL of request
+    :param data: Dictionary, bytes or string to send in the body
+    :param json: object to send as a JSON body
+    :param headers: Dictionary of additional headers
+    :param timeout: (connect, read) timeout tuple in seconds
+    :return: requests.Response object
+    """
+    logger.debug("POST {}".format(url))
+    return get_session().post(url, data=data, json=json, headers=headers,
+                              timeout=timeout)
+
+
+def encode_multipart_form(params):
+    """
+    Encodes a dictionary of parameters as a multipart/form-data body
+
+    :param params: Dictionary of form field names to values
+    :return: Two-Tuple containing 1) bytes of the encoded body and
+        2) String with the matching Content-Type header value
+    """
+    boundary = uuid.uuid4().hex
+    lines = []
+    for key, value in params.items():
+        lines.append("--{}".format(boundary))
+        lines.append('Content-Disposition: form-data; name="{}"'.format(key))
+        lines.append("")
+        lines.append(str(value))
+    lines.append("--{}--".format(boundary))
+    lines.append("")
+    body = "\r\n".join(lines).encode("utf-8")
+    content_type = "multipart/form-data; boundary={}".format(boundary)
+    return (body, content_type)
@@ -0,0 +1,223 @@
+"""
+Per-container cache of ReCollect trash schedule lookups
+
+Answering a trash question takes two ReCollect calls: address-suggest,
+which finds the place parameters of an address, and places, which returns
+the place's schedule. The place of an address practically never changes,
+so it is kept for a long time. A schedule is kept until its next event
+has passed, when ReCollect starts reporting the following one. A place's
+calendar of upcoming events is used until it no longer covers the coming
+week, which for a freshly fetched calendar is several weeks.
+"""
+
+import calendar
+import collections
+import datetime
+import threading
+import time
+import mycity.utilities.address_utils as address_utils
+import mycity.utilities.trash_calendar as trash_calendar
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLACE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Upper bound on how long a schedule is kept, in case its next event is
+# further away than the usual week
+MAX_SCHEDULE_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1024
+SECONDS_PER_DAY = 24 * 60 * 60
+PLACE_ID_KEY = "place_id"
+EVENT_DAY_FORMAT = "%Y-%m-%d"
+
+
+class RecollectCache(object):
+
+    """
+    Two level LRU cache: normalized address and zip code -> ReCollect place
+    parameters, and place id -> ReCollect schedule and calendar
+
+    @property: hits ::= number of lookups answered from the cache
+    @property: misses ::= number of lookups that called ReCollect
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES,
+                 place_ttl_seconds=DEFAULT_PLACE_TTL_SECONDS,
+                 max_schedule_ttl_seconds=MAX_SCHEDULE_TTL_SECONDS,
+                 clock=time.time):
+        """
+        :param max_entries: number of places, schedules and calendars kept
+            before the least recently used one is evicted
+        :param place_ttl_seconds: seconds the place of an address is used
+            before it's looked up again
+        :param max_schedule_ttl_seconds: longest time a schedule is kept
+        :param clock: function returning the current time in seconds
+        """
+        self.max_entries = max_entries
+        self.place_ttl_seconds = place_ttl_seconds
+        self.max_schedule_ttl_seconds = max_schedule_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        # key -> (expiry time, value), least recent first
+        self._places = collections.OrderedDict()
+        self._schedules = collections.OrderedDict()
+        self._calendars = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_place(self, address, zip_code, lookup):
+        """
+        Returns the ReCollect place parameters of an address, calling
+        lookup if they aren't cached. Empty results aren't cached, and
+        errors raised by lookup are passed on
+
+        :param address: String containing street number and name
+        :param zip_code: String containing zip code, or None
+        :param lookup: function returning the place parameters dictionary
+            (with 'name' and 'place_id' keys), or an empty dictionary if the
+            address wasn't found
+        :return: a copy of the place parameters dictionary
+        """
+        key = (address_utils.normalize_address(address), zip_code or "")
+        place = self._get(self._places, key)
+        if place is None:
+            place = lookup()
+            if not place:
+                return place
+            self._put(self._places, key, place,
+                      self._clock() + self.place_ttl_seconds)
+        return dict(place)
+
+    def get_schedule(self, place, fetch):
+        """
+        Returns the ReCollect schedule of a place, calling fetch if it
+        isn't cached. The schedule is cached until the end of the day of
+        its next event
+
+        :param place: place parameters dictionary returned by get_place
+        :param fetch: function returning the place's schedule dictionary,
+            or an empty dictionary if the request failed
+        :return: schedule dictionary
+        """
+        place_id = place.get(PLACE_ID_KEY)
+        schedule = None
+        if place_id is not None:
+            schedule = self._get(self._schedules, place_id)
+        if schedule is None:
+            schedule = fetch()
+            expires_at = self._get_schedule_expiry(schedule)
+            if place_id is not None and expires_at is not None:
+                self._put(self._schedules, place_id, schedule, expires_at)
+        return schedule
+
+    def get_calendar(self, place, fetch, today):
+        """
+        Returns the calendar of upcoming events of a place, calling fetch
+        for the events from the Monday of this week to CALENDAR_DAYS from
+        today if the place has no cached calendar or it doesn't cover this
+        week and the coming MIN_LOOKAHEAD_DAYS. If fetch fails, the cached
+        calendar is returned. Calendars are kept until their last day has
+        passed
+
+        :param place: place parameters dictionary returned by get_place
+        :param fetch: function taking the first and last datetime.date to
+            get events for, and returning a TrashCalendar, or None if the
+            request failed
+        :param today: datetime.date of the current day
+        :return: TrashCalendar, or None
+        """
+        place_id = place.get(PLACE_ID_KEY)
+        cached = None
+        if place_id is not None:
+            cached = self._get(self._calendars, place_id)
+        if cached is not None and cached.covers(today):
+            return cached
+
+        # from Monday, so delays earlier this week are in the calendar
+        monday, _ = trash_calendar.get_week_bounds(today)
+        fetched = fetch(monday, today + datetime.timedelta(
+            days=trash_calendar.CALENDAR_DAYS))
+        if fetched is None:
+            return cached
+        if place_id is not None:
+            self._put(self._calendars, place_id, fetched,
+                      self._get_calendar_expiry(fetched))
+        return fetched
+
+    def clear(self):
+        """
+        Removes every cached place, schedule and calendar
+
+        :return: None
+        """
+        with self._lock:
+            self._places.clear()
+            self._schedules.clear()
+            self._calendars.clear()
+
+    @staticmethod
+    def _get_calendar_expiry(place_calendar):
+        """
+        :param place_calendar: TrashCalendar of a place
+        :return: time the calendar's last day ends (UTC). It's refreshed
+            MIN_LOOKAHEAD_DAYS before then, and kept until then in case the
+            refresh fails
+        """
+        return calendar.timegm(place_calendar.horizon.timetuple()) + \
+            SECONDS_PER_DAY
+
+    def _get_schedule_expiry(self, schedule):
+        """
+        :param schedule: schedule dictionary returned by ReCollect
+        :return: time the schedule stops being current, the end of its next
+            event's day (UTC), or None if it has no next event
+        """
+        try:
+            day = time.strptime(schedule["next_event"]["day"],
+                                EVENT_DAY_FORMAT)
+        except (KeyError, TypeError, ValueError):
+            return None
+        end_of_day = calendar.timegm(day) + SECONDS_PER_DAY
+        return min(end_of_day,
+                   self._clock() + self.max_schedule_ttl_seconds)
+
+    def _get(self, entries, key):
+        """
+        :param entries: OrderedDict of key -> (expiry time, value)
+        :param key: key to look up
+        :return: the cached value, or None if it isn't cached or has
+            expired
+        """
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None and self._clock() >= entry[0]:
+                del entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+        logger.debug("ReCollect cache hit for {} ({} hits, {} misses)"
+                     .format(key, self.hits, self.misses))
+        return entry[1]
+
+    def _put(self, entries, key, value, expires_at):
+        """
+        :param entries: OrderedDict of key -> (expiry time, value)
+        :param key: key to store the value under
+        :param value: value to cache
+        :param expires_at: time at which the value expires
+        :return: None
+        """
+        if expires_at <= self._clock():
+            return
+        with self._lock:
+            entries[key] = (expires_at, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+# cache shared by every trash request in this container
+recollect_cache = RecollectCache()
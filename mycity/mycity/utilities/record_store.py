@@ -0,0 +1,242 @@
+"""
+Compact, column oriented storage for location datasets
+
+Rather than one dictionary per record (with a key per csv column), a
+RecordStore keeps one column per field: NumPy float arrays for the X and
+Y coordinates and lists of interned strings for everything else, so
+repeated values like "No Charge" or "BostonGIS" are stored once.
+Dictionary-like RecordView rows are only created when a record is needed,
+e.g. when it's formatted for speech.
+"""
+
+import collections.abc
+import sys
+import mycity.utilities.distance_utils as distance_utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class RecordStore(object):
+
+    """
+    Immutable columnar collection of records
+
+    @property: fields ::= list of field names, in their original order
+    @property: xs ::= NumPy float array of X coordinates (NaN if missing)
+    @property: ys ::= NumPy float array of Y coordinates (NaN if missing)
+    """
+
+    def __init__(self, fields, columns, x_key='X', y_key='Y'):
+        """
+        :param fields: list of field names
+        :param columns: dictionary mapping each field name to a list of
+            its values, one per record
+        :param x_key: name of the X coordinate field
+        :param y_key: name of the Y coordinate field
+        """
+        self.fields = list(fields)
+        self._columns = {field: [_intern(value) for value in columns[field]]
+                         for field in self.fields}
+        self._field_set = frozenset(self.fields)
+        self._length = len(columns[self.fields[0]]) if self.fields else 0
+        self.x_key = x_key
+        self.y_key = y_key
+        self.xs = self._coordinates(x_key)
+        self.ys = self._coordinates(y_key)
+
+    @classmethod
+    def from_records(cls, records, x_key='X', y_key='Y'):
+        """
+        Builds a store from an iterable of dictionaries. Fields missing
+        from a record are stored as None
+
+        :param records: iterable of dictionaries, e.g. a csv.DictReader
+        :param x_key: name of the X coordinate field
+        :param y_key: name of the Y coordinate field
+        :return: RecordStore object
+        """
+        if isinstance(records, RecordStore):
+            return records
+        fields = []
+        columns = {}
+        count = 0
+        for record in records:
+            for field in record:
+                if field not in columns:
+                    fields.append(field)
+                    columns[field] = [None] * count
+            for field in fields:
+                columns[field].append(record.get(field))
+            count += 1
+        return cls(fields, columns, x_key, y_key)
+
+    @classmethod
+    def from_columns(cls, serialized):
+        """
+        Rebuilds a store from the output of to_columns
+
+        :param serialized: dictionary returned by to_columns
+        :return: RecordStore object
+        """
+        return cls(serialized['fields'], serialized['columns'],
+                   serialized['x_key'], serialized['y_key'])
+
+    def to_columns(self):
+        """
+        Returns the store as a JSON serializable dictionary
+
+        :return: dictionary with fields, columns and coordinate keys
+        """
+        return {'fields': self.fields,
+                'columns': self._columns,
+                'x_key': self.x_key,
+                'y_key': self.y_key}
+
+    def _coordinates(self, key):
+        if key in self._columns:
+            return distance_utils.coordinates_to_floats(self._columns[key])
+        return distance_utils.coordinates_to_floats([None] * self._length)
+
+    def coordinates(self, field):
+        """
+        Returns a coordinate field as floats, reusing xs or ys when field
+        is one of the store's coordinate fields
+
+        :param field: name of the coordinate field
+        :return: NumPy float array (NaN where a value is missing)
+        """
+        if field == self.x_key:
+            return self.xs
+        if field == self.y_key:
+            return self.ys
+        return self._coordinates(field)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield RecordView(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [RecordView(self, i)
+                    for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('record index out of range')
+        return RecordView(self, index)
+
+    def __repr__(self):
+        return '<RecordStore records={}, fields={}>'.format(self._length,
+                                                            self.fields)
+
+    def column(self, field):
+        """
+        Returns every value of a field
+
+        :param field: name of the field
+        :return: list of values, one per record
+        """
+        return self._columns[field]
+
+    def value(self, index, field):
+        """
+        Returns one field of one record
+
+        :param index: position of the record
+        :param field: name of the field
+        :return: the field's value
+        """
+        return self._columns[field][index]
+
+    def has_field(self, field):
+        return field in self._field_set
+
+    def with_column(self, field, values):
+        """
+        Returns a new store with one column added or replaced. Other
+        columns are shared with this store, not copied
+
+        :param field: name of the field
+        :param values: list of values, one per record
+        :return: RecordStore object
+        """
+        if len(values) != self._length:
+            raise ValueError('column has {} values, expected {}'
+                             .format(len(values), self._length))
+        store = RecordStore.__new__(RecordStore)
+        store.fields = self.fields + ([] if field in self._field_set
+                                      else [field])
+        store._columns = dict(self._columns)
+        store._columns[field] = [_intern(value) for value in values]
+        store._field_set = frozenset(store.fields)
+        store._length = self._length
+        store.x_key = self.x_key
+        store.y_key = self.y_key
+        store.xs = store._coordinates(self.x_key) \
+            if field == self.x_key else self.xs
+        store.ys = store._coordinates(self.y_key) \
+            if field == self.y_key else self.ys
+        return store
+
+    def select(self, indices):
+        """
+        Returns a new store holding only the records at indices, e.g. the
+        result of a vectorized filter such as numpy.flatnonzero(mask)
+
+        :param indices: iterable of record positions
+        :return: RecordStore object
+        """
+        indices = list(indices)
+        columns = {field: [values[i] for i in indices]
+                   for field, values in self._columns.items()}
+        return RecordStore(self.fields, columns, self.x_key, self.y_key)
+
+
+class RecordView(collections.abc.Mapping):
+
+    """
+    Read only, dictionary-like view of one record in a RecordStore.
+    Views are cheap to create and hold no copy of the record's values
+    """
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def index(self):
+        """Position of this record in its store."""
+        return self._index
+
+    def __getitem__(self, field):
+        if not self._store.has_field(field):
+            raise KeyError(field)
+        return self._store.value(self._index, field)
+
+    def __iter__(self):
+        return iter(self._store.fields)
+
+    def __len__(self):
+        return len(self._store.fields)
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    def as_dict(self):
+        """
+        Copies the record into a new dictionary
+
+        :return: dictionary mapping field names to values
+        """
+        return {field: self._store.value(self._index, field)
+                for field in self._store.fields}
@@ -0,0 +1,338 @@
+"""
+Local driving routes over a Boston road graph
+
+Finding the closest facility by driving time is a one-to-many shortest path
+query inside one city, so it can be answered without the ArcGIS route
+solver. The road graph (e.g. an OpenStreetMap extract exported as an edge
+list) is converted to a compact adjacency file once; at runtime it's loaded
+and searched with Dijkstra's algorithm.
+
+Which engine Finder uses is a runtime setting: set the ROUTING_ENGINE
+environment variable to "local" to route over the road graph, anything else
+(or nothing) keeps ArcGIS.
+
+Adjacency file (NumPy .npz) arrays:
+    xs, ys      longitude and latitude of every node
+    offsets     edges leaving node i are offsets[i]:offsets[i + 1]
+    targets     node each edge leads to
+    seconds     driving time along each edge
+    meters      length of each edge
+"""
+
+import csv
+import heapq
+import os
+import threading
+import numpy as np
+import mycity.utilities.arcgis_utils as arcgis_utils
+import mycity.utilities.distance_utils as distance_utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROUTING_ENGINE_STR = "ROUTING_ENGINE"
+ROAD_NETWORK_FILE_STR = "ROAD_NETWORK_FILE"
+LOCAL_ROUTING_ENGINE = "local"
+# Road network bundled with the mycity package by deploy_tools
+ROAD_NETWORK_PACKAGE_PATH = os.path.join("data", "road_network.npz")
+DEFAULT_ROAD_NETWORK_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ROAD_NETWORK_PACKAGE_PATH
+)
+METERS_PER_MILE = 1609.344
+# Nodes closer than this are merged when building the graph (~1 cm)
+COORDINATE_DECIMALS = 7
+# Columns of the edge list csv a road graph is built from
+EDGE_CSV_FIELDS = ("from_x", "from_y", "to_x", "to_y", "meters", "seconds",
+                   "oneway")
+
+
+class RoadNetwork(object):
+
+    """
+    Directed road graph in compressed sparse row form, with driving time
+    and length on every edge
+    """
+
+    def __init__(self, xs, ys, offsets, targets, seconds, meters):
+        """
+        :param xs: array of node longitudes
+        :param ys: array of node latitudes
+        :param offsets: array of len(xs) + 1 offsets into the edge arrays
+        :param targets: array of the node each edge leads to
+        :param seconds: array of edge driving times in seconds
+        :param meters: array of edge lengths in meters
+        """
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.seconds = np.asarray(seconds, dtype=np.float32)
+        self.meters = np.asarray(meters, dtype=np.float32)
+        # Dijkstra touches edges one at a time, which is much faster on
+        # Python lists than on NumPy scalars
+        self._offsets = self.offsets.tolist()
+        self._targets = self.targets.tolist()
+        self._seconds = self.seconds.tolist()
+        self._meters = self.meters.tolist()
+
+    def __len__(self):
+        return len(self.xs)
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds a road graph from a list of road segments. Segment end
+        points with the same coordinates become the same node
+
+        :param edges: iterable of (from x, from y, to x, to y, meters,
+            seconds, oneway) tuples
+        :return: RoadNetwork object
+        """
+        nodes = {}
+        xs = []
+        ys = []
+        sources = []
+        targets = []
+        seconds = []
+        meters = []
+
+        def node_for(x, y):
+            key = (round(float(x), COORDINATE_DECIMALS),
+                   round(float(y), COORDINATE_DECIMALS))
+            if key not in nodes:
+                nodes[key] = len(xs)
+                xs.append(key[0])
+                ys.append(key[1])
+            return nodes[key]
+
+        for from_x, from_y, to_x, to_y, length, time, oneway in edges:
+            start = node_for(from_x, from_y)
+            end = node_for(to_x, to_y)
+            directions = [(start, end)] if oneway else \
+                [(start, end), (end, start)]
+            for source, target in directions:
+                sources.append(source)
+                targets.append(target)
+                meters.append(float(length))
+                seconds.append(float(time))
+
+        order = np.argsort(np.asarray(sources, dtype=np.int64), kind="stable")
+        counts = np.bincount(np.asarray(sources, dtype=np.int64),
+                             minlength=len(xs))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return cls(xs, ys, offsets,
+                   np.asarray(targets, dtype=np.int32)[order],
+                   np.asarray(seconds, dtype=np.float32)[order],
+                   np.asarray(meters, dtype=np.float32)[order])
+
+    @classmethod
+    def from_edge_csv_file(cls, path):
+        """
+        Builds a road graph from a csv edge list with the EDGE_CSV_FIELDS
+        columns. oneway is "1"/"true"/"yes" for one way segments
+
+        :param path: path of the csv file
+        :return: RoadNetwork object
+        """
+        def read_edges(csv_file):
+            for row in csv.DictReader(csv_file):
+                yield (row["from_x"], row["from_y"], row["to_x"],
+                       row["to_y"], row["meters"], row["seconds"],
+                       row["oneway"].strip().lower() in ("1", "true", "yes"))
+
+        with open(path, encoding="utf-8-sig", newline="") as csv_file:
+            return cls.from_edges(read_edges(csv_file))
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: path of an adjacency file written by save
+        :return: RoadNetwork object
+        """
+        with np.load(path) as arrays:
+            return cls(arrays["xs"], arrays["ys"], arrays["offsets"],
+                       arrays["targets"], arrays["seconds"],
+                       arrays["meters"])
+
+    def save(self, path):
+        """
+        Writes the graph as an adjacency file
+
+        :param path: path of the file to write
+        :return: None
+        """
+        with open(path, "wb") as network_file:
+            np.savez_compressed(network_file, xs=self.xs, ys=self.ys,
+                                offsets=self.offsets, targets=self.targets,
+                                seconds=self.seconds, meters=self.meters)
+
+    def nearest_node(self, x, y):
+        """
+        :param x: longitude
+        :param y: latitude
+        :return: Two-Tuple containing 1) the node closest to the coordinate
+            and 2) its straight-line distance in miles, or None if the
+            graph is empty
+        """
+        indices, distances = distance_utils.nearest_indices(
+            x, y, self.xs, self.ys, 1)
+        if len(indices) == 0:
+            return None
+        return (int(indices[0]), float(distances[0]))
+
+    def closest_target(self, source, target_costs):
+        """
+        Runs Dijkstra's algorithm from source by driving time until the
+        cheapest target is settled
+
+        :param source: node to start from
+        :param target_costs: Dictionary mapping target nodes to the extra
+            seconds needed to get from the node to the destination
+        :return: Three-Tuple containing 1) the closest target, 2) driving
+            seconds to it (including its extra cost) and 3) driving meters
+            along the route to the node, or None if no target is reachable
+        """
+        offsets = self._offsets
+        targets = self._targets
+        edge_seconds = self._seconds
+        edge_meters = self._meters
+
+        best = None
+        settled = set()
+        queue = [(0.0, 0.0, source)]
+        while queue:
+            seconds, meters, node = heapq.heappop(queue)
+            if best is not None and seconds >= best[1]:
+                break
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in target_costs:
+                total = seconds + target_costs[node]
+                if best is None or total < best[1]:
+                    best = (node, total, meters)
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if target not in settled:
+                    heapq.heappush(queue, (seconds + edge_seconds[edge],
+                                           meters + edge_meters[edge],
+                                           target))
+        return best
+
+
+def _snap_cost(straight_line_miles):
+    """
+    :param straight_line_miles: distance between a coordinate and the
+        node it was snapped to
+    :return: Two-Tuple containing 1) estimated seconds and 2) estimated
+        meters to drive between them
+    """
+    miles, minutes = distance_utils.estimate_driving_distance_and_time(
+        straight_line_miles)
+    return (minutes * 60, miles * METERS_PER_MILE)
+
+
+def find_closest_route(road_network, origin_address, destination_addresses):
+    """
+    Finds the closest destination by driving time over a local road graph,
+    as arcgis_utils.find_closest_route does with the ArcGIS route solver.
+    Coordinates off the graph are joined to their nearest node with a
+    straight-line estimate
+
+    :param road_network: RoadNetwork to route over
+    :param origin_address: Coordinate of the origin
+    :param destination_addresses: Dictionary with (x, y) coordinate values as
+        the keys, and the associated address string as the values
+    :return: Dictionary containing address, driving time and driving distance
+        of closest destination, or None if no destination is reachable
+    """
+    try:
+        origin = road_network.nearest_node(float(origin_address.x),
+                                           float(origin_address.y))
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.debug("Missing coordinate in origin_address - {}"
+                     .format(str(e)))
+        return None
+    if origin is None:
+        return None
+
+    # node -> (extra seconds, extra meters, address) of the cheapest
+    # destination snapped to it
+    destinations = {}
+    for (x, y), address in destination_addresses.items():
+        try:
+            snapped = road_network.nearest_node(float(x), float(y))
+        except (TypeError, ValueError):
+            continue
+        if snapped is None:
+            continue
+        node, straight_line_miles = snapped
+        seconds, meters = _snap_cost(straight_line_miles)
+        if node not in destinations or seconds < destinations[node][0]:
+            destinations[node] = (seconds, meters, address)
+    if not destinations:
+        return None
+
+    closest = road_network.closest_target(
+        origin[0],
+        {node: cost[0] for node, cost in destinations.items()}
+    )
+    if closest is None:
+        logger.debug("No destination reachable from the origin")
+        return None
+    node, seconds, meters = closest
+    origin_seconds, origin_meters = _snap_cost(origin[1])
+    _, destination_meters, address = destinations[node]
+    return arcgis_utils.build_destination_dict(
+        address,
+        (seconds + origin_seconds) / 60,
+        (meters + origin_meters + destination_meters) / METERS_PER_MILE
+    )
+
+
+_road_network = None
+_road_network_loaded = False
+_road_network_lock = threading.Lock()
+
+
+def get_road_network():
+    """
+    Returns the road graph for local routing, loading it the first time
+
+    :return: RoadNetwork, or None if the ROUTING_ENGINE setting isn't
+        "local" or the graph couldn't be loaded
+    """
+    global _road_network, _road_network_loaded
+    if os.environ.get(ROUTING_ENGINE_STR, "").lower() != LOCAL_ROUTING_ENGINE:
+        return None
+    if not _road_network_loaded:
+        with _road_network_lock:
+            if not _road_network_loaded:
+                path = os.environ.get(ROAD_NETWORK_FILE_STR,
+                                      DEFAULT_ROAD_NETWORK_FILE)
+                try:
+                    _road_network = RoadNetwork.load(path)
+                    logger.debug("Loaded road network of {} nodes from {}"
+                                 .format(len(_road_network), path))
+                except (OSError, KeyError, ValueError) as e:
+                    logger.error("Could not load road network {}: {}"
+                                 .format(path, str(e)))
+                _road_network_loaded = True
+    return _road_network
+
+
+def build_road_network_file(edge_csv_path, path):
+    """
+    Converts a csv edge list to an adjacency file
+
+    :param edge_csv_path: path of the csv edge list
+    :param path: path of the adjacency file to write
+    :return: RoadNetwork that was written
+    """
+    road_network = RoadNetwork.from_edge_csv_file(edge_csv_path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    road_network.save(path)
+    return road_network
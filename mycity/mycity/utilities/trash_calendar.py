@@ -0,0 +1,155 @@
+"""
+Upcoming trash, recycling and special collection events of a ReCollect place
+
+ReCollect's events endpoint returns every collection day of a place over a
+date range, each with flags naming what is collected (Trash, Recycling,
+Yard Waste...) and any holiday delay. A TrashCalendar holds those events
+from the Monday of the week it was requested in up to the last day that
+was requested (its horizon), so questions about delays this week or the
+next special collection are answered from it until the horizon runs out.
+"""
+
+import datetime
+import re
+from dateutil import tz
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Days of events requested at a time
+CALENDAR_DAYS = 60
+# The calendar is refreshed when it covers fewer days ahead than this
+MIN_LOOKAHEAD_DAYS = 7
+DAY_FORMAT = "%Y-%m-%d"
+# Words marking a flag as a holiday delay rather than a collection
+DELAY_WORDS = ("delay", "holiday")
+BOSTON_TIME_ZONE = tz.gettz("America/New_York")
+
+_NON_LETTERS = re.compile(r"[^a-z]")
+
+
+def _normalize_name(name):
+    """
+    :param name: String naming a collection, e.g. "Yard Waste" or "YardWaste"
+    :return: String with only the lowercase letters, e.g. "yardwaste"
+    """
+    return _NON_LETTERS.sub("", (name or "").lower())
+
+
+def today_in_boston():
+    """
+    :return: datetime.date of the current day in Boston
+    """
+    return datetime.datetime.now(BOSTON_TIME_ZONE).date()
+
+
+class TrashCalendar(object):
+
+    """
+    Collection events of a place, in date order
+
+    @property: events ::= list of (datetime.date, list of flag dictionaries)
+    @property: start ::= first datetime.date the calendar covers
+    @property: horizon ::= last datetime.date the calendar covers
+    """
+
+    def __init__(self, events, start, horizon):
+        """
+        :param events: list of (datetime.date, list of flag dictionaries
+            with 'name', 'subject' and 'event_type' keys)
+        :param start: first datetime.date the events were requested for
+        :param horizon: last datetime.date the events were requested for
+        """
+        self.events = sorted(events, key=lambda event: event[0])
+        self.start = start
+        self.horizon = horizon
+
+    @classmethod
+    def from_events_json(cls, events_json, start, horizon):
+        """
+        :param events_json: JSON object returned by the ReCollect events
+            endpoint
+        :param start: first datetime.date the events were requested for
+        :param horizon: last datetime.date the events were requested for
+        :return: TrashCalendar object
+        """
+        events = []
+        for event in events_json.get("events", []):
+            try:
+                day = datetime.datetime.strptime(event["day"],
+                                                 DAY_FORMAT).date()
+            except (KeyError, TypeError, ValueError):
+                logger.debug("Skipping event without a day: " + str(event))
+                continue
+            events.append((day, event.get("flags") or []))
+        return cls(events, start, horizon)
+
+    def covers(self, today, lookahead_days=MIN_LOOKAHEAD_DAYS):
+        """
+        :param today: datetime.date of the current day
+        :param lookahead_days: number of days ahead that must be covered
+        :return: True if the calendar covers today's week from its Monday
+            and lookahead_days from today
+        """
+        monday, _ = get_week_bounds(today)
+        return self.start <= monday and \
+            self.horizon >= today + datetime.timedelta(days=lookahead_days)
+
+    def get_next_collection(self, collection_name, today):
+        """
+        Finds the next day something is collected
+
+        :param collection_name: name of the collection, e.g. "yard waste"
+        :param today: datetime.date of the current day
+        :return: datetime.date of the next collection on or after today, or
+            None if there is none before the horizon
+        """
+        name = _normalize_name(collection_name)
+        for day, flags in self.events:
+            if day < today:
+                continue
+            for flag in flags:
+                if _is_delay(flag):
+                    continue
+                if name in _normalize_name(flag.get("name")) or \
+                        name in _normalize_name(flag.get("subject")):
+                    return day
+        return None
+
+    def get_delays(self, start, end):
+        """
+        Finds holiday delays between two days
+
+        :param start: first datetime.date to look at
+        :param end: last datetime.date to look at
+        :return: list of (datetime.date, String describing the delay)
+        """
+        delays = []
+        for day, flags in self.events:
+            if day < start or day > end:
+                continue
+            for flag in flags:
+                if _is_delay(flag):
+                    delays.append((day, flag.get("subject") or
+                                   flag.get("name") or ""))
+        return delays
+
+
+def _is_delay(flag):
+    """
+    :param flag: flag dictionary of a ReCollect event
+    :return: True if the flag announces a holiday delay
+    """
+    text = " ".join(str(flag.get(key) or "") for key
+                    in ("name", "subject", "event_type")).lower()
+    return any(word in text for word in DELAY_WORDS)
+
+
+def get_week_bounds(today):
+    """
+    :param today: datetime.date of the current day
+    :return: Two-Tuple containing the datetime.date of 1) the Monday and
+        2) the Sunday of today's week
+    """
+    monday = today - datetime.timedelta(days=today.weekday())
+    return (monday, monday + datetime.timedelta(days=6))
@@ -0,0 +1,239 @@
+"""
+Offline trash and recycling day lookup
+
+Boston publishes the trash and recycling pickup days of every address as
+open data. A csv export of that dataset is converted once (by
+deploy_tools, or build_trash_schedule_file) into a compact index file: the
+distinct pickup day combinations ("zones") and a map of normalized house
+number, street and zip code to zone. At runtime the trash intent looks an
+address up there first and only asks ReCollect when the address is
+missing.
+
+Set the TRASH_SCHEDULE_FILE environment variable to use an index file
+other than the one bundled with the package.
+"""
+
+import csv
+import gzip
+import json
+import os
+import re
+import threading
+from mycity.utilities.address_parser import parse_address
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRASH_SCHEDULE_FILE_STR = "TRASH_SCHEDULE_FILE"
+# Index bundled with the mycity package by deploy_tools
+TRASH_SCHEDULE_PACKAGE_PATH = os.path.join("data", "trash_schedules.json.gz")
+DEFAULT_TRASH_SCHEDULE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    TRASH_SCHEDULE_PACKAGE_PATH
+)
+
+# Fields of the trash schedules by address csv
+ADDRESS_FIELD = "full_address"
+ZIP_CODE_FIELD = "zip_code"
+TRASH_DAY_FIELD = "trashday"
+
+# Marks a house number and street whose zip codes have different pickup
+# days, which can't be answered without the zip code
+AMBIGUOUS = -1
+
+# Day codes used by the dataset ("MTh", "TF", ...) and full day names
+_DAY_NAMES = {
+    "m": "Monday",
+    "t": "Tuesday",
+    "w": "Wednesday",
+    "th": "Thursday",
+    "r": "Thursday",
+    "f": "Friday"
+}
+_WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+             "Saturday", "Sunday"]
+_DAY_CODE = re.compile("|".join(_WEEKDAYS) + "|th|m|t|w|r|f",
+                       re.IGNORECASE)
+
+
+def parse_trash_days(day_codes):
+    """
+    :param day_codes: String of pickup days as written in the dataset,
+        e.g. "MTh" or "Tuesday & Friday"
+    :return: list of day names in weekday order, e.g. ["Monday", "Thursday"]
+    """
+    days = set()
+    for code in _DAY_CODE.findall(day_codes or ""):
+        code = code.lower()
+        days.add(_DAY_NAMES.get(code, code.capitalize()))
+    return [day for day in _WEEKDAYS if day in days]
+
+
+def _street_key(address):
+    """
+    :param address: String containing an address
+    :return: Two-Tuple containing 1) "<house number> <normalized street>"
+        and 2) the zip code in the address (or None), or None if the
+        address has no house number or street
+    """
+    parsed_address = parse_address(address)
+    if not parsed_address.house or not parsed_address.street:
+        return None
+    street_key = "{} {}".format(parsed_address.house.lower(),
+                                parsed_address.street)
+    return (street_key, parsed_address.zip_code)
+
+
+class TrashScheduleIndex(object):
+
+    """
+    Exact match index of pickup days, keyed by normalized house number and
+    street, and zip code
+
+    @property: zones ::= list of distinct pickup day lists
+    """
+
+    def __init__(self, zones, addresses):
+        """
+        :param zones: list of pickup day lists, e.g. [["Monday", "Thursday"]]
+        :param addresses: dictionary of "<street key>|<zip code>" -> index
+            of the address's zone
+        """
+        self.zones = zones
+        self._by_zip_code = addresses
+        # street key -> zone, or AMBIGUOUS
+        self._by_street = {}
+        for key, zone in addresses.items():
+            street_key = key.rsplit("|", 1)[0]
+            indexed_zone = self._by_street.setdefault(street_key, zone)
+            if indexed_zone != zone:
+                self._by_street[street_key] = AMBIGUOUS
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        :param records: iterable of dictionaries with the trash schedules
+            csv fields
+        :return: TrashScheduleIndex object
+        """
+        zones = []
+        zone_indexes = {}
+        addresses = {}
+        for record in records:
+            key = _street_key(record[ADDRESS_FIELD] or "")
+            days = parse_trash_days(record[TRASH_DAY_FIELD])
+            if key is None or not days:
+                continue
+            zone = zone_indexes.setdefault(tuple(days), len(zones))
+            if zone == len(zones):
+                zones.append(days)
+            zip_code = (record[ZIP_CODE_FIELD] or "").strip()
+            # csv exports sometimes drop the leading zero of zip codes
+            zip_code = zip_code.zfill(5) if zip_code.isdigit() else zip_code
+            addresses["{}|{}".format(key[0], zip_code)] = zone
+        return cls(zones, addresses)
+
+    @classmethod
+    def from_csv_file(cls, path):
+        """
+        :param path: path of a csv export of the trash schedules dataset
+        :return: TrashScheduleIndex object
+        """
+        logger.debug("Loading trash schedules from " + path)
+        with open(path, encoding="utf-8-sig", newline="") as csv_file:
+            return cls.from_records(csv.DictReader(csv_file))
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: path of an index file written by save
+        :return: TrashScheduleIndex object
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as index_file:
+            stored = json.load(index_file)
+        return cls(stored["zones"], stored["addresses"])
+
+    def save(self, path):
+        """
+        :param path: path of the index file to write
+        :return: None
+        """
+        with gzip.open(path, "wt", encoding="utf-8") as index_file:
+            json.dump({"zones": self.zones, "addresses": self._by_zip_code},
+                      index_file, separators=(",", ":"))
+
+    def __len__(self):
+        return len(self._by_zip_code)
+
+    def lookup(self, address, zip_code=None):
+        """
+        Finds the pickup days of an address. Addresses without a zip code
+        only match when every zip code the street address is in has the
+        same pickup days
+
+        :param address: String containing street number and name, and
+            optionally the zip code
+        :param zip_code: optional zip code
+        :return: list of day names, or None if there is no match
+        """
+        key = _street_key(address)
+        if key is None:
+            return None
+        street_key, address_zip_code = key
+        zip_code = zip_code or address_zip_code
+        if zip_code:
+            zone = self._by_zip_code.get("{}|{}".format(street_key, zip_code))
+        else:
+            zone = self._by_street.get(street_key)
+        if zone is None or zone == AMBIGUOUS:
+            return None
+        return list(self.zones[zone])
+
+
+_trash_schedule_index = None
+_trash_schedule_index_loaded = False
+_trash_schedule_index_lock = threading.Lock()
+
+
+def get_trash_schedule_index():
+    """
+    Returns the trash schedule index, loading it the first time
+
+    :return: TrashScheduleIndex, or None if there is no index file or it
+        couldn't be loaded
+    """
+    global _trash_schedule_index, _trash_schedule_index_loaded
+    if not _trash_schedule_index_loaded:
+        with _trash_schedule_index_lock:
+            if not _trash_schedule_index_loaded:
+                path = os.environ.get(TRASH_SCHEDULE_FILE_STR,
+                                      DEFAULT_TRASH_SCHEDULE_FILE)
+                if os.path.exists(path):
+                    try:
+                        _trash_schedule_index = TrashScheduleIndex.load(path)
+                        logger.debug("Loaded trash schedules of {} addresses"
+                                     " from {}".format(
+                                         len(_trash_schedule_index), path))
+                    except (OSError, KeyError, ValueError) as e:
+                        logger.error("Could not load trash schedules {}: {}"
+                                     .format(path, str(e)))
+                else:
+                    logger.debug("No trash schedule index at " + path)
+                _trash_schedule_index_loaded = True
+    return _trash_schedule_index
+
+
+def build_trash_schedule_file(csv_path, path):
+    """
+    Converts a csv export of the trash schedules dataset to an index file
+
+    :param csv_path: path of the csv file
+    :param path: path of the index file to write
+    :return: TrashScheduleIndex that was written
+    """
+    trash_schedule_index = TrashScheduleIndex.from_csv_file(csv_path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    trash_schedule_index.save(path)
+    return trash_schedule_index